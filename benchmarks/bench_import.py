@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure how long ``import boolrule`` takes in a fresh interpreter.
+
+Each sample launches a new interpreter, so the figures include interpreter
+startup; the time for an empty ``pass`` is measured the same way and
+subtracted to isolate the cost of the import itself::
+
+    python benchmarks/bench_import.py --repeat 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = [
+    ('baseline', 'pass'),
+    ('import boolrule', 'import boolrule'),
+    (
+        'import + first rule',
+        "import boolrule; boolrule.BoolRule('x = 1').test({'x': 1})",
+    ),
+    (
+        'import + first pyparsing rule',
+        "import boolrule; "
+        "boolrule.BoolRule('x = 1', parser='pyparsing').test({'x': 1})",
+    ),
+]
+
+
+def time_statement(statement, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        subprocess.check_call([sys.executable, '-c', statement], cwd=ROOT)
+        samples.append(timeit.default_timer() - start)
+    return min(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    results = [
+        (name, time_statement(statement, args.repeat))
+        for name, statement in STATEMENTS
+    ]
+    baseline = results[0][1]
+    for name, seconds in results[1:]:
+        print('{:<32} {:8.2f} ms'.format(name, (seconds - baseline) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
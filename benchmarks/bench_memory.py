@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure how much memory compiled rules keep resident.
+
+Builds a corpus of distinct but realistic queries -- rules pinned to a tenant,
+sharing common conditions, property paths and allow-lists -- compiles them
+and reports the bytes allocated per rule, as measured by :mod:`tracemalloc`::
+
+    python benchmarks/bench_memory.py --rules 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus  # noqa: E402
+from boolrule import BoolRule, rule_cache  # noqa: E402
+
+
+def measure(queries):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rules = [BoolRule(query) for query in queries]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return rules, after - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rules', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    # Queries are distinct, so the rule cache would only add its own overhead
+    rule_cache.resize(0)
+    queries = list(corpus.tenant_rules(args.rules))
+    rules, allocated = measure(queries)
+
+    query_bytes = sum(sys.getsizeof(q) for q in queries)
+    print('rules:             {:>10}'.format(len(rules)))
+    print('bytes per rule:    {:>10.0f}'.format(allocated / len(rules)))
+    print('query bytes/rule:  {:>10.0f}  (not included above)'.format(
+        query_bytes / len(rules)
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark parsing, compiling and evaluating rules, and write the results as
+JSON so runs on different commits can be compared.
+
+Covers cold parsing and compiling of each rule shape in ``corpus.SHAPES``,
+``test()`` latency for each shape with closures and with generated code,
+matching many rules against one context, and ``import boolrule``::
+
+    python benchmarks/bench_suite.py --output before.json
+    git checkout my-branch
+    python benchmarks/bench_suite.py --output after.json --compare before.json
+
+With ``--compare`` a table of old and new timings is printed, and the exit
+status is 1 if any benchmark got slower by more than ``--max-slowdown``.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bench_import  # noqa: E402
+import corpus  # noqa: E402
+from boolrule import (  # noqa: E402
+    BoolRule,
+    RuleIndex,
+    RuleSet,
+    __version__,
+    rule_cache,
+)
+from boolrule.parser import parse  # noqa: E402
+
+FORMAT_VERSION = 1
+
+
+def benchmarks(rules):
+    """
+    Yield ``(name, function)`` for every benchmark, where ``function`` runs
+    one iteration.
+    """
+    context = corpus.context()
+
+    for shape, query in sorted(corpus.SHAPES.items()):
+        yield 'parse/' + shape, lambda query=query: parse(query)
+
+        def compile_(query=query):
+            rule_cache.clear()
+            BoolRule(query)
+
+        yield 'compile/' + shape, compile_
+
+    for shape, query in sorted(corpus.SHAPES.items()):
+        rule = BoolRule(query)
+        generated = BoolRule(query, codegen=True)
+        yield 'test/' + shape, lambda rule=rule: rule.test(context)
+        yield (
+            'test_codegen/' + shape,
+            lambda generated=generated: generated.test(context),
+        )
+
+    queries = list(corpus.tenant_rules(rules))
+    each = [BoolRule(query) for query in queries]
+    ruleset = RuleSet(enumerate(queries))
+    index = RuleIndex(enumerate(queries))
+    yield 'many_rules/each', lambda: [rule.test(context) for rule in each]
+    yield 'many_rules/ruleset', lambda: ruleset.match(context)
+    yield 'many_rules/index', lambda: index.match(context)
+
+
+def measure(function, repeat):
+    """Return the fastest time for one call of ``function``, in seconds."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def measure_import(repeat):
+    """Return the time ``import boolrule`` takes in a fresh interpreter."""
+    return (
+        bench_import.time_statement('import boolrule', repeat) -
+        bench_import.time_statement('pass', repeat)
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new, max_slowdown):
+    """
+    Print old and new timings side by side, returning whether every
+    benchmark is within ``max_slowdown`` of its old time.
+    """
+    ok = True
+    print('{:<28} {:>12} {:>12} {:>8}'.format('benchmark', 'old', 'new', ''))
+    for name in sorted(new['results']):
+        seconds = new['results'][name]['seconds']
+        if name not in old['results']:
+            print('{:<28} {:>12} {:>12}'.format(name, '-', _format(seconds)))
+            continue
+        ratio = seconds / old['results'][name]['seconds']
+        slower = ratio > max_slowdown
+        ok = ok and not slower
+        print('{:<28} {:>12} {:>12} {:>7.2f}x{}'.format(
+            name, _format(old['results'][name]['seconds']),
+            _format(seconds), ratio, '  SLOWER' if slower else '',
+        ))
+    return ok
+
+
+def _format(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds * scale >= 1:
+            return '{:.2f} {}'.format(seconds * scale, unit)
+    return '{:.0f} ns'.format(seconds * 1e9)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--compare', help='results to compare against')
+    parser.add_argument('--max-slowdown', type=float, default=1.2)
+    parser.add_argument('--filter', default='',
+                        help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--rules', type=int, default=1000,
+                        help='rules in the many-rules benchmarks')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, function in benchmarks(args.rules):
+        if args.filter in name:
+            results[name] = {'seconds': measure(function, args.repeat)}
+            print('{:<28} {:>12}'.format(
+                name, _format(results[name]['seconds'])
+            ))
+    if args.filter in 'import':
+        results['import'] = {'seconds': measure_import(args.repeat)}
+        print('{:<28} {:>12}'.format(
+            'import', _format(results['import']['seconds'])
+        ))
+
+    report = {
+        'version': FORMAT_VERSION,
+        'commit': git_commit(),
+        'boolrule': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print()
+        if not compare(old, report, args.max_slowdown):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
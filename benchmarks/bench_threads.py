@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure how ``test()`` throughput scales with the number of threads.
+
+Every thread tests the same shared, lazily compiled rules against its own
+contexts, and the results are checked against a single-threaded run. On a
+free-threaded build of Python, throughput should grow close to linearly with
+the number of threads, up to the number of cores; with the GIL it stays flat::
+
+    python3.13t benchmarks/bench_threads.py --threads 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import threading
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus  # noqa: E402
+from boolrule import BoolRule, rule_cache  # noqa: E402
+
+
+def gil_enabled():
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled() if is_gil_enabled is not None else True
+
+
+def run(queries, contexts, threads):
+    """
+    Test fresh lazy rules against every context on each of ``threads``
+    threads, returning the elapsed time and each thread's results. The
+    threads race to compile the rules first, which isn't timed.
+    """
+    rule_cache.clear()
+    rules = [BoolRule(query, lazy=True) for query in queries]
+    barrier = threading.Barrier(threads + 1)
+    results = [None] * threads
+
+    def worker(i):
+        barrier.wait()
+        for rule in rules:
+            rule.test(contexts[0])
+        barrier.wait()
+        results[i] = [
+            [rule.test(context) for rule in rules] for context in contexts
+        ]
+
+    workers = [
+        threading.Thread(target=worker, args=(i,)) for i in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    barrier.wait()
+    started = timeit.default_timer()
+    for thread in workers:
+        thread.join()
+    return timeit.default_timer() - started, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--rules', type=int, default=200)
+    parser.add_argument('--contexts', type=int, default=200,
+                        help='contexts tested by each thread')
+    args = parser.parse_args(argv)
+
+    queries = list(corpus.tenant_rules(args.rules))
+    contexts = [
+        corpus.context(seed, tenant=seed % 50) for seed in range(args.contexts)
+    ]
+    _, (expected,) = run(queries, contexts, 1)
+
+    print('GIL enabled: {}, CPUs: {}'.format(gil_enabled(), os.cpu_count()))
+    print('{:>8} {:>14} {:>10}'.format('threads', 'tests/s', 'scaling'))
+    base = None
+    for threads in args.threads:
+        seconds, results = run(queries, contexts, threads)
+        if any(result != expected for result in results):
+            sys.exit('results differ from a single-threaded run')
+        rate = threads * len(queries) * len(contexts) / seconds
+        base = base or rate / threads
+        print('{:>8} {:>14,.0f} {:>9.2f}x'.format(
+            threads, rate, rate / base
+        ))
+
+
+if __name__ == '__main__':
+    main()
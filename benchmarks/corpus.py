@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Generated rules and contexts shaped like the ones seen in production: rules
+pinned to a tenant, combining audience conditions over a handful of common
+property paths, short allow-lists and optional nested groups.
+
+Everything is generated from a seed, so runs on different commits measure
+exactly the same work.
+"""
+import random
+
+COUNTRIES = ['GB', 'FR', 'DE', 'ES', 'IT', 'NL', 'SE', 'PL', 'IE', 'PT']
+TIERS = ['free', 'pro', 'enterprise']
+
+#: One representative query for each shape of rule.
+SHAPES = {
+    'simple': 'user.age >= 18',
+    'conjunction': (
+        'user.age >= 18 and user.country in ("GB", "FR", "DE") and '
+        'account.tier = "pro"'
+    ),
+    'nested': (
+        'tenant.id = 42 and (user.age >= 18 or user.verified = true) and '
+        '(account.tier in ("pro", "enterprise") or '
+        '(cart.total > 100 and cart.currency = "GBP"))'
+    ),
+    'deep_path': (
+        'request.session.user.profile.address.country = "GB" and '
+        'request.session.user.profile.settings.beta = true'
+    ),
+    'large_in': 'user.id in ({})'.format(
+        ', '.join(str(i) for i in range(0, 20000, 2))
+    ),
+}
+
+
+def tenant_rules(count, seed=0):
+    """Yield ``count`` distinct queries for rules pinned to tenants."""
+    rand = random.Random(seed)
+    for i in range(count):
+        countries = ', '.join(
+            '"%s"' % c for c in sorted(rand.sample(COUNTRIES, 3))
+        )
+        conditions = [
+            'tenant.id = %d' % (i % 5000),
+            'user.country in (%s)' % countries,
+            'user.age >= %d' % rand.choice([13, 16, 18, 21]),
+            'account.tier = "%s"' % rand.choice(TIERS),
+        ]
+        if rand.random() < 0.5:
+            conditions.append(
+                '(cart.total > %d or user.vip = true)' % rand.randrange(500)
+            )
+        yield ' and '.join(conditions)
+
+
+def context(seed=0, tenant=42):
+    """Return a context that every shape in :data:`SHAPES` can evaluate."""
+    rand = random.Random(seed)
+    return {
+        'tenant': {'id': tenant},
+        'user': {
+            'id': rand.randrange(20000),
+            'age': rand.randrange(10, 80),
+            'country': rand.choice(COUNTRIES),
+            'verified': rand.random() < 0.5,
+            'vip': rand.random() < 0.1,
+        },
+        'account': {'tier': rand.choice(TIERS)},
+        'cart': {'total': rand.randrange(500), 'currency': 'GBP'},
+        'request': {'session': {'user': {'profile': {
+            'address': {'country': rand.choice(COUNTRIES)},
+            'settings': {'beta': True},
+        }}}},
+    }
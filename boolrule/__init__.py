@@ -4,4 +4,24 @@ __author__ = 'Steve Webster'
 __email__ = 'spjwebster@gmail.com'
 __version__ = '0.3.0'
 
-from .boolrule import BoolRule, MissingVariableException, UnknownOperatorException  # noqa
+from .analysis import Dependencies, analyze  # noqa
+from .boolrule import BoolRule  # noqa
+from .cache import RuleCache, rule_cache  # noqa
+from .context import PreparedContext  # noqa
+from .exceptions import (  # noqa
+    MissingVariableException,
+    ParseError,
+    UnknownOperatorException,
+)
+from .incremental import Changes, IncrementalEvaluator  # noqa
+from .index import RuleIndex  # noqa
+from .parallel import (  # noqa
+    BulkResult,
+    CompileError,
+    CompileResult,
+    CompileStats,
+    bulk_match,
+    compile_many,
+)
+from .ruleset import RuleSet  # noqa
+from .trace import Profiler  # noqa
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptive evaluation: reorders ``and``/``or`` operands at runtime so that cheap,
+decisive conditions are evaluated first.
+
+On a sample of the calls to a rule, each operand of its ``and``/``or`` chains
+records how long it takes and whether it decides the chain (is false in an
+``and``, true in an ``or``). Every so often the operands are sorted by their
+expected cost per decision, and the evaluator used for all other calls is
+rebuilt in the new order.
+
+Reordering helps most when some conditions are expensive to compare, since
+the property paths of skipped conditions may still have to be resolved (see
+below). Otherwise the bookkeeping can cost more than it saves, so it's best
+reserved for rules known to benefit.
+
+Reordering is only applied where it can't change the outcome of a test:
+
+* Only runs of consecutive *total* operands are reordered. These are
+  conditions, or groups of conditions, using ``==``, ``!=``, ``is``,
+  ``isnot``, or ``in``/``notin`` with a literal collection, which can't raise
+  once their operands are resolved. Any other operand stays where it is and
+  splits the run around it.
+* When an operand decides a run before operands written ahead of it have been
+  evaluated, the property paths of those skipped operands are resolved first.
+  If any of them is missing, the run is evaluated again in its original order
+  so the same :class:`~boolrule.MissingVariableException` is raised as
+  without reordering.
+
+Rules may be tested from many threads. Statistics are updated without
+locking, so some samples may be lost, but operands are only ever reordered by
+one thread at a time and each new order is swapped in whole.
+"""
+import threading
+from timeit import default_timer
+from typing import Any, Callable, List, Sequence, Tuple  # noqa
+
+from .compiler import compile_node
+from .exceptions import MissingVariableException, UnknownOperatorException
+from .nodes import BoolOp, Collection, Condition, Constant, SubstituteVal
+
+# Operators that can't raise for any pair of built-in values.
+_TOTAL_OPERATORS = frozenset(['==', '!=', 'is', 'isnot'])
+_MEMBERSHIP_OPERATORS = frozenset(['in', 'notin'])
+
+
+class AdaptiveEvaluator(object):
+    """
+    Evaluates a syntax tree like its compiled evaluator, reordering the
+    operands of its ``and``/``or`` chains as it learns which are cheapest and
+    most decisive.
+
+    :param ast: The syntax tree to evaluate.
+    :param sample_every: Record statistics on one in every this many calls.
+    :param reorder_every: Reconsider the order of operands after this many
+                          calls.
+    """
+
+    def __init__(self, ast, sample_every=16, reorder_every=1000):
+        # type: (Any, int, int) -> None
+        self._root = _build(ast)
+        self._sample_every = sample_every
+        self._reorder_every = reorder_every
+        self._calls = 0
+        self._reordering = threading.Lock()
+
+    @property
+    def ast(self):
+        # type: () -> Any
+        """The syntax tree with its operands in their current order."""
+        return self._root.node()
+
+    def __call__(self, context):
+        # type: (Any) -> Any
+        self._calls = calls = self._calls + 1
+        if calls % self._sample_every:
+            return self._root.fast(context)
+
+        if (
+            calls % self._reorder_every < self._sample_every and
+            self._reordering.acquire(False)
+        ):
+            # Another thread reordering already takes this call's place
+            try:
+                self._root.reorder()
+            finally:
+                self._reordering.release()
+        return self._root.evaluate(context)
+
+
+class _Leaf(object):
+    """An operand that's evaluated as compiled, such as a condition."""
+
+    def __init__(self, node):
+        # type: (Any) -> None
+        self._node = node
+        self.fast = self.evaluate = compile_node(node)
+
+    def node(self):
+        # type: () -> Any
+        return self._node
+
+    def reorder(self):
+        # type: () -> None
+        pass
+
+
+class _Operand(object):
+    """An operand of a chain, with statistics about its evaluations."""
+
+    __slots__ = ('position', 'child', 'paths', 'decisive', 'cost')
+
+    def __init__(self, position, child, paths):
+        # type: (int, Any, Sequence[SubstituteVal]) -> None
+        self.position = position
+        self.child = child
+        self.paths = paths
+        self.decisive = 0
+        self.cost = 0.0
+
+    def rank(self):
+        # type: () -> float
+        """Expected time spent on this operand per time it decides a run."""
+        return self.cost / (self.decisive + 1)
+
+
+class _Run(object):
+    """
+    Consecutive operands of a chain whose order of evaluation may change.
+    """
+
+    def __init__(self, operands):
+        # type: (List[_Operand]) -> None
+        self.operands = operands
+        self._set_order(operands)
+
+    def _set_order(self, order):
+        # type: (List[_Operand]) -> None
+        # For each position in the new order, the operands written ahead of
+        # that operand that haven't been evaluated when it's reached.
+        skipped = []
+        for i, operand in enumerate(order):
+            evaluated = set(o.position for o in order[:i])
+            skipped.append(tuple(
+                o for o in self.operands[:operand.position - self.start]
+                if o.position not in evaluated
+            ))
+        self.plan = tuple(zip(order, skipped))
+
+    @property
+    def start(self):
+        # type: () -> int
+        return self.operands[0].position
+
+    def reorder(self):
+        # type: () -> None
+        for operand in self.operands:
+            operand.child.reorder()
+
+        if len(self.operands) > 1:
+            order = sorted(
+                self.operands, key=lambda o: (o.rank(), o.position)
+            )
+            self._set_order(order)
+            for operand in self.operands:
+                # Decay the statistics so the order can follow changes.
+                operand.decisive //= 2
+                operand.cost /= 2
+
+
+class _Chain(object):
+    """An ``and``/``or`` chain, split into runs of reorderable operands."""
+
+    def __init__(self, node):
+        # type: (BoolOp) -> None
+        if node.operator not in ('and', 'or'):
+            raise UnknownOperatorException(
+                "Unknown operator '{}'".format(node.operator)
+            )
+        self._operator = node.operator
+        self._decides = node.operator == 'or'
+
+        self._runs = []  # type: List[_Run]
+        run = []  # type: List[_Operand]
+        for position, child in enumerate(node.operands):
+            paths = _total_paths(child)
+            operand = _Operand(position, _build(child), paths or ())
+            if paths is None:
+                if run:
+                    self._runs.append(_Run(run))
+                self._runs.append(_Run([operand]))
+                run = []
+            else:
+                run.append(operand)
+        if run:
+            self._runs.append(_Run(run))
+
+        self.fast = self._compile()
+
+    def node(self):
+        # type: () -> Any
+        return BoolOp(self._operator, tuple(
+            operand.child.node()
+            for run in self._runs for operand, _ in run.plan
+        ))
+
+    def reorder(self):
+        # type: () -> None
+        for run in self._runs:
+            run.reorder()
+        self.fast = self._compile()
+
+    def _compile(self):
+        # type: () -> Callable[[Any], Any]
+        """
+        Build an evaluator for the current order that doesn't record any
+        statistics.
+        """
+        runs = tuple(
+            (run, tuple(
+                (operand.child.fast, _skipped_paths(skipped))
+                for operand, skipped in run.plan
+            ))
+            for run in self._runs
+        )
+        decides = self._decides
+        in_order = self._evaluate_in_order
+
+        def evaluate(context):
+            # type: (Any) -> Any
+            passed = False
+            for run, steps in runs:
+                try:
+                    for step, skipped in steps:
+                        passed = step(context)
+                        if (not passed) if decides else passed:
+                            continue
+                        if skipped and not _resolves(skipped, context):
+                            return in_order(run, context)[1]
+                        return decides
+                except MissingVariableException:
+                    decided, passed = in_order(run, context)
+                    if decided:
+                        return passed
+            return passed
+
+        return evaluate
+
+    def evaluate(self, context):
+        # type: (Any) -> Any
+        """Evaluate the chain, recording statistics for every operand."""
+        passed = False
+        for run in self._runs:
+            try:
+                decided, passed = self._evaluate_run(run, context)
+            except MissingVariableException:
+                # An operand written ahead of the one that raised might have
+                # decided the run first.
+                decided, passed = self._evaluate_in_order(run, context)
+            if decided:
+                return passed
+        return passed
+
+    def _evaluate_run(self, run, context):
+        # type: (_Run, Any) -> Tuple[bool, Any]
+        decides = self._decides
+        passed = False
+        for operand, skipped in run.plan:
+            started = default_timer()
+            passed = operand.child.evaluate(context)
+            operand.cost += default_timer() - started
+
+            if bool(passed) is decides:
+                operand.decisive += 1
+                if skipped and not _resolves(_skipped_paths(skipped), context):
+                    return self._evaluate_in_order(run, context)
+                return True, decides
+        return False, passed
+
+    def _evaluate_in_order(self, run, context):
+        # type: (_Run, Any) -> Tuple[bool, Any]
+        """
+        Evaluate a run in its original order, raising exactly as it would
+        have had it never been reordered.
+        """
+        passed = False
+        for operand in run.operands:
+            passed = operand.child.fast(context)
+            if bool(passed) is self._decides:
+                return True, self._decides
+        return False, passed
+
+
+def _build(node):
+    # type: (Any) -> Any
+    if isinstance(node, BoolOp):
+        return _Chain(node)
+    return _Leaf(node)
+
+
+def _skipped_paths(operands):
+    # type: (Sequence[_Operand]) -> Tuple[SubstituteVal, ...]
+    return tuple(path for operand in operands for path in operand.paths)
+
+
+def _resolves(paths, context):
+    # type: (Sequence[SubstituteVal], Any) -> bool
+    for path in paths:
+        try:
+            path.get_val(context)
+        except MissingVariableException:
+            return False
+    return True
+
+
+def _total_paths(node):
+    # type: (Any) -> Any
+    """
+    Return the property paths of an expression that can't raise once they're
+    resolved, or ``None`` if the expression might raise regardless.
+    """
+    if isinstance(node, Constant):
+        return []
+
+    if isinstance(node, BoolOp):
+        paths = []  # type: List[SubstituteVal]
+        for operand in node.operands:
+            operand_paths = _total_paths(operand)
+            if operand_paths is None:
+                return None
+            paths.extend(operand_paths)
+        return paths
+
+    if isinstance(node, Condition):
+        if node.operator in _TOTAL_OPERATORS or (
+            node.operator in _MEMBERSHIP_OPERATORS and
+            isinstance(node.rval, Collection) and
+            all(isinstance(item, Constant) for item in node.rval.items)
+        ):
+            return _value_paths(node.lval) + _value_paths(node.rval)
+
+    return None
+
+
+def _value_paths(node):
+    # type: (Any) -> List[SubstituteVal]
+    if isinstance(node, SubstituteVal):
+        return [node]
+    if isinstance(node, Collection):
+        return [path for item in node.items for path in _value_paths(item)]
+    return []
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Evaluate rules against contexts whose values are fetched asynchronously.
+
+Any value in the context, at any depth, may be an awaitable or an async
+callable (one returning an awaitable when called with no arguments). Values
+are resolved in the order evaluation reaches them, so lookups that
+short-circuiting skips are never made. Only the values a single condition
+compares, which are certain to be needed, are requested concurrently.
+
+Each value is resolved at most once per evaluation, however many conditions
+refer to it or to paths beneath it, and once the result of the rule is known,
+lookups that are still pending are cancelled. Futures and tasks found in the
+context are shielded from that cancellation, since they may be awaited
+elsewhere.
+
+Passing ``prefetch=True`` requests the values needed by every condition of an
+``and``/``or`` chain as soon as evaluation enters it, trading lookups that may
+turn out to be unnecessary for lower latency.
+
+Requires Python 3.5 or later.
+"""
+import asyncio
+import inspect
+from typing import Any, Dict, List  # noqa
+
+from .compiler import prepare_condition, prepare_conditions
+from .context import PreparedContext
+from .exceptions import MissingVariableException, UnknownOperatorException
+from .nodes import (
+    BoolOp,
+    Collection,
+    Condition,
+    Constant,
+    SubstituteVal,
+    pathDelimiter,
+)
+
+
+async def evaluate_async(ast, context=None, prepared=None, prefetch=False):
+    # type: (Any, Any, Any, bool) -> Any
+    """
+    Evaluate a syntax tree against a context that may contain awaitable
+    values, as :meth:`BoolRule.test_async <boolrule.BoolRule.test_async>`.
+
+    :param prepared: The tree's conditions, as returned by
+                     :func:`~boolrule.compiler.prepare_conditions`, to avoid
+                     preparing them again.
+    :param prefetch: If ``True``, request the values of every condition in
+                     an ``and``/``or`` chain when evaluation enters it,
+                     even if a short-circuit makes some of them unnecessary.
+    """
+    if prepared is None:
+        prepared = prepare_conditions(ast)
+    resolver = _Resolver(context)
+    try:
+        return await _Evaluator(resolver, prepared, prefetch).expression(ast)
+    finally:
+        resolver.close()
+
+
+class _Resolver(object):
+    """
+    Resolves property paths in a context, sharing the lookup of each path
+    prefix between every path that starts with it.
+    """
+
+    def __init__(self, context):
+        # type: (Any) -> None
+        if context.__class__ is PreparedContext:
+            context = context.context
+        self._context = context
+        # path prefix -> task resolving its value
+        self._tasks = {}  # type: Dict[str, Any]
+
+    def prefetch(self, paths):
+        # type: (List[SubstituteVal]) -> None
+        """Start resolving paths, without waiting for their values."""
+        if self._context:
+            for path in paths:
+                self._prefix(path.path)
+
+    async def get(self, path):
+        # type: (SubstituteVal) -> Any
+        if not self._context:
+            raise MissingVariableException('context missing or empty')
+        try:
+            return await self._prefix(path.path)
+        except MissingVariableException:
+            raise MissingVariableException(
+                'no value supplied for {}'.format(path.path)
+            )
+
+    def close(self):
+        # type: () -> None
+        """Cancel every lookup that's still pending."""
+        for task in self._tasks.values():
+            if task.done():
+                if not task.cancelled():
+                    # Mark failures of lookups nobody needed as retrieved
+                    task.exception()
+            else:
+                task.cancel()
+
+    def _prefix(self, prefix):
+        # type: (str) -> Any
+        task = self._tasks.get(prefix)
+        if task is None:
+            task = self._tasks[prefix] = asyncio.ensure_future(
+                self._fetch(prefix)
+            )
+        return task
+
+    async def _fetch(self, prefix):
+        # type: (str) -> Any
+        parent, _, part = prefix.rpartition(pathDelimiter)
+        value = await self._prefix(parent) if parent else self._context
+        # The context itself was checked for emptiness by get()
+        return await _settle(_segment(part).get_val(value, nested=True))
+
+
+async def _settle(value):
+    # type: (Any) -> Any
+    """Return a value, calling and awaiting it if it's asynchronous."""
+    if _is_async_callable(value):
+        value = value()
+    if asyncio.isfuture(value):
+        return await asyncio.shield(value)
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+def _is_async_callable(value):
+    # type: (Any) -> bool
+    return bool(
+        inspect.iscoroutinefunction(value) or
+        inspect.iscoroutinefunction(getattr(value, '__call__', None))
+    )
+
+
+# A single segment of a property path -> the node looking it up
+_SEGMENTS = {}  # type: Dict[str, SubstituteVal]
+
+
+def _segment(part):
+    # type: (str) -> SubstituteVal
+    path = _SEGMENTS.get(part)
+    if path is None:
+        path = _SEGMENTS[part] = SubstituteVal([part])
+    return path
+
+
+class _Evaluator(object):
+
+    def __init__(self, resolver, prepared, prefetch):
+        # type: (_Resolver, Dict[int, Any], bool) -> None
+        self._resolver = resolver
+        self._prepared = prepared
+        self._prefetch = prefetch
+
+    async def expression(self, node):
+        # type: (Any) -> Any
+        if isinstance(node, BoolOp):
+            return await self._bool_op(node)
+        if isinstance(node, Condition):
+            return await self._condition(node)
+        if isinstance(node, Constant):
+            return node.value
+        raise TypeError('Cannot evaluate {!r}'.format(node))
+
+    async def _bool_op(self, node):
+        # type: (BoolOp) -> Any
+        if node.operator not in ('and', 'or'):
+            raise UnknownOperatorException(
+                "Unknown operator '{}'".format(node.operator)
+            )
+        decides = node.operator == 'or'
+
+        if self._prefetch:
+            self._resolver.prefetch([
+                path for operand in node.operands
+                if isinstance(operand, Condition)
+                for path in _paths(operand.lval) + _paths(operand.rval)
+            ])
+
+        passed = False
+        for operand in node.operands:
+            passed = await self.expression(operand)
+            if bool(passed) is decides:
+                return decides
+        return passed
+
+    async def _condition(self, node):
+        # type: (Condition) -> Any
+        # Literal operands, such as a long list searched with in, are only
+        # built once, as for the compiled rule
+        prepared = self._prepared.get(id(node)) or prepare_condition(node)
+        op, lconst, lval, rconst, rval = prepared
+        # Both operands are needed, so look them up concurrently
+        self._resolver.prefetch(
+            (_paths(node.lval) if not lconst else []) +
+            (_paths(node.rval) if not rconst else [])
+        )
+        if not lconst:
+            lval = await self._value(node.lval)
+        if not rconst:
+            rval = await self._value(node.rval)
+        return op(lval, rval)
+
+    async def _value(self, node):
+        # type: (Any) -> Any
+        if isinstance(node, Constant):
+            return node.value
+        if isinstance(node, SubstituteVal):
+            return await self._resolver.get(node)
+        if isinstance(node, Collection):
+            return [await self._value(item) for item in node.items]
+        raise TypeError('Cannot evaluate {!r}'.format(node))
+
+
+def _paths(node):
+    # type: (Any) -> List[SubstituteVal]
+    if isinstance(node, SubstituteVal):
+        return [node]
+    if isinstance(node, Collection):
+        return [path for item in node.items for path in _paths(item)]
+    return []
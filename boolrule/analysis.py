@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Static analysis of what a rule depends on, without evaluating it.
+
+:func:`~boolrule.analyze` walks compiled syntax trees and reports the
+property paths they look up, the operators and literals they use, and a rough
+estimate of how expensive they are to evaluate. The paths can be used to fetch
+only the parts of a context that rules need::
+
+    deps = analyze(*(rule.ast for rule in rules))
+    context = feature_store.fetch(deps.tree)
+
+Since rules are analysed after they're optimised, conditions and literals
+that the optimiser removed aren't reported.
+"""
+from collections import namedtuple
+from typing import Any, Dict, List, Set  # noqa
+
+from .compiler import _HASHED_OPERATORS
+from .nodes import (
+    BoolOp,
+    Collection,
+    Condition,
+    Constant,
+    SubstituteVal,
+    pathDelimiter,
+)
+
+Dependencies = namedtuple(
+    'Dependencies', 'paths tree operators constants cost'
+)
+Dependencies.__doc__ = """
+What one or more rules depend on.
+
+:ivar paths: The property paths looked up, in the order they first appear.
+:ivar tree: The paths as a prefix tree of nested dicts, such as
+            ``{'user': {'age': {}, 'country': {}}}``. An empty dict means
+            the whole value at that path is needed, so a path that's a prefix
+            of another is the only one kept.
+:ivar operators: The set of operators used, including ``and`` and ``or``, in
+                 their canonical spelling.
+:ivar constants: The literal values used, in the order they first appear.
+                 ``1`` and ``true`` are distinct.
+:ivar cost: An estimate of the work evaluating every condition takes: one
+            unit per comparison, path segment looked up and collection item
+            built or scanned. It's only meaningful for comparing rules.
+"""
+
+
+def analyze(*nodes):
+    # type: (*Any) -> Dependencies
+    """
+    Return the :class:`Dependencies` of one or more syntax trees, combined.
+    """
+    analysis = _Analysis()
+    cost = sum(analysis.visit(node) for node in nodes)
+
+    tree = {}  # type: Dict[str, Any]
+    for path in analysis.paths:
+        _insert(tree, path.split(pathDelimiter))
+
+    return Dependencies(
+        paths=tuple(analysis.paths),
+        tree=tree,
+        operators=frozenset(analysis.operators),
+        constants=tuple(constant.value for constant in analysis.constants),
+        cost=cost,
+    )
+
+
+class _Analysis(object):
+
+    def __init__(self):
+        # type: () -> None
+        self.paths = []  # type: List[str]
+        self.operators = set()  # type: Set[str]
+        self.constants = []  # type: List[Constant]
+        self._seen = set()  # type: Set[Any]
+
+    def visit(self, node):
+        # type: (Any) -> int
+        """Record a node and its children, returning their cost."""
+        if isinstance(node, BoolOp):
+            self.operators.add(node.operator)
+            return sum(self.visit(operand) for operand in node.operands)
+
+        if isinstance(node, Condition):
+            self.operators.add(node.operator)
+            cost = 1 + self.visit(node.lval) + self.visit(node.rval)
+            if not _hashed(node):
+                cost += _scanned(node.lval) + _scanned(node.rval)
+            return cost
+
+        if node not in self._seen:
+            self._seen.add(node)
+            if isinstance(node, SubstituteVal):
+                self.paths.append(node.path)
+            elif isinstance(node, Constant):
+                self.constants.append(node)
+
+        if isinstance(node, SubstituteVal):
+            return len(node.path.split(pathDelimiter))
+        if isinstance(node, Collection):
+            # Items are only built into a list if any of them is a path
+            cost = sum(self.visit(item) for item in node.items)
+            return cost + (len(node.items) if cost else 0)
+        return 0
+
+
+def _hashed(node):
+    # type: (Condition) -> bool
+    """Whether a condition searches a frozenset built at compile time."""
+    hashed = _HASHED_OPERATORS.get(node.operator)
+    if hashed is None:
+        return False
+    searched = node.lval if hashed[0] else node.rval
+    return isinstance(searched, Collection) and all(
+        isinstance(item, Constant) for item in searched.items
+    )
+
+
+def _scanned(node):
+    # type: (Any) -> int
+    """The number of items a condition may compare in a literal list."""
+    return len(node.items) if isinstance(node, Collection) else 0
+
+
+def _insert(tree, parts):
+    # type: (Dict[str, Any], List[str]) -> None
+    for i, part in enumerate(parts):
+        child = tree.get(part)
+        if child is None:
+            child = tree[part] = {}
+        elif not child:
+            # The whole value is already needed
+            return
+        if i == len(parts) - 1:
+            child.clear()
+        tree = child
@@ -1,115 +1,63 @@
 # -*- coding: utf-8 -*-
-from typing import List, Any  # noqa
-from pyparsing import (
-    CaselessLiteral,
-    Word,
-    delimitedList,
-    Optional,
-    Combine,
-    Group,
-    alphas,
-    nums,
-    alphanums,
-    Forward,
-    oneOf,
-    quotedString,
-    ZeroOrMore,
-    Keyword,
-    ParseResults,
-    removeQuotes,
-    Suppress,
+import threading
+from typing import TYPE_CHECKING, Any  # noqa
+from weakref import WeakKeyDictionary
+
+from .cache import rule_cache
+from .compiler import CompiledRule, compile_rule, prepare_conditions  # noqa
+from .exceptions import (  # noqa
+    MissingVariableException,
+    ParseError,
+    UnknownOperatorException,
 )
+from .nodes import Constant, SubstituteVal, pathDelimiter  # noqa
+from .optimizer import optimize, specialize, static_value
+from .parser import parse as parse_native
+
+# Names that used to be defined here and now live in boolrule.grammar, which
+# is imported on first access.
+_GRAMMAR_NAMES = frozenset([
+    'identifier', 'propertyPath', 'and_', 'or_', 'in_', 'lparen', 'rparen',
+    'binaryOp', 'E', 'numberSign', 'realNumber', 'integer', 'str_', 'bool_',
+    'none_', 'simpleVals', 'propertyVal', 'boolExpression', 'boolCondition',
+])
+
+
+def __getattr__(name):
+    # type: (str) -> Any
+    if name in _GRAMMAR_NAMES:
+        from . import grammar
+        return getattr(grammar, name)
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name)
+    )
 
 
-class SubstituteVal(object):
-    """
-    Represents a token that will later be replaced by a context value.
+def parse_pyparsing(query):
+    # type: (str) -> Any
     """
+    Parse a query into a syntax tree using the pyparsing grammar, importing
+    pyparsing and building the grammar on first use.
 
-    def __init__(self, t):
-        # type: (List[Any]) -> None
-        self._path = t[0]
-
-    def get_val(self, context):
-        # type: (Any) -> Any
-        if not context:
-            raise MissingVariableException(
-                'context missing or empty'
-            )
-
-        val = context
-
-        try:
-            for part in self._path.split(pathDelimiter):
-                val = getattr(val, part) if hasattr(val, part) else val[part]
-
-        except KeyError:
-            raise MissingVariableException(
-                'no value supplied for {}'.format(self._path)
-            )
-
-        return val
-
-    def __repr__(self):
-        # type: () -> str
-        return 'SubstituteVal(%s)' % self._path
-
-
-# Grammar definition
-pathDelimiter = '.'
-identifier = Word(alphas, alphanums + "_")
-propertyPath = delimitedList(identifier, pathDelimiter, combine=True)
-
-and_ = Keyword("and", caseless=True)
-or_ = Keyword("or", caseless=True)
-in_ = Keyword("in", caseless=True)
-
-lparen = Suppress('(')
-rparen = Suppress(')')
+    :raises ParseError: if the query isn't a valid expression.
+    """
+    from .grammar import parse
+    return parse(query)
 
-binaryOp = oneOf(
-    "= == != < > >= <= eq ne lt le gt ge in notin is isnot "
-    "≠ ≤ ≥ ∈ ∉ ⊆ ⊇ ∩ not∩", caseless=True
-)('operator')
 
-E = CaselessLiteral("E")
-numberSign = Word("+-", exact=1)
-realNumber = Combine(
-    Optional(numberSign) + (
-        Word(nums) + "." + Optional(Word(nums))
-        | ("." + Word(nums))
-    ) + Optional(E + Optional(numberSign) + Word(nums))
-)
+PARSERS = {
+    'native': parse_native,
+    'pyparsing': parse_pyparsing,
+}
 
-integer = Combine(
-    Optional(numberSign) + Word(nums) + Optional(
-        E + Optional("+") + Word(nums)
-    )
-)
+# rule -> the prepared conditions of its syntax tree, for the evaluators
+# that walk the tree rather than running the compiled rule
+_PREPARED = WeakKeyDictionary()  # type: WeakKeyDictionary[Any, Any]
 
-str_ = quotedString.addParseAction(removeQuotes)
-bool_ = oneOf('true false', caseless=True)
-none_ = CaselessLiteral('none')
-
-simpleVals = (
-    realNumber.setParseAction(lambda toks: float(toks[0]))
-    | integer.setParseAction(lambda toks: int(toks[0]))
-    | str_
-    | bool_.setParseAction(lambda toks: toks[0] == 'true')
-    | none_.setParseAction(lambda toks: [None])  # see pyparsing bug 63
-    | propertyPath.setParseAction(lambda toks: SubstituteVal(toks))
-)  # need to add support for alg expressions
-
-propertyVal = (
-    simpleVals
-    | (lparen + Group(delimitedList(simpleVals)) + rparen)
-)
-boolExpression = Forward()
-boolCondition = Group(
-    (Group(propertyVal)('lval') + binaryOp + Group(propertyVal)('rval'))
-    | (lparen + boolExpression + rparen)
-)
-boolExpression << boolCondition + ZeroOrMore((and_ | or_) + boolExpression)
+# Lazy rules are compiled under one of these locks, chosen by query, so a
+# query is only parsed once however many threads first test it at the same
+# time, without every rule carrying a lock of its own.
+_COMPILE_LOCKS = tuple(threading.Lock() for _ in range(64))
 
 
 class BoolRule(object):
@@ -122,17 +70,116 @@ class BoolRule(object):
                  than immediately. This can help with performance if you
                  instantiate a lot of rules and only end up evaluating a
                  small handful.
+    :param parser: The parser used to compile the query: ``'native'`` (the
+                   default) for the hand-written parser or ``'pyparsing'`` for
+                   the original pyparsing grammar. Both accept the same
+                   language and produce the same result.
+    :param adaptive: If ``True``, record how expensive and how decisive each
+                     condition is while the rule is tested, and periodically
+                     reorder ``and``/``or`` operands so cheap, decisive ones
+                     are evaluated first. Operands are only reordered where
+                     this can't change the result or which exception is
+                     raised; see :mod:`boolrule.adaptive`.
+    :param codegen: If ``True``, evaluate the rule with a Python function
+                    generated and compiled for its query rather than with
+                    nested closures, which is faster for rules tested very
+                    often. Can't be combined with ``adaptive``; see
+                    :mod:`boolrule.codegen`.
+
+    Compiled queries are shared through :data:`boolrule.rule_cache`, so
+    creating a rule from a query that has already been seen doesn't parse it
+    again.
+
+    Rules can be tested from many threads at once, including on free-threaded
+    builds of Python. A lazy rule is compiled exactly once, by whichever
+    thread tests it first, and is never seen partly compiled.
     """
 
-    _compiled = False
-    _tokens = []  # type: List[Any]
+    __slots__ = (
+        '_query', '_parser', '_adaptive', '_codegen', '_compiled', '_ast',
+        '_evaluate', '__weakref__',
+    )
 
-    def __init__(self, query, lazy=False):
-        # type: (str, bool) -> None
-        self._query = query
+    if TYPE_CHECKING:
+        _ast = None  # type: Any
+        _evaluate = None  # type: Any
+
+    def __init__(
+        self,
+        query,  # type: str
+        lazy=False,  # type: bool
+        parser='native',  # type: str
+        adaptive=False,  # type: bool
+        codegen=False,  # type: bool
+    ):
+        # type: (...) -> None
+        if parser not in PARSERS:
+            raise ValueError("Unknown parser '{}'".format(parser))
+        if adaptive and codegen:
+            raise ValueError("adaptive and codegen can't be combined")
+
+        self._reset(query, parser, adaptive, codegen)
         if not lazy:
             self._compile()
 
+    @classmethod
+    def from_ast(cls, ast):
+        # type: (Any) -> BoolRule
+        """
+        Create a rule from a previously compiled syntax tree, as returned by
+        :attr:`ast`, without parsing anything.
+
+        Syntax trees are plain, picklable objects so they can be built once
+        and shipped with an application to avoid parsing at startup.
+        """
+        rule = cls.__new__(cls)
+        rule._reset(str(ast), 'native', False, False)
+        rule._load(ast)
+        return rule
+
+    def __getstate__(self):
+        # type: () -> Any
+        # Compiled rules are pickled as their encoded syntax tree so they can
+        # be loaded without parsing; see boolrule.serialize.
+        from .serialize import FORMAT_VERSION, encode
+
+        tree = encode(self._ast) if self._compiled else None
+        return {
+            'query': self._query,
+            'parser': self._parser,
+            'adaptive': self._adaptive,
+            'codegen': self._codegen,
+            'ast': (FORMAT_VERSION, tree),
+        }
+
+    def __setstate__(self, state):
+        # type: (Any) -> None
+        from .serialize import FORMAT_VERSION, decode
+
+        self._reset(
+            state['query'], state['parser'], state['adaptive'],
+            state.get('codegen', False),
+        )
+
+        version, tree = state['ast']
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                'Unsupported serialised rule version {!r}'.format(version)
+            )
+        if tree is not None:
+            self._load(decode(tree))
+
+    @property
+    def ast(self):
+        # type: () -> Any
+        """
+        The compiled syntax tree for the query, made up of the node types in
+        :mod:`boolrule.nodes`.
+        """
+        if not self._compiled:
+            self._compile()
+        return self._ast
+
     def test(self, context=None):
         # type: (Any) -> bool
         """
@@ -142,115 +189,172 @@ class BoolRule(object):
         :return: True if the expression succesfully evaluated against the
                  context, or False otherwise.
         """
-        if self._is_match_all():
-            return True
+        evaluate = self._evaluate
+        if evaluate is None:
+            self._compile()
+            evaluate = self._evaluate
+        return evaluate(context)  # type: ignore[no-any-return]
 
-        self._compile()
-        return self._test_tokens(self._tokens, context)
+    def test_async(self, context=None, prefetch=False):
+        # type: (Any, bool) -> Any
+        """
+        Test the expression against a context whose values may be awaitables
+        or async callables, which are only awaited if evaluation reaches
+        them. Requires Python 3.5 or later; see :mod:`boolrule.aio`.
 
-    def _is_match_all(self):
-        # type: () -> bool
-        return True if self._query == '*' else False
+        :param context: A dict context to evaluate the expression against.
+        :param prefetch: If ``True``, request the values of every condition
+                         in an ``and``/``or`` chain at once, even those a
+                         short-circuit may skip.
+        :return: An awaitable resolving to the result of the test.
+        """
+        from .aio import evaluate_async
+        return evaluate_async(
+            self.ast, context, self._prepared_conditions(), prefetch
+        )
 
-    def _compile(self):
-        # type: () -> None
-        if not self._compiled:
+    def test_batch(self, data):
+        # type: (Any) -> Any
+        """
+        Test the expression against every row of a batch of columnar data
+        using vectorised NumPy operations. Requires NumPy.
 
-            # special case match-all query
-            if self._is_match_all():
-                return
+        :param data: A pandas DataFrame, or a mapping of property paths to
+                     equal-length arrays.
+        :return: A boolean NumPy array with the result for each row.
+        """
+        from .vectorize import evaluate_columns
+        return evaluate_columns(self, data)
 
-            self._tokens = (
-                boolExpression.parseString(self._query, True)  # type: ignore
-            )
-            self._compiled = True
-
-    def _expand_val(self, val, context):
-        # type: (Any, Any) -> Any
-        if type(val) == list:
-            val = [self._expand_val(v, context) for v in val]
-
-        if isinstance(val, SubstituteVal):
-            ret = val.get_val(context)
-            return ret
-
-        if isinstance(val, ParseResults):
-            return [self._expand_val(x, context) for x in val.asList()]
-
-        return val
-
-    def _test_tokens(self, tokens, context):
-        # type: (List[Any], Any) -> bool
-        passed = False
-
-        for token in tokens:
-            if not isinstance(token, ParseResults):
-                if token == 'or' and passed:
-                    return True
-                elif token == 'and' and not passed:
-                    return False
-                continue
-
-            if not token.getName():  # type: ignore
-                passed = self._test_tokens(token, context)  # type: ignore
-                continue
-
-            items = token.asDict()
-
-            operator = items['operator']
-            lval = self._expand_val(items['lval'][0], context)
-            rval = self._expand_val(items['rval'][0], context)
-
-            if operator in ('=', '==', 'eq'):
-                passed = lval == rval
-            elif operator in ('!=', 'ne', '≠'):
-                passed = lval != rval
-            elif operator in ('>', 'gt'):
-                passed = lval > rval
-            elif operator in ('>=', 'ge', '≥'):
-                passed = lval >= rval
-            elif operator in ('<', 'lt'):
-                passed = lval < rval
-            elif operator in ('<=', 'le', '≤'):
-                passed = lval <= rval
-            elif operator in ('in', '∈'):
-                passed = lval in rval
-            elif operator in ('notin', '∉'):
-                passed = lval not in rval
-            elif operator == 'is':
-                passed = lval is rval
-            elif operator == 'isnot':
-                passed = lval is not rval
-            elif operator == '⊆':
-                passed = all((False for x in lval if x not in rval))
-            elif operator == '⊇':
-                passed = all((False for x in rval if x not in lval))
-            elif operator == '∩':
-                passed = any((True for x in lval if x in rval))
-            elif operator == 'not∩':
-                passed = not any((True for x in lval if x in rval))
-            else:
-                raise UnknownOperatorException(
-                    "Unknown operator '{}'".format(operator)
-                )
-
-        return passed
-
-
-class MissingVariableException(Exception):
-    """
-    Raised when an expression contains a property path that's not supplied in
-    the context.
-    """
-    pass
+    def explain(self, context=None):
+        # type: (Any) -> Any
+        """
+        Test the expression against the given context, returning an
+        :class:`~boolrule.trace.Explanation` of which conditions were
+        evaluated, the values they compared, which one decided the result and
+        how long each took. Exceptions are recorded in the explanation rather
+        than raised.
 
+        :param context: A dict context to evaluate the expression against.
+        """
+        from .trace import explain
+        return explain(self.ast, context, prepared=self._prepared_conditions())
 
-class UnknownOperatorException(Exception):
-    """
-    Raised when an expression uses an unknown operator.
+    def trace(self, profiler):
+        # type: (Any) -> Any
+        """
+        Return a function that tests the rule like :meth:`test`, recording
+        every test made through it in a :class:`~boolrule.trace.Profiler`.
 
-    This should never be thrown since the operator won't be correctly parsed as
-    a token by pyparsing, but it's useful to have this hanging around for when
-    additional operators are being added.
-    """
-    pass
+        The rule itself isn't changed, so :meth:`test` still runs the
+        compiled evaluator, on any thread, and isn't recorded. Traced tests
+        run a slower, instrumented evaluator. See :mod:`boolrule.trace`.
+        """
+        from .trace import TracingEvaluator
+        return TracingEvaluator(self, profiler)
+
+    def analyze(self):
+        # type: () -> Any
+        """
+        Return the :class:`~boolrule.analysis.Dependencies` of the rule: the
+        property paths it looks up, as a list and as a prefix tree, the
+        operators and literals it uses and an estimate of its cost. See
+        :mod:`boolrule.analysis`.
+        """
+        from .analysis import analyze
+        return analyze(self.ast)
+
+    def specialize(self, partial_context):
+        # type: (Any) -> BoolRule
+        """
+        Return a new rule for contexts that all contain ``partial_context``,
+        such as configuration that's fixed for the life of a process.
+
+        Property paths that can be resolved from the partial context are
+        replaced by their values and any conditions this decides are folded
+        away, leaving a rule that only depends on the remaining paths. Its
+        :attr:`ast` shows what's left, and :attr:`static_result` whether the
+        partial context alone decides it. Tested against a full context, the
+        new rule gives the same result as this one.
+
+        :param partial_context: The part of the context that's known.
+        """
+        rule = type(self).__new__(type(self))
+        ast = specialize(self.ast, partial_context)
+        rule._reset(str(ast), 'native', self._adaptive, self._codegen)
+        rule._load(ast)
+        return rule
+
+    @property
+    def static_result(self):
+        # type: () -> Any
+        """
+        ``True`` or ``False`` if the query passes or fails regardless of the
+        context, such as ``*`` or ``1 = 1 or x > 3``, otherwise ``None``.
+        """
+        static, value = static_value(self.ast)
+        return bool(value) if static else None
+
+    def _is_match_all(self):
+        # type: () -> bool
+        return self.static_result is True
+
+    def _prepared_conditions(self):
+        # type: () -> Any
+        prepared = _PREPARED.get(self)
+        if prepared is None:
+            prepared = _PREPARED[self] = prepare_conditions(self.ast)
+        return prepared
+
+    def _reset(self, query, parser, adaptive, codegen):
+        # type: (str, str, bool, bool) -> None
+        self._query = query
+        self._parser = parser
+        self._adaptive = adaptive
+        self._codegen = codegen
+        self._compiled = False
+        self._ast = None
+        self._evaluate = None
+
+    def _compile(self):
+        # type: () -> None
+        if self._compiled:
+            return
+        # The parsers don't accept exactly the same queries, so each one's
+        # results are cached separately
+        key = (self._parser, self._query)
+        with _COMPILE_LOCKS[hash(key) % len(_COMPILE_LOCKS)]:
+            if not self._compiled:
+                compiled = rule_cache.get(key)
+                if compiled is None:
+                    compiled = self._parse()
+                    rule_cache.put(key, compiled)
+                self._set_compiled(compiled)
+
+    def _load(self, ast):
+        # type: (Any) -> None
+        self._set_compiled(compile_rule(optimize(ast)))
+
+    def _set_compiled(self, compiled):
+        # type: (CompiledRule) -> None
+        ast, evaluate = compiled
+        if self._adaptive:
+            from .adaptive import AdaptiveEvaluator
+            evaluate = AdaptiveEvaluator(ast)
+        elif self._codegen:
+            from .codegen import generate
+            evaluate = generate(ast)
+        # Publish the evaluator only once it's complete, and mark the rule
+        # compiled last, so other threads never see it half-initialised.
+        self._ast = ast
+        self._evaluate = evaluate
+        self._compiled = True
+
+    def _parse(self):
+        # type: () -> CompiledRule
+
+        # special case match-all query
+        if self._query == '*':
+            return compile_rule(Constant(True))
+
+        return compile_rule(optimize(PARSERS[self._parser](self._query)))
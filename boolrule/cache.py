@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide cache of compiled rules keyed by parser and query string.
+
+Compiled rules are immutable, so a single compiled instance can safely be
+shared by every :class:`~boolrule.BoolRule` created from the same query.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Any, Optional  # noqa
+
+CacheStats = namedtuple(
+    'CacheStats', 'hits misses evictions size maxsize'
+)
+CacheStats.__doc__ = """
+Counters describing a :class:`RuleCache`.
+
+:ivar hits: The number of lookups that found a compiled rule.
+:ivar misses: The number of lookups that didn't.
+:ivar evictions: The number of entries evicted to make room for others.
+:ivar size: The number of entries held.
+:ivar maxsize: The maximum number of entries, or ``None`` if unbounded.
+"""
+
+_MISSING = object()
+
+
+class RuleCache(object):
+    """
+    A thread-safe, bounded LRU mapping of ``(parser, query)`` pairs to
+    compiled rules.
+
+    :param maxsize: The maximum number of entries to hold before evicting the
+                    least recently used one. ``None`` means unbounded and
+                    ``0`` disables caching altogether.
+    """
+
+    def __init__(self, maxsize=8192):
+        # type: (Optional[int]) -> None
+        self._validate(maxsize)
+        self._maxsize = maxsize
+        self._entries = OrderedDict()  # type: OrderedDict[Any, Any]
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def maxsize(self):
+        # type: () -> Optional[int]
+        return self._maxsize
+
+    @property
+    def stats(self):
+        # type: () -> CacheStats
+        """
+        A :class:`~boolrule.cache.CacheStats` snapshot of the cache's
+        counters.
+        """
+        with self._lock:
+            return CacheStats(
+                self._hits,
+                self._misses,
+                self._evictions,
+                len(self._entries),
+                self._maxsize,
+            )
+
+    def get(self, key):
+        # type: (Any) -> Any
+        """
+        Return the entry cached for ``key``, marking it as most recently
+        used, or ``None`` if there isn't one.
+        """
+        with self._lock:
+            value = self._entries.pop(key, _MISSING)
+            if value is _MISSING:
+                self._misses += 1
+                return None
+            self._entries[key] = value
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        # type: (Any, Any) -> None
+        """
+        Cache ``value`` for ``key``, evicting the least recently used entries
+        if the cache is full.
+        """
+        with self._lock:
+            if self._maxsize == 0:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            self._evict()
+
+    def clear(self):
+        # type: () -> None
+        """
+        Remove every entry and reset the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    def resize(self, maxsize):
+        # type: (Optional[int]) -> None
+        """
+        Change the maximum size of the cache, evicting the least recently used
+        entries if it now holds too many.
+        """
+        self._validate(maxsize)
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+    def _evict(self):
+        # type: () -> None
+        if self._maxsize is None:
+            return
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    @staticmethod
+    def _validate(maxsize):
+        # type: (Optional[int]) -> None
+        if maxsize is not None and maxsize < 0:
+            raise ValueError('maxsize must be None or a non-negative integer')
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # type: (Any) -> bool
+        return key in self._entries
+
+
+#: The cache shared by every :class:`~boolrule.BoolRule` in the process.
+rule_cache = RuleCache()
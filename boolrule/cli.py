@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Evaluate rules over a stream of records from the command line::
+
+    python -m boolrule -e 'user.age >= 18' events.jsonl > adults.jsonl
+    python -m boolrule -r adult 'age >= 18' -r gb 'country = "GB"' \\
+        --output columns --format csv people.csv
+
+Records are read one at a time from newline-delimited JSON or CSV, from a file
+or stdin, and results are written in batches, so files of any size are
+processed in constant memory. By default the records that match any rule are
+written out unchanged; ``--output columns`` writes one true/false column per
+rule for every record instead. ``--workers`` spreads records across a pool of
+processes with :func:`~boolrule.bulk_match`.
+
+Throughput statistics are printed to stderr at the end.
+"""
+import argparse
+import csv
+import io
+import json
+import re
+import sys
+from collections import OrderedDict, deque
+from timeit import default_timer
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple  # noqa
+
+from .boolrule import BoolRule
+from .exceptions import ParseError
+from .nodes import pathDelimiter
+from .parallel import BulkResult, bulk_match
+from .ruleset import RuleSet
+
+_BUFFER_SIZE = 1 << 16
+
+# A record as read, to be written out again, paired with its context.
+Record = Tuple[Any, Any]
+
+# The CSV values converted to numbers. Anything else that int() or float()
+# would accept, like "inf", "nan", "1_000" or " 42 ", stays a string.
+_INTEGER = re.compile(r'[+-]?[0-9]+\Z')
+_FLOAT = re.compile(
+    r'[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?\Z'
+)
+
+
+class _InputError(ValueError):
+    """Raised when a record can't be read."""
+
+
+def main(argv=None):
+    # type: (Optional[List[str]]) -> int
+    """Run the command line interface, returning the exit status."""
+    parser = _argument_parser()
+    args = parser.parse_args(argv)
+
+    rules = OrderedDict()  # type: Dict[str, BoolRule]
+    for rule in args.rules or []:
+        # Expressions are named by their query
+        name, query = (rule, rule) if isinstance(rule, str) else rule
+        try:
+            rules[name] = BoolRule(query)
+        except ParseError as e:
+            parser.error('invalid rule {!r}: {}'.format(name, e))
+    if not rules:
+        parser.error('at least one rule is required')
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be at least 1')
+
+    format_ = args.format or (
+        'csv' if args.input.lower().endswith('.csv') else 'jsonl'
+    )
+    stdin = args.input == '-'
+    if stdin:
+        # Decoded as files are, keeping newlines inside quoted CSV fields
+        source = io.TextIOWrapper(
+            sys.stdin.buffer, encoding='utf-8', newline=''
+        )
+    else:
+        source = _open(args.input)
+    try:
+        return _run(args, rules, format_, source, sys.stdout, sys.stderr)
+    finally:
+        if stdin:
+            # Leave sys.stdin open
+            source.detach()
+        else:
+            source.close()
+
+
+def _argument_parser():
+    # type: () -> argparse.ArgumentParser
+    parser = argparse.ArgumentParser(
+        prog='boolrule',
+        description='Evaluate rules over newline-delimited JSON or CSV '
+                    'records.',
+    )
+    parser.add_argument(
+        'input', nargs='?', default='-',
+        help='the file to read, or - for stdin (the default)',
+    )
+    parser.add_argument(
+        '-e', '--expression', dest='rules', action='append',
+        metavar='QUERY',
+        help='a rule to evaluate, named by its query; may be repeated',
+    )
+    parser.add_argument(
+        '-r', '--rule', dest='rules', action='append', nargs=2,
+        metavar=('NAME', 'QUERY'),
+        help='a named rule to evaluate; may be repeated',
+    )
+    parser.add_argument(
+        '--format', choices=['jsonl', 'csv'],
+        help='the input format, by default csv for .csv files and jsonl '
+             'otherwise',
+    )
+    parser.add_argument(
+        '--output', choices=['matches', 'columns'], default='matches',
+        help='write the records matching any rule (the default), or a '
+             'true/false column per rule for every record',
+    )
+    parser.add_argument(
+        '--no-infer-types', dest='infer_types', action='store_false',
+        help='keep CSV values as strings rather than converting numbers '
+             'and true/false',
+    )
+    parser.add_argument(
+        '--workers', type=int, default=0,
+        help='evaluate records on this many worker processes',
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=1000,
+        help='records read, sent to a worker or written at a time',
+    )
+    parser.add_argument(
+        '--no-stats', dest='stats', action='store_false',
+        help="don't print throughput statistics to stderr",
+    )
+    return parser
+
+
+def _open(path):
+    # type: (str) -> Any
+    return io.open(
+        path, 'r', encoding='utf-8', newline='', buffering=_BUFFER_SIZE
+    )
+
+
+def _run(args, rules, format_, source, out, err):
+    # type: (Any, Dict[str, BoolRule], str, Any, Any, Any) -> int
+    started = default_timer()
+    if format_ == 'csv':
+        reader = _CsvReader(source, args.infer_types)  # type: Any
+    else:
+        reader = _JsonReader(source)
+    writer = _writer(format_, args.output, list(rules), reader, out)
+
+    # Records read but not yet matched, so they can be written out with
+    # their results; bounded by the number of chunks in flight.
+    pending = deque()  # type: Any
+    failures = []  # type: List[_InputError]
+
+    def contexts():
+        # type: () -> Iterator[Any]
+        try:
+            for record, context in reader:
+                pending.append(record)
+                yield context
+        except _InputError as e:
+            # End the stream instead of raising through bulk_match(), so the
+            # records before the bad one are written whatever the workers
+            failures.append(e)
+
+    if args.workers > 1:
+        results = bulk_match(
+            rules, contexts(), workers=args.workers,
+            chunk_size=args.chunk_size,
+        )  # type: Iterable[BulkResult]
+    else:
+        results = _match(RuleSet(rules), contexts())
+
+    counts = OrderedDict((name, 0) for name in rules)
+    records = errors = 0
+    batch = []  # type: List[Any]
+    try:
+        for result in results:
+            record = pending.popleft()
+            records += 1
+            if result.error is not None:
+                errors += 1
+            for name in result.matched:
+                counts[name] += 1
+            writer.add(batch, record, result)
+            if len(batch) >= args.chunk_size:
+                writer.flush(batch)
+    finally:
+        writer.flush(batch)
+        out.flush()
+
+    if failures:
+        err.write('boolrule: {}\n'.format(failures[0]))
+        return 1
+
+    if args.stats:
+        _print_stats(err, records, errors, counts, default_timer() - started)
+    return 0
+
+
+def _match(ruleset, contexts):
+    # type: (RuleSet, Iterable[Any]) -> Iterator[BulkResult]
+    """Match contexts in this process, as :func:`bulk_match` would."""
+    for context in contexts:
+        errors = OrderedDict()  # type: Dict[Any, Exception]
+        matched = ruleset.match(context, errors=errors)
+        yield BulkResult(matched, next(iter(errors.values()), None), errors)
+
+
+def _print_stats(err, records, errors, counts, seconds):
+    # type: (Any, int, int, Dict[str, int], float) -> None
+    rate = records / seconds if seconds else float('inf')
+    err.write('{} records in {:.2f}s ({:.0f} records/s), {} errors\n'.format(
+        records, seconds, rate, errors
+    ))
+    for name, count in counts.items():
+        err.write('  {}: {} matched\n'.format(name, count))
+
+
+class _JsonReader(object):
+    """Reads newline-delimited JSON objects, skipping blank lines."""
+
+    def __init__(self, source):
+        # type: (Any) -> None
+        self._source = source
+
+    def __iter__(self):
+        # type: () -> Iterator[Record]
+        for number, line in enumerate(self._source, 1):
+            if not line.strip():
+                continue
+            try:
+                context = json.loads(line)
+            except ValueError as e:
+                raise _InputError('invalid JSON on line {}: {}'.format(
+                    number, e
+                ))
+            yield line, context
+
+
+class _CsvReader(object):
+    """
+    Reads CSV records with a header row. Columns named with a dotted path,
+    like ``user.age``, are nested in the context as they would be in JSON.
+    """
+
+    def __init__(self, source, infer_types):
+        # type: (Any, bool) -> None
+        self._rows = csv.reader(source)
+        self._infer_types = infer_types
+        self.header = next(self._rows, [])
+        self._paths = [name.split(pathDelimiter) for name in self.header]
+
+    def __iter__(self):
+        # type: () -> Iterator[Record]
+        convert = _convert if self._infer_types else _identity
+        for row in self._rows:
+            context = {}  # type: Dict[str, Any]
+            for parts, value in zip(self._paths, row):
+                parent = context
+                for part in parts[:-1]:
+                    parent = parent.setdefault(part, {})
+                parent[parts[-1]] = convert(value)
+            yield row, context
+
+
+def _convert(value):
+    # type: (str) -> Any
+    """Convert a CSV value that looks like a number or boolean."""
+    lowered = value.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    if _INTEGER.match(value):
+        return int(value)
+    if _FLOAT.match(value):
+        return float(value)
+    return value
+
+
+def _identity(value):
+    # type: (str) -> Any
+    return value
+
+
+def _writer(format_, output, names, reader, out):
+    # type: (str, str, List[str], Any, Any) -> Any
+    if format_ == 'csv':
+        return _CsvWriter(output, names, reader.header, out)
+    return _JsonWriter(output, names, out)
+
+
+class _JsonWriter(object):
+
+    def __init__(self, output, names, out):
+        # type: (str, List[str], Any) -> None
+        self._columns = output == 'columns'
+        self._names = names
+        self._out = out
+
+    def add(self, batch, record, result):
+        # type: (List[Any], Any, BulkResult) -> None
+        if self._columns:
+            matched, errors = result.matched, result.errors
+            batch.append(json.dumps(OrderedDict(
+                (name, None if name in errors else name in matched)
+                for name in self._names
+            )) + '\n')
+        elif result.matched:
+            batch.append(record if record.endswith('\n') else record + '\n')
+
+    def flush(self, batch):
+        # type: (List[Any]) -> None
+        self._out.write(''.join(batch))
+        del batch[:]
+
+
+class _CsvWriter(object):
+
+    def __init__(self, output, names, header, out):
+        # type: (str, List[str], List[str], Any) -> None
+        self._columns = output == 'columns'
+        self._names = names
+        self._writer = csv.writer(out, lineterminator='\n')
+        # Written up front, so input without rows still gives a valid CSV
+        header = names if self._columns else header
+        if header:
+            self._writer.writerow(header)
+
+    def add(self, batch, record, result):
+        # type: (List[Any], Any, BulkResult) -> None
+        if self._columns:
+            matched, errors = result.matched, result.errors
+            batch.append([
+                '' if name in errors else str(name in matched).lower()
+                for name in self._names
+            ])
+        elif result.matched:
+            batch.append(record)
+
+    def flush(self, batch):
+        # type: (List[Any]) -> None
+        self._writer.writerows(batch)
+        del batch[:]
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Generate a specialised Python function for a syntax tree.
+
+The closures built by ``boolrule.compiler`` cost a few Python calls per
+condition. For hot rules, :func:`generate` instead emits the source of a
+function with comparisons written inline, property paths looked up with
+direct subscripts of plain dicts, and ``and``/``or`` chains as straight-line
+code returning as soon as the result is known. The source is compiled with
+``compile()`` once per distinct syntax tree, and the function is shared by
+every rule with that tree.
+
+Nothing from the query is ever written into the source: literals, path
+segments and operator implementations are all passed in through the
+function's globals and referred to by generated names, so string literals
+and identifiers can't inject code. Use :func:`source` to see what's
+generated for a rule.
+
+The generated function only handles contexts that are non-empty plain dicts
+itself. Any other context, and any path whose value isn't a plain dict all
+the way down, is handed to the closure-based evaluator or to
+:meth:`SubstituteVal.get_val <boolrule.nodes.SubstituteVal.get_val>`, so
+results and exceptions, including
+:class:`~boolrule.MissingVariableException`, are the same as without code
+generation.
+"""
+from typing import Any, Dict, List, Tuple  # noqa
+from weakref import WeakValueDictionary
+
+from .compiler import (  # noqa
+    OPERATORS,
+    Evaluator,
+    compile_node,
+    resolve_operator,
+)
+from .exceptions import UnknownOperatorException
+from .nodes import BoolOp, Collection, Condition, Constant, SubstituteVal
+
+# Canonical operators that are written inline, as source operators.
+_INLINE = {
+    '==': '==',
+    '!=': '!=',
+    '>': '>',
+    '>=': '>=',
+    '<': '<',
+    '<=': '<=',
+    'is': 'is',
+    'isnot': 'is not',
+    'in': 'in',
+    'notin': 'not in',
+}  # type: Dict[str, str]
+
+# syntax tree -> the function generated for it, while any rule uses it
+_GENERATED = WeakValueDictionary()  # type: WeakValueDictionary[Any, Any]
+
+
+def generate(ast):
+    # type: (Any) -> Evaluator
+    """
+    Return a function evaluating a syntax tree against a context, compiled
+    from generated source.
+
+    The source is available as the function's ``source`` attribute.
+
+    :raises UnknownOperatorException: if the tree uses an unknown operator.
+    """
+    evaluate = _GENERATED.get(ast)
+    if evaluate is None:
+        text, namespace = _Generator(ast).module()
+        code = compile(text, '<boolrule codegen>', 'exec')
+        exec(code, namespace)
+        evaluate = namespace['evaluate']
+        evaluate.source = text
+        _GENERATED[ast] = evaluate
+    return evaluate  # type: ignore[no-any-return]
+
+
+def source(rule):
+    # type: (Any) -> str
+    """
+    Return the source generated for a :class:`~boolrule.BoolRule` or a
+    syntax tree, for debugging.
+    """
+    return _Generator(getattr(rule, 'ast', rule)).module()[0]
+
+
+class _Generator(object):
+    """
+    Writes the source for one syntax tree, with a function for the tree and
+    one for each ``and``/``or`` chain nested inside it.
+    """
+
+    def __init__(self, ast):
+        # type: (Any) -> None
+        self._ast = ast
+        self._namespace = {}  # type: Dict[str, Any]
+        self._names = {}  # type: Dict[Tuple[str, Any], str]
+        self._functions = []  # type: List[List[str]]
+        self._values = 0
+
+    def module(self):
+        # type: () -> Tuple[str, Dict[str, Any]]
+        fallback = self._name('fallback', compile_node(self._ast))
+        body = self._body(self._ast)
+        lines = [
+            'def evaluate(context):',
+            '    if context.__class__ is not dict or not context:',
+            '        return {}(context)'.format(fallback),
+        ] + body
+        functions = ['\n'.join(lines)] + [
+            '\n'.join(function) for function in self._functions
+        ]
+        return '\n\n\n'.join(functions) + '\n', self._namespace
+
+    def _name(self, kind, value):
+        # type: (str, Any) -> str
+        """
+        Pass a value to the generated code through its globals, returning
+        the name it's bound to.
+        """
+        key = (kind, _identity(value))
+        name = self._names.get(key)
+        if name is None:
+            name = self._names[key] = '{}{}'.format(kind, len(self._names))
+            self._namespace[name] = value
+        return name
+
+    def _body(self, node):
+        # type: (Any) -> List[str]
+        """The statements of a function returning the value of ``node``."""
+        if isinstance(node, BoolOp):
+            return self._chain(node)
+        if isinstance(node, Condition):
+            lines, expression = self._condition(node)
+            return lines + ['    return ' + expression]
+        if isinstance(node, Constant):
+            return ['    return ' + self._name('constant', node.value)]
+        raise TypeError('Cannot compile {!r}'.format(node))
+
+    def _chain(self, node):
+        # type: (BoolOp) -> List[str]
+        if node.operator not in ('and', 'or'):
+            raise UnknownOperatorException(
+                "Unknown operator '{}'".format(node.operator)
+            )
+        # Mirror the closures: a chain returns its deciding value as a bool,
+        # and a pair returns its second operand as it is.
+        decided = 'if passed:' if node.operator == 'or' else 'if not passed:'
+        last = len(node.operands) - 1
+
+        lines = []  # type: List[str]
+        for i, operand in enumerate(node.operands):
+            if isinstance(operand, Condition):
+                fetch, expression = self._condition(operand)
+                lines.extend(fetch)
+            else:
+                expression = self._operand(operand)
+
+            if i == last and last == 1:
+                lines.append('    return ' + expression)
+            else:
+                lines.append('    passed = ' + expression)
+                lines.append('    ' + decided)
+                lines.append('        return {}'.format(
+                    node.operator == 'or'
+                ))
+        if last != 1:
+            lines.append('    return passed')
+        return lines
+
+    def _operand(self, node):
+        # type: (Any) -> str
+        """An expression for an operand of a chain that isn't a condition."""
+        if isinstance(node, Constant):
+            return self._name('constant', node.value)
+
+        name = 'group{}'.format(len(self._functions))
+        function = ['def {}(context):'.format(name)]
+        self._functions.append(function)
+        function.extend(self._body(node))
+        return '{}(context)'.format(name)
+
+    def _condition(self, node):
+        # type: (Condition) -> Tuple[List[str], str]
+        """
+        Return the statements fetching a condition's property paths, and an
+        expression for its result.
+        """
+        op = resolve_operator(node)
+        lines = []  # type: List[str]
+        lval = self._value(node.lval, lines)
+        rval = self._value(node.rval, lines)
+
+        if op is OPERATORS.get(node.operator) and node.operator in _INLINE:
+            return lines, '{} {} {}'.format(
+                lval, _INLINE[node.operator], rval
+            )
+        return lines, '{}({}, {})'.format(
+            self._name('operator', op), lval, rval
+        )
+
+    def _value(self, node, lines):
+        # type: (Any, List[str]) -> str
+        if isinstance(node, Constant):
+            return self._name('constant', node.value)
+
+        if isinstance(node, SubstituteVal):
+            return self._path(node, lines)
+
+        if isinstance(node, Collection):
+            if all(isinstance(item, Constant) for item in node.items):
+                return self._name(
+                    'constant', [item.value for item in node.items]
+                )
+            return '[{}]'.format(', '.join(
+                self._value(item, lines) for item in node.items
+            ))
+
+        raise TypeError('Cannot compile {!r}'.format(node))
+
+    def _path(self, node, lines):
+        # type: (SubstituteVal, List[str]) -> str
+        """
+        Write statements looking up a path in the context, returning the
+        variable holding its value.
+        """
+        value = 'value{}'.format(self._values)
+        self._values += 1
+        get = '{} = {}(context)'.format(
+            value, self._name('path', node.get_val)
+        )
+
+        segments = node._segments
+        if not all(subscript for _, subscript, _ in segments):
+            lines.append('    ' + get)
+            return value
+
+        lines.append('    try:')
+        lines.append('        {} = context[{}]'.format(
+            value, self._name('segment', segments[0][0])
+        ))
+        # Descend while the values are plain dicts, otherwise start again
+        # with the general lookup.
+        otherwise = []  # type: List[str]
+        indent = '        '
+        for part, _, _ in segments[1:]:
+            lines.append(indent + 'if {}.__class__ is dict:'.format(value))
+            lines.append(indent + '    {0} = {0}[{1}]'.format(
+                value, self._name('segment', part)
+            ))
+            otherwise[:0] = [indent + 'else:', indent + '    ' + get]
+            indent += '    '
+        lines.extend(otherwise)
+        lines.append('    except KeyError:')
+        lines.append('        ' + get)
+        return value
+
+
+def _identity(value):
+    # type: (Any) -> Any
+    """
+    A key that tells values apart by type as well as equality, so ``1`` and
+    ``True`` aren't bound to the same name.
+    """
+    try:
+        hash(value)
+    except TypeError:
+        return id(value)
+    return type(value), value
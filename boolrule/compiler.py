@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""
+Compiles a syntax tree from :mod:`boolrule.nodes` into nested closures.
+
+All of the work that doesn't depend on the context -- resolving operators,
+expanding literal collections and choosing how to fetch each operand -- is
+done once here, so evaluating a compiled rule is just a handful of plain
+Python calls.
+"""
+import operator
+from collections import namedtuple
+from typing import Any, Callable, Dict, FrozenSet, List, Tuple  # noqa
+from weakref import WeakValueDictionary
+
+from .exceptions import UnknownOperatorException
+from .nodes import BoolOp, Collection, Condition, Constant, SubstituteVal
+
+Evaluator = Callable[[Any], Any]
+Operator = Callable[[Any, Any], Any]
+OperatorFactory = Callable[[FrozenSet[Any], Operator], Operator]
+
+#: A syntax tree paired with the evaluator compiled from it.
+CompiledRule = namedtuple('CompiledRule', 'ast evaluate')
+
+#: A condition's operator, as returned by :func:`resolve_operator`, and its
+#: operands as compiled: ``lconst`` and ``rconst`` say whether ``lval`` and
+#: ``rval`` are values, or functions fetching the value from a context.
+PreparedCondition = namedtuple(
+    'PreparedCondition', 'operator lconst lval rconst rval'
+)
+
+# condition or logical operator -> its evaluator, while any compiled rule
+# uses it. The evaluator's ``node`` is the instance every such rule shares.
+_CONDITIONS = WeakValueDictionary()  # type: WeakValueDictionary[Any, Any]
+_BOOL_OPS = WeakValueDictionary()  # type: WeakValueDictionary[Any, Any]
+
+
+def _in(lval, rval):
+    # type: (Any, Any) -> bool
+    return lval in rval
+
+
+def _not_in(lval, rval):
+    # type: (Any, Any) -> bool
+    return lval not in rval
+
+
+def _subset(lval, rval):
+    # type: (Any, Any) -> bool
+    if type(rval) in _SEQUENCES:
+        try:
+            return frozenset(rval).issuperset(lval)
+        except TypeError:
+            pass
+    return all((False for x in lval if x not in rval))
+
+
+def _superset(lval, rval):
+    # type: (Any, Any) -> bool
+    if type(lval) in _SEQUENCES:
+        try:
+            return frozenset(lval).issuperset(rval)
+        except TypeError:
+            pass
+    return all((False for x in rval if x not in lval))
+
+
+def _intersects(lval, rval):
+    # type: (Any, Any) -> bool
+    if type(rval) in _SEQUENCES:
+        try:
+            return not frozenset(rval).isdisjoint(lval)
+        except TypeError:
+            pass
+    return any((True for x in lval if x in rval))
+
+
+def _not_intersects(lval, rval):
+    # type: (Any, Any) -> bool
+    return not _intersects(lval, rval)
+
+
+# Containers whose membership test is equivalent to that of a set of their
+# items, provided the items are hashable.
+_SEQUENCES = frozenset([list, tuple])
+
+
+# Canonical operator -> implementation taking the expanded lval and rval.
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    'in': _in,
+    'notin': _not_in,
+    'is': operator.is_,
+    'isnot': operator.is_not,
+    '⊆': _subset,
+    '⊇': _superset,
+    '∩': _intersects,
+    'not∩': _not_intersects,
+}  # type: Dict[str, Operator]
+
+
+# The types whose instances hash consistently with their equality to any
+# literal, so a frozenset of literals finds them if and only if comparing
+# them to each literal would. Instances of other types, like str enums or
+# objects defining __eq__, are only looked up in the frozenset to find a
+# match quickly, and otherwise compared to each literal.
+_BUILTIN_HASHABLES = frozenset([str, int, float, bool, type(None), tuple])
+
+
+def _hashed_in(hashed, fallback):
+    # type: (FrozenSet[Any], Operator) -> Operator
+    def in_(lval, rval):
+        # type: (Any, Any) -> Any
+        try:
+            if lval in hashed:
+                return True
+        except TypeError:
+            return fallback(lval, rval)
+        return type(lval) not in _BUILTIN_HASHABLES and fallback(lval, rval)
+
+    return in_
+
+
+def _hashed_not_in(hashed, fallback):
+    # type: (FrozenSet[Any], Operator) -> Operator
+    def not_in(lval, rval):
+        # type: (Any, Any) -> Any
+        try:
+            if lval in hashed:
+                return False
+        except TypeError:
+            return fallback(lval, rval)
+        return type(lval) in _BUILTIN_HASHABLES or fallback(lval, rval)
+
+    return not_in
+
+
+def _hashed_subset(hashed, fallback):
+    # type: (FrozenSet[Any], Operator) -> Operator
+    def subset(lval, rval):
+        # type: (Any, Any) -> Any
+        try:
+            return hashed.issuperset(lval)
+        except TypeError:
+            return fallback(lval, rval)
+
+    return subset
+
+
+def _hashed_superset(hashed, fallback):
+    # type: (FrozenSet[Any], Operator) -> Operator
+    def superset(lval, rval):
+        # type: (Any, Any) -> Any
+        try:
+            return hashed.issuperset(rval)
+        except TypeError:
+            return fallback(lval, rval)
+
+    return superset
+
+
+def _hashed_intersects(hashed, fallback):
+    # type: (FrozenSet[Any], Operator) -> Operator
+    def intersects(lval, rval):
+        # type: (Any, Any) -> Any
+        try:
+            return not hashed.isdisjoint(lval)
+        except TypeError:
+            return fallback(lval, rval)
+
+    return intersects
+
+
+def _hashed_not_intersects(hashed, fallback):
+    # type: (FrozenSet[Any], Operator) -> Operator
+    def not_intersects(lval, rval):
+        # type: (Any, Any) -> Any
+        try:
+            return hashed.isdisjoint(lval)
+        except TypeError:
+            return fallback(lval, rval)
+
+    return not_intersects
+
+
+# Canonical operator -> (whether the literal collection searched by the
+# operator is its lval, factory for a version searching a frozenset of it).
+# Whenever the frozenset can't be used -- an unhashable value was looked up
+# in it -- the factories fall back to the plain implementation.
+_HASHED_OPERATORS = {
+    'in': (False, _hashed_in),
+    'notin': (False, _hashed_not_in),
+    '⊆': (False, _hashed_subset),
+    '⊇': (True, _hashed_superset),
+    '∩': (False, _hashed_intersects),
+    'not∩': (False, _hashed_not_intersects),
+}  # type: Dict[str, Tuple[bool, OperatorFactory]]
+
+
+def resolve_operator(node):
+    # type: (Condition) -> Operator
+    """
+    Return the implementation of a condition's operator, specialised for the
+    condition's operands where possible.
+
+    Membership and set operators searching a collection of literals look
+    values up in a frozenset of the literals, built once, rather than
+    scanning a list.
+
+    :raises UnknownOperatorException: if the operator isn't supported.
+    """
+    try:
+        op = OPERATORS[node.operator]
+    except KeyError:
+        raise UnknownOperatorException(
+            "Unknown operator '{}'".format(node.operator)
+        )
+
+    hashed = _HASHED_OPERATORS.get(node.operator)
+    if hashed is None:
+        return op
+
+    searches_lval, factory = hashed
+    searched = node.lval if searches_lval else node.rval
+    if not (
+        isinstance(searched, Collection) and
+        all(isinstance(item, Constant) for item in searched.items)
+    ):
+        return op
+
+    try:
+        values = frozenset(item.value for item in searched.items)
+    except TypeError:
+        return op
+    return factory(values, op)
+
+
+def compile_rule(ast):
+    # type: (Any) -> CompiledRule
+    """
+    Compile a syntax tree into a :class:`CompiledRule`.
+
+    Conditions and ``and``/``or`` operators equal to ones in a rule that's
+    already compiled are replaced by that rule's, so the returned tree shares
+    them, and their evaluators, with it.
+    """
+    evaluate = compile_node(ast)
+    return CompiledRule(getattr(evaluate, 'node', ast), evaluate)
+
+
+def compile_node(node):
+    # type: (Any) -> Evaluator
+    """
+    Compile an expression node into a callable taking the context and
+    returning the result of the expression.
+    """
+    if isinstance(node, BoolOp):
+        return _compile_bool_op(node)
+    if isinstance(node, Condition):
+        return _compile_condition(node)
+    if isinstance(node, Constant):
+        return _constant(node.value)
+    raise TypeError('Cannot compile {!r}'.format(node))
+
+
+def _compile_bool_op(node):
+    # type: (BoolOp) -> Evaluator
+    """
+    Compile an ``and`` or ``or``, sharing the evaluator between every rule
+    that contains the same one.
+    """
+    evaluate = _BOOL_OPS.get(node)
+    if evaluate is None:
+        evaluate = _build_bool_op(node)
+        _BOOL_OPS[evaluate.node] = evaluate  # type: ignore[attr-defined]
+    return evaluate
+
+
+def _build_bool_op(node):
+    # type: (BoolOp) -> Evaluator
+    operands = tuple(compile_node(o) for o in node.operands)
+    evaluate = _bool_op_evaluator(node, operands)
+
+    shared = tuple(
+        getattr(compiled, 'node', operand)
+        for compiled, operand in zip(operands, node.operands)
+    )
+    if any(a is not b for a, b in zip(shared, node.operands)):
+        node = BoolOp(node.operator, shared)
+    evaluate.node = node  # type: ignore[attr-defined]
+    return evaluate
+
+
+def _bool_op_evaluator(node, operands):
+    # type: (BoolOp, Tuple[Evaluator, ...]) -> Evaluator
+    if node.operator == 'and':
+        if len(operands) == 2:
+            first, second = operands
+
+            def and_(context):
+                # type: (Any) -> Any
+                return second(context) if first(context) else False
+
+            return and_
+
+        def all_(context):
+            # type: (Any) -> Any
+            passed = False
+            for operand in operands:
+                passed = operand(context)
+                if not passed:
+                    return False
+            return passed
+
+        return all_
+
+    if node.operator == 'or':
+        if len(operands) == 2:
+            first, second = operands
+
+            def or_(context):
+                # type: (Any) -> Any
+                return True if first(context) else second(context)
+
+            return or_
+
+        def any_(context):
+            # type: (Any) -> Any
+            passed = False
+            for operand in operands:
+                passed = operand(context)
+                if passed:
+                    return True
+            return passed
+
+        return any_
+
+    raise UnknownOperatorException(
+        "Unknown operator '{}'".format(node.operator)
+    )
+
+
+def _compile_condition(node):
+    # type: (Condition) -> Evaluator
+    """
+    Compile a condition, sharing the evaluator between every rule that
+    contains the same condition.
+    """
+    evaluate = _CONDITIONS.get(node)
+    if evaluate is None:
+        evaluate = _CONDITIONS[node] = _build_condition(node)
+    return evaluate
+
+
+def prepare_condition(node):
+    # type: (Condition) -> PreparedCondition
+    """
+    Return the :class:`PreparedCondition` for a condition, for evaluators
+    that can't use the compiled one but shouldn't redo its work. It's shared
+    with the compiled evaluator, so it's built once while any compiled rule
+    contains the condition.
+    """
+    prepared = _compile_condition(node).prepared  # type: ignore[attr-defined]
+    return prepared  # type: ignore[no-any-return]
+
+
+def prepare_conditions(ast):
+    # type: (Any) -> Dict[int, PreparedCondition]
+    """
+    Return the :class:`PreparedCondition` of every condition in a syntax
+    tree, keyed by the ``id()`` of the condition, so they can be looked up
+    without hashing the condition itself. The ids are only valid while the
+    tree is kept alive, for example by a compiled rule.
+    """
+    prepared = {}  # type: Dict[int, PreparedCondition]
+    pending = [ast]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, BoolOp):
+            pending.extend(node.operands)
+        elif isinstance(node, Condition):
+            try:
+                prepared[id(node)] = prepare_condition(node)
+            except UnknownOperatorException:
+                # Left to raise if evaluation reaches it
+                pass
+    return prepared
+
+
+def _build_condition(node):
+    # type: (Condition) -> Evaluator
+    op = resolve_operator(node)
+
+    lconst, lval = _compile_value(node.lval)
+    rconst, rval = _compile_value(node.rval)
+
+    evaluate = _condition_evaluator(op, lconst, lval, rconst, rval)
+    evaluate.node = node  # type: ignore[attr-defined]
+    evaluate.prepared = PreparedCondition(  # type: ignore[attr-defined]
+        op, lconst, lval, rconst, rval
+    )
+    return evaluate
+
+
+def _condition_evaluator(op, lconst, lval, rconst, rval):
+    # type: (Operator, bool, Any, bool, Any) -> Evaluator
+    if lconst and rconst:
+        return lambda context: op(lval, rval)
+    if lconst:
+        return lambda context: op(lval, rval(context))
+    if rconst:
+        return lambda context: op(lval(context), rval)
+    return lambda context: op(lval(context), rval(context))
+
+
+def _constant(value):
+    # type: (Any) -> Evaluator
+    return lambda context: value
+
+
+def _compile_value(node):
+    # type: (Any) -> Tuple[bool, Any]
+    """
+    Return ``(True, value)`` for operands that don't depend on the context,
+    or ``(False, getter)`` where ``getter(context)`` expands the operand.
+    """
+    if isinstance(node, Constant):
+        return True, node.value
+
+    if isinstance(node, SubstituteVal):
+        return False, node.get_val
+
+    if isinstance(node, Collection):
+        items = [_compile_value(item) for item in node.items]
+        if all(const for const, _ in items):
+            return True, [value for _, value in items]
+
+        getters = [
+            _constant(value) if const else value for const, value in items
+        ]  # type: List[Evaluator]
+        return False, lambda context: [get(context) for get in getters]
+
+    raise TypeError('Cannot compile {!r}'.format(node))
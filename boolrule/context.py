@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Contexts that remember the values resolved from them.
+"""
+from typing import Any, Dict  # noqa
+
+
+class PreparedContext(object):
+    """
+    Wraps a context so that each property path is resolved from it at most
+    once, however many rules are tested against it.
+
+    A prepared context can be passed anywhere a context is accepted, such as
+    :meth:`BoolRule.test <boolrule.BoolRule.test>` and
+    :meth:`RuleSet.match <boolrule.RuleSet.match>`. Paths that can't be
+    resolved aren't remembered, so they raise
+    :class:`~boolrule.MissingVariableException` every time.
+
+    Resolved values are shared until the context is changed through
+    :meth:`update`; changes made to the wrapped context directly aren't seen
+    by paths that were already resolved.
+
+    :param context: The context to wrap.
+    """
+
+    def __init__(self, context):
+        # type: (Any) -> None
+        self._context = context
+        self._values = {}  # type: Dict[str, Any]
+
+    @property
+    def context(self):
+        # type: () -> Any
+        """The wrapped context."""
+        return self._context
+
+    def resolve(self, path):
+        # type: (Any) -> Any
+        """
+        Return the value of a :class:`~boolrule.nodes.SubstituteVal` in the
+        wrapped context, resolving it only the first time it's asked for.
+        """
+        try:
+            return self._values[path.path]
+        except KeyError:
+            value = self._values[path.path] = path.get_val(self._context)
+            return value
+
+    def update(self, *args, **kwargs):
+        # type: (*Any, **Any) -> None
+        """
+        Update the wrapped context like ``dict.update()``, forgetting the
+        values of every path that starts with one of the updated keys.
+        """
+        from .nodes import pathDelimiter
+
+        updates = dict(*args, **kwargs)
+        self._context.update(updates)
+        for path in list(self._values):
+            if path.split(pathDelimiter, 1)[0] in updates:
+                del self._values[path]
+
+    def invalidate(self):
+        # type: () -> None
+        """Forget every resolved value."""
+        self._values.clear()
+
+    def __repr__(self):
+        # type: () -> str
+        return 'PreparedContext(%r)' % (self._context,)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+
+class MissingVariableException(Exception):
+    """
+    Raised when an expression contains a property path that's not supplied in
+    the context.
+    """
+    pass
+
+
+class UnknownOperatorException(Exception):
+    """
+    Raised when an expression uses an unknown operator.
+
+    This should never be thrown since the operator won't be correctly parsed as
+    a token by pyparsing, but it's useful to have this hanging around for when
+    additional operators are being added.
+    """
+    pass
+
+
+class ParseError(ValueError):
+    """
+    Raised when a query can't be parsed.
+
+    It's a :class:`ValueError` rather than a pyparsing exception, since
+    pyparsing is only imported when a query is parsed with it.
+
+    :ivar query: The query that failed to parse.
+    :ivar loc: The offset into the query at which parsing failed.
+    """
+
+    def __init__(self, msg, query, loc):
+        # type: (str, str, int) -> None
+        super(ParseError, self).__init__(msg, query, loc)
+        self.msg = msg
+        self.query = query
+        self.loc = loc
+
+    @property
+    def lineno(self):
+        # type: () -> int
+        """The line number of the failure, starting at 1."""
+        return self.query.count('\n', 0, self.loc) + 1
+
+    @property
+    def col(self):
+        # type: () -> int
+        """The column of the failure, starting at 1."""
+        return self.loc - self.query.rfind('\n', 0, self.loc)
+
+    def __str__(self):
+        # type: () -> str
+        return '{} (at char {}), (line:{}, col:{})'.format(
+            self.msg, self.loc, self.lineno, self.col
+        )
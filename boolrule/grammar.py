@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+The original pyparsing grammar for boolrule expressions.
+
+Building the grammar and importing pyparsing are relatively slow, so this
+module is only imported the first time a rule is parsed with
+``parser='pyparsing'``.
+"""
+from typing import Any  # noqa
+from pyparsing import (
+    CaselessLiteral,
+    Word,
+    delimitedList,
+    Optional,
+    Combine,
+    Group,
+    alphas,
+    nums,
+    alphanums,
+    Forward,
+    oneOf,
+    quotedString,
+    ZeroOrMore,
+    Keyword,
+    ParseBaseException,
+    ParseFatalException,
+    ParseResults,
+    removeQuotes,
+    Suppress,
+)
+
+from .exceptions import ParseError
+from .nodes import (
+    Collection,
+    Condition,
+    Constant,
+    SubstituteVal,
+    canonical_operator,
+    chain,
+    pathDelimiter,
+)
+
+
+# Grammar definition
+identifier = Word(alphas, alphanums + "_")
+propertyPath = delimitedList(identifier, pathDelimiter, combine=True)
+
+and_ = Keyword("and", caseless=True)
+or_ = Keyword("or", caseless=True)
+in_ = Keyword("in", caseless=True)
+
+lparen = Suppress('(')
+rparen = Suppress(')')
+
+binaryOp = oneOf(
+    "= == != < > >= <= eq ne lt le gt ge in notin is isnot "
+    "≠ ≤ ≥ ∈ ∉ ⊆ ⊇ ∩ not∩", caseless=True
+)('operator')
+
+E = CaselessLiteral("E")
+numberSign = Word("+-", exact=1)
+realNumber = Combine(
+    Optional(numberSign) + (
+        Word(nums) + "." + Optional(Word(nums))
+        | ("." + Word(nums))
+    ) + Optional(E + Optional(numberSign) + Word(nums))
+)
+
+integer = Combine(
+    Optional(numberSign) + Word(nums) + Optional(
+        E + Optional("+") + Word(nums)
+    )
+)
+
+str_ = quotedString.addParseAction(removeQuotes)
+bool_ = oneOf('true false', caseless=True)
+none_ = CaselessLiteral('none')
+
+
+def _to_int(string, loc, toks):
+    # type: (str, int, Any) -> int
+    # An exponent is allowed by the grammar but not by int(), so report it
+    # as a syntax error rather than letting a bare ValueError escape
+    try:
+        return int(toks[0])
+    except ValueError:
+        raise ParseFatalException(
+            string, loc, 'Invalid integer {}'.format(toks[0])
+        )
+
+
+simpleVals = (
+    realNumber.setParseAction(lambda toks: float(toks[0]))
+    | integer.setParseAction(_to_int)
+    | str_
+    | bool_.setParseAction(lambda toks: toks[0].lower() == 'true')
+    | none_.setParseAction(lambda toks: [None])  # see pyparsing bug 63
+    | propertyPath.setParseAction(lambda toks: SubstituteVal(toks))
+)  # need to add support for alg expressions
+
+propertyVal = (
+    simpleVals
+    | (lparen + Group(delimitedList(simpleVals)) + rparen)
+)
+boolExpression = Forward()
+boolCondition = Group(
+    (Group(propertyVal)('lval') + binaryOp + Group(propertyVal)('rval'))
+    | (lparen + boolExpression + rparen)
+)
+boolExpression << boolCondition + ZeroOrMore((and_ | or_) + boolExpression)
+
+
+def _lower_expression(tokens):
+    # type: (Any) -> Any
+    """
+    Lower the flat ``[condition, 'and', condition, 'or', ...]`` token list
+    produced by ``boolExpression`` into a tree of nodes.
+    """
+    return chain(
+        [_lower_condition(t) for t in tokens[::2]], list(tokens[1::2])
+    )
+
+
+def _lower_condition(token):
+    # type: (Any) -> Any
+    if not token.getName():
+        return _lower_expression(token)
+
+    return Condition(
+        canonical_operator(token['operator']),
+        _lower_value(token['lval'][0]),
+        _lower_value(token['rval'][0]),
+    )
+
+
+def _lower_value(val):
+    # type: (Any) -> Any
+    if isinstance(val, SubstituteVal):
+        return val
+    if isinstance(val, (ParseResults, list)):
+        return Collection(tuple(_lower_value(v) for v in val))
+    return Constant(val)
+
+
+def parse(query):
+    # type: (str) -> Any
+    """
+    Parse a query into a syntax tree using the pyparsing grammar.
+
+    :raises ParseError: if the query isn't a valid expression.
+    """
+    try:
+        tokens = boolExpression.parseString(query, True)
+    except ParseBaseException as e:
+        raise ParseError(e.msg, query.expandtabs(), e.loc)
+    return _lower_expression(tokens)
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Re-evaluate rules incrementally as parts of a context change.
+
+An :class:`IncrementalEvaluator` merges its rules into the same shared graph
+as a :class:`~boolrule.RuleSet`, but keeps the result of every node between
+calls. When it's told which property paths of the context have changed, only
+the conditions that depend on those paths, and the ``and``/``or`` groups and
+rules above them, are evaluated again.
+"""
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple  # noqa
+
+from .nodes import BoolOp, Collection, Condition, SubstituteVal, pathDelimiter
+from .ruleset import _UNSET, _GraphBuilder, _compiled_rules
+
+Changes = namedtuple('Changes', 'passed failed')
+Changes.__doc__ = """
+The rules whose result changed in an update.
+
+:ivar passed: The set of IDs of the rules that failed before and now pass.
+:ivar failed: The set of IDs of the rules that passed before and now fail.
+"""
+
+# (rule id, slot, evaluator) for each rule
+Root = Tuple[Any, int, Any]
+# rule id -> the exception it raised, if collecting errors
+Errors = Optional[Dict[Any, Exception]]
+
+
+class IncrementalEvaluator(object):
+    """
+    A collection of rules, keyed by ID, bound to a context that changes a
+    little at a time.
+
+    Call :meth:`evaluate` with the initial context, then :meth:`update` with
+    the changed context and the property paths that changed. A changed path
+    affects every condition on that path, on paths beneath it (changing
+    ``cart`` affects ``cart.total``) and on paths above it (changing
+    ``cart.total`` affects ``cart``).
+
+    Results are only correct if every change is reported. Values the rules
+    depend on must not change without being listed in an update.
+
+    :param rules: A mapping, or iterable of ``(id, rule)`` pairs, where each
+                  rule is either a :class:`~boolrule.BoolRule` or a query
+                  string.
+    """
+
+    def __init__(self, rules):
+        # type: (Any) -> None
+        builder = _GraphBuilder()
+        roots = []  # type: List[Root]
+        for rule_id, rule in _compiled_rules(rules):
+            slot = builder.expression(rule.ast)
+            roots.append((rule_id, slot, builder.evaluators[slot]))
+
+        self._roots = roots
+        self._template = builder.template
+        self._parents, self._paths = _dependencies(builder)
+        # slot -> indexes of the rules whose result it is
+        self._rules = [[] for _ in self._template]  # type: List[List[int]]
+        for i, (_, slot, _) in enumerate(roots):
+            self._rules[slot].append(i)
+        # changed path -> slots of the paths it may affect
+        self._affected = {}  # type: Dict[str, List[int]]
+        self._memo = None  # type: Any
+        self._matched = set()  # type: Set[Any]
+        # indexes of the rules that raised when last evaluated
+        self._failed = set()  # type: Set[int]
+
+    @property
+    def matched(self):
+        # type: () -> Set[Any]
+        """The IDs of the rules that passed against the current context."""
+        return set(self._matched)
+
+    def evaluate(self, context, errors=None):
+        # type: (Any, Errors) -> Set[Any]
+        """
+        Test every rule against a context from scratch, remembering every
+        intermediate result.
+
+        :param errors: If given, a dict in which the exception raised by each
+                       rule that fails to evaluate is stored under the rule's
+                       ID, as for :meth:`RuleSet.match
+                       <boolrule.RuleSet.match>`. Those rules don't pass, and
+                       are evaluated again by the next :meth:`update`.
+        :return: The set of IDs of the rules that passed.
+        :raises MissingVariableException: unless ``errors`` is given, as
+            :meth:`RuleSet.match <boolrule.RuleSet.match>` would.
+        """
+        self._memo = None
+        self._failed = set()
+        memo = self._template[:]
+        self._matched = self._run(
+            range(len(self._roots)), context, memo, set(), errors
+        )
+        self._memo = memo
+        return set(self._matched)
+
+    def update(self, context, changed, errors=None):
+        # type: (Any, Iterable[str], Errors) -> Changes
+        """
+        Re-evaluate the rules that depend on the changed paths of the
+        context, and the rules that raised last time.
+
+        :param context: The new context, which may be the previous context
+                        changed in place.
+        :param changed: The property paths whose values have changed, such
+                        as ``['cart.total']``.
+        :param errors: If given, a dict in which exceptions are collected as
+                       for :meth:`evaluate`. A rule that passed before and
+                       now raises is reported as failed.
+        :return: The rules whose result changed, as :class:`Changes`.
+        :raises MissingVariableException: unless ``errors`` is given, as
+            :meth:`evaluate` would. The next update then evaluates every rule
+            again.
+        """
+        before = self._matched
+        if self._memo is None:
+            self.evaluate(context, errors)
+        else:
+            memo, self._memo = self._memo, None
+            # Rules that raised left their results unset, so they're retried
+            indexes, self._failed = self._failed, set()
+            # Forget the results that were worked out from the old values.
+            # Nodes that short-circuiting skipped don't depend on anything.
+            pending = [
+                slot for path in changed for slot in self._path_slots(path)
+            ]
+            while pending:
+                slot = pending.pop()
+                if memo[slot] is not _UNSET:
+                    memo[slot] = _UNSET
+                    pending.extend(self._parents[slot])
+                    indexes.update(self._rules[slot])
+
+            # Re-evaluate in the original order, so the same exception is
+            # raised as by evaluate()
+            matched = set(before)
+            for i in indexes:
+                matched.discard(self._roots[i][0])
+            self._matched = self._run(
+                sorted(indexes), context, memo, matched, errors
+            )
+            self._memo = memo
+
+        return Changes(
+            passed=self._matched - before,
+            failed=before - self._matched,
+        )
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._roots)
+
+    def _run(self, indexes, context, memo, matched, errors):
+        # type: (Iterable[int], Any, List[Any], Set[Any], Errors) -> Set[Any]
+        for i in indexes:
+            rule_id, slot, evaluate = self._roots[i]
+            passed = memo[slot]
+            if passed is _UNSET:
+                if errors is None:
+                    passed = memo[slot] = evaluate(context, memo)
+                else:
+                    # Slots that raised stay unset, as in RuleSet.match()
+                    try:
+                        passed = memo[slot] = evaluate(context, memo)
+                    except Exception as e:
+                        errors[rule_id] = e
+                        self._failed.add(i)
+                        continue
+            if passed:
+                matched.add(rule_id)
+        return matched
+
+    def _path_slots(self, path):
+        # type: (str) -> List[int]
+        """Return the slots of the paths whose values a change may affect."""
+        slots = self._affected.get(path)
+        if slots is None:
+            slots = self._affected[path] = [
+                slot for slot, other in self._paths.items()
+                if _overlaps(path, other)
+            ]
+        return slots
+
+
+def _dependencies(builder):
+    # type: (_GraphBuilder) -> Tuple[List[List[int]], Dict[int, str]]
+    """
+    Return the slots that read each slot's result, and the path of each slot
+    that looks up a property path.
+    """
+    parents = [[] for _ in builder.template]  # type: List[List[int]]
+    paths = {}  # type: Dict[int, str]
+    for node, slot in builder.slots.items():
+        if isinstance(node, BoolOp):
+            children = node.operands  # type: Any
+        elif isinstance(node, Condition):
+            children = (node.lval, node.rval)
+        elif isinstance(node, Collection):
+            children = node.items
+        else:
+            children = ()
+            if isinstance(node, SubstituteVal):
+                paths[slot] = node.path
+        for child in children:
+            # Items of literal collections don't have slots of their own
+            child_slot = builder.slots.get(child)
+            if child_slot is not None:
+                parents[child_slot].append(slot)
+    return parents, paths
+
+
+def _overlaps(changed, path):
+    # type: (str, str) -> bool
+    """Whether a change to one path may change the value of another."""
+    return (
+        changed == path or
+        path.startswith(changed + pathDelimiter) or
+        changed.startswith(path + pathDelimiter)
+    )
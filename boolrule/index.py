@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Hash indexes over equality and membership conditions, used to skip rules that
+can't possibly match a context.
+
+Most rules in large collections are conjunctions that start by pinning a
+property to a literal, such as ``tenant.id = 42 and ...``. A
+:class:`RuleIndex` files each such rule under the literal value(s) it
+requires, so matching a context only evaluates the rules filed under the
+context's actual values, plus any rules that couldn't be indexed.
+"""
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Set, Tuple  # noqa
+
+from .boolrule import BoolRule  # noqa
+from .context import PreparedContext
+from .exceptions import MissingVariableException
+from .nodes import BoolOp, Collection, Condition, Constant, SubstituteVal
+from .ruleset import _compiled_rules
+
+IndexStats = namedtuple(
+    'IndexStats', 'rules indexed matches evaluated pruned'
+)
+IndexStats.__doc__ = """
+Counters describing a :class:`RuleIndex`.
+
+:ivar rules: The number of rules in the index.
+:ivar indexed: How many of those were filed under an indexed condition.
+:ivar matches: The number of contexts matched so far.
+:ivar evaluated: The total number of rules evaluated across those matches.
+:ivar pruned: The total number of rules skipped by the index.
+"""
+
+
+class RuleIndex(object):
+    """
+    A collection of rules, keyed by ID, that are matched against a context
+    using hash indexes to skip rules that can't match.
+
+    A rule is indexed on one of the ``=``/``==``/``eq`` or ``in``/``∈``
+    conditions between a property path and literal values found at the start
+    of its top-level ``and`` chain. Rules without such a condition are
+    evaluated for every context.
+
+    Results are identical to testing every rule, including raising
+    :class:`~boolrule.MissingVariableException`: rules are only skipped when
+    every path up to and including the indexed condition is present in the
+    context. The index does rely on context values hashing consistently with
+    how they compare equal, as is the case for all built-in types.
+
+    :param rules: A mapping, or iterable of ``(id, rule)`` pairs, where each
+                  rule is either a :class:`~boolrule.BoolRule` or a query
+                  string.
+    """
+
+    def __init__(self, rules):
+        # type: (Any) -> None
+        self._rules = []  # type: List[Tuple[Any, BoolRule]]
+        self._unindexed = []  # type: List[int]
+        # path -> literal value -> positions of the rules requiring it
+        self._buckets = {}  # type: Dict[SubstituteVal, Dict[Any, List[int]]]
+        # path -> positions of every rule that is pruned based on it
+        self._dependents = {}  # type: Dict[SubstituteVal, List[int]]
+
+        for position, (rule_id, rule) in enumerate(_compiled_rules(rules)):
+            self._rules.append((rule_id, rule))
+            self._add(position, rule.ast)
+
+        self._matches = 0
+        self._evaluated = 0
+
+    @property
+    def stats(self):
+        # type: () -> IndexStats
+        """
+        An :class:`~boolrule.index.IndexStats` snapshot showing how
+        effective the index is.
+        """
+        total = len(self._rules)
+        return IndexStats(
+            total,
+            total - len(self._unindexed),
+            self._matches,
+            self._evaluated,
+            self._matches * total - self._evaluated,
+        )
+
+    def candidates(self, context=None):
+        # type: (Any) -> Set[int]
+        """
+        Return the positions of the rules that must be evaluated to match the
+        context; every other rule is known to fail.
+        """
+        positions = set(self._unindexed)
+        for path, buckets in self._buckets.items():
+            try:
+                positions.update(buckets.get(path.get_val(context), ()))
+            except (MissingVariableException, TypeError):
+                # Missing paths have to raise as they would when testing the
+                # rule, and unhashable values can't be looked up.
+                positions.update(self._dependents[path])
+        return positions
+
+    def match(self, context=None):
+        # type: (Any) -> Set[Any]
+        """
+        Test the rules against the context.
+
+        :param context: A dict context to evaluate the rules against.
+        :return: The set of IDs of the rules that passed.
+        """
+        # Indexed paths are looked up again by the rules filed under them.
+        if context.__class__ is not PreparedContext:
+            context = PreparedContext(context)
+
+        positions = self.candidates(context)
+        self._matches += 1
+        self._evaluated += len(positions)
+
+        rules = self._rules
+        matched = set()
+        for position in sorted(positions):
+            rule_id, rule = rules[position]
+            if rule.test(context):
+                matched.add(rule_id)
+        return matched
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._rules)
+
+    def _add(self, position, ast):
+        # type: (int, Any) -> None
+        conjuncts = ast.operands if _is_and(ast) else (ast,)
+
+        # Only conditions in the leading run of indexable ones qualify, as
+        # anything evaluated before the indexed condition could raise.
+        leading = []  # type: List[Tuple[SubstituteVal, Set[Any]]]
+        for conjunct in conjuncts:
+            indexable = _indexable(conjunct)
+            if indexable is None:
+                break
+            leading.append(indexable)
+
+        if not leading:
+            self._unindexed.append(position)
+            return
+
+        chosen = min(
+            range(len(leading)), key=lambda i: len(leading[i][1])
+        )
+        path, values = leading[chosen]
+        buckets = self._buckets.setdefault(path, {})
+        for value in values:
+            buckets.setdefault(value, []).append(position)
+
+        for guard, _ in leading[:chosen + 1]:
+            dependents = self._dependents.setdefault(guard, [])
+            if position not in dependents[-1:]:
+                dependents.append(position)
+            self._buckets.setdefault(guard, {})
+
+
+def _is_and(node):
+    # type: (Any) -> bool
+    return isinstance(node, BoolOp) and node.operator == 'and'
+
+
+def _indexable(node):
+    # type: (Any) -> Optional[Tuple[SubstituteVal, Set[Any]]]
+    """
+    Return the path and the set of values it must equal for an indexable
+    condition, or ``None``.
+    """
+    if not isinstance(node, Condition):
+        return None
+
+    lval, rval = node.lval, node.rval
+    if node.operator == '==':
+        if isinstance(rval, SubstituteVal):
+            lval, rval = rval, lval
+        if isinstance(lval, SubstituteVal) and isinstance(rval, Constant):
+            return lval, {rval.value}
+
+    if node.operator == 'in':
+        if (
+            isinstance(lval, SubstituteVal) and
+            isinstance(rval, Collection) and
+            all(isinstance(item, Constant) for item in rval.items)
+        ):
+            return lval, set(item.value for item in rval.items)
+
+    return None
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+Immutable syntax tree produced by parsing a boolrule expression.
+
+Parsing lowers the query into a small tree of hashable nodes which is then
+compiled into an evaluator (see ``boolrule.compiler``). Nodes compare
+structurally so that identical sub-expressions can be recognised across
+rules, and ``str(node)`` renders a node back into expression syntax.
+"""
+from collections import namedtuple
+from typing import TYPE_CHECKING, Any, Dict, Sequence, Tuple  # noqa
+from weakref import WeakValueDictionary
+
+try:
+    from sys import intern
+except ImportError:  # Python 2, where intern is a builtin
+    pass
+
+from .context import PreparedContext
+from .exceptions import MissingVariableException, UnknownOperatorException
+
+pathDelimiter = '.'
+
+# Path segments that are looked up as attributes, not keys, on a dict.
+_DICT_ATTRIBUTES = frozenset(dir(dict))
+
+# The __getattribute__ of built-in types that look attributes up in the
+# ordinary way. Any other, whether defined in Python or by a C type such as
+# weakref.proxy, may produce attributes the type doesn't declare.
+_GENERIC_GETATTRIBUTE = frozenset(
+    t.__getattribute__ for t in (
+        object, dict, list, tuple, str, bytes, int, float, set, frozenset,
+    )
+)
+
+# (segment, whether a dict can be subscripted directly, type -> whether the
+# type may have the segment as an attribute) for every segment name seen.
+Segment = Tuple[str, bool, Dict[type, bool]]
+_SEGMENTS = {}  # type: Dict[str, Segment]
+
+# path -> the SubstituteVal for it, while one exists
+_PATHS = WeakValueDictionary()  # type: WeakValueDictionary[str, Any]
+
+# Maps every spelling accepted by the grammar to its canonical operator.
+OPERATOR_ALIASES = {
+    '=': '==',
+    '==': '==',
+    'eq': '==',
+    '!=': '!=',
+    'ne': '!=',
+    '≠': '!=',
+    '>': '>',
+    'gt': '>',
+    '>=': '>=',
+    'ge': '>=',
+    '≥': '>=',
+    '<': '<',
+    'lt': '<',
+    '<=': '<=',
+    'le': '<=',
+    '≤': '<=',
+    'in': 'in',
+    '∈': 'in',
+    'notin': 'notin',
+    '∉': 'notin',
+    'is': 'is',
+    'isnot': 'isnot',
+    '⊆': '⊆',
+    '⊇': '⊇',
+    '∩': '∩',
+    'not∩': 'not∩',
+}  # type: Dict[str, str]
+
+
+def canonical_operator(operator):
+    # type: (str) -> str
+    """
+    Return the canonical spelling of a binary operator.
+
+    :raises UnknownOperatorException: if the operator isn't supported.
+    """
+    try:
+        return OPERATOR_ALIASES[operator.lower()]
+    except KeyError:
+        raise UnknownOperatorException(
+            "Unknown operator '{}'".format(operator)
+        )
+
+
+class SubstituteVal(object):
+    """
+    Represents a token that will later be replaced by a context value.
+
+    The path is split into segments once, up front. Each segment of a path is
+    looked up as an attribute if the value has one by that name, otherwise
+    as an item. Plain dicts take a fast path straight to the item lookup, and
+    for other types the choice is remembered per type wherever it can't
+    depend on the instance.
+
+    Instances are interned: while one exists for a path, creating another
+    for the same path returns it, so rules referring to the same property
+    share it.
+    """
+
+    __slots__ = ('_path', '_segments', '__weakref__')
+
+    if TYPE_CHECKING:
+        _path = ''
+        _segments = ()  # type: Tuple[Segment, ...]
+
+    def __new__(cls, t):
+        # type: (Any) -> SubstituteVal
+        self = _PATHS.get(t[0])
+        if self is None or type(self) is not cls:
+            self = object.__new__(cls)
+            self._path = path = intern(t[0])
+            self._segments = tuple(
+                _segment(part) for part in path.split(pathDelimiter)
+            )
+            if cls is SubstituteVal:
+                _PATHS[path] = self
+        return self
+
+    @property
+    def path(self):
+        # type: () -> str
+        return self._path
+
+    def get_val(self, context, nested=False):
+        # type: (Any, bool) -> Any
+        """
+        Look up the path in the context.
+
+        :param nested: If ``True``, ``context`` is a value nested inside a
+                       context, which may be empty, like ``{}`` or ``0``.
+        :raises MissingVariableException: if the context is empty or any
+            segment of the path can't be found.
+        """
+        if context.__class__ is PreparedContext:
+            return context.resolve(self)
+
+        if not context and not nested:
+            raise MissingVariableException(
+                'context missing or empty'
+            )
+
+        val = context
+        for part, subscript, attributes in self._segments:
+            if subscript and type(val) is dict:
+                try:
+                    val = val[part]
+                except KeyError:
+                    raise self._missing()
+                continue
+
+            cls = type(val)
+            attribute = attributes.get(cls)
+            if attribute is None:
+                attribute = attributes[cls] = _may_have_attribute(cls, part)
+
+            if attribute:
+                try:
+                    val = getattr(val, part)
+                    continue
+                except AttributeError:
+                    pass
+
+            try:
+                val = val[part]
+            except (LookupError, TypeError):
+                raise self._missing()
+
+        return val
+
+    def _missing(self):
+        # type: () -> MissingVariableException
+        return MissingVariableException(
+            'no value supplied for {}'.format(self._path)
+        )
+
+    def __reduce__(self):
+        # type: () -> Any
+        # The per-type memos may hold unpicklable classes, so rebuild them.
+        return SubstituteVal, ([self._path],)
+
+    def __eq__(self, other):
+        # type: (Any) -> bool
+        return (
+            type(other) is SubstituteVal and
+            self._path == other._path
+        )
+
+    def __ne__(self, other):
+        # type: (Any) -> bool
+        return not self == other
+
+    def __hash__(self):
+        # type: () -> int
+        return hash((SubstituteVal, self._path))
+
+    def __str__(self):
+        # type: () -> str
+        return self._path
+
+    def __repr__(self):
+        # type: () -> str
+        return 'SubstituteVal(%s)' % self._path
+
+
+def _segment(part):
+    # type: (str) -> Segment
+    segment = _SEGMENTS.get(part)
+    if segment is None:
+        part = intern(part)
+        segment = _SEGMENTS.setdefault(
+            part, (part, part not in _DICT_ATTRIBUTES, {})
+        )
+    return segment
+
+
+def _may_have_attribute(cls, name):
+    # type: (type, str) -> bool
+    """
+    Return whether instances of ``cls`` may have an attribute called
+    ``name``. Only ``False`` is definitive: a type without instance
+    dictionaries or dynamic attribute lookup can only have the attributes
+    its class defines.
+    """
+    return bool(
+        hasattr(cls, name) or
+        getattr(cls, '__dictoffset__', 1) or
+        hasattr(cls, '__getattr__') or
+        getattr(cls, '__getattribute__', None) not in _GENERIC_GETATTRIBUTE
+    )
+
+
+class Constant(namedtuple('Constant', 'value')):
+    """
+    A literal value: a number, string, boolean or ``none``.
+
+    Constants only compare equal when their values are of the same type, so
+    ``1`` and ``true`` remain distinct nodes even though ``1 == True``.
+    """
+    __slots__ = ()
+
+    def __eq__(self, other):
+        # type: (Any) -> bool
+        return (
+            type(other) is Constant and
+            type(self.value) is type(other.value) and
+            self.value == other.value
+        )
+
+    def __ne__(self, other):
+        # type: (Any) -> bool
+        return not self == other
+
+    def __hash__(self):
+        # type: () -> int
+        return hash((Constant, type(self.value), self.value))
+
+    def __str__(self):
+        # type: () -> str
+        return _format_literal(self.value)
+
+
+class Collection(namedtuple('Collection', 'items')):
+    """
+    A parenthesised, comma-separated list of values such as ``(1, 2, x)``.
+
+    Evaluates to a Python list.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        # type: () -> str
+        return '({})'.format(', '.join(str(item) for item in self.items))
+
+
+class Condition(namedtuple('Condition', 'operator lval rval')):
+    """
+    A single binary comparison. ``operator`` is always the canonical spelling
+    as given by :func:`canonical_operator`.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        # type: () -> str
+        return '{} {} {}'.format(self.lval, self.operator, self.rval)
+
+
+class BoolOp(namedtuple('BoolOp', 'operator operands')):
+    """
+    A chain of two or more operands joined by the same logical operator
+    (``and`` or ``or``), evaluated left to right with short-circuiting.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        # type: () -> str
+        return ' {} '.format(self.operator).join(
+            '({})'.format(o) if isinstance(o, BoolOp) else str(o)
+            for o in self.operands
+        )
+
+
+def chain(operands, connectives):
+    # type: (Sequence[Any], Sequence[str]) -> Any
+    """
+    Build the tree for ``operands[0] connectives[0] operands[1] ...``.
+
+    Connectives share the same precedence and are right-associative, so
+    ``a and b or c`` is ``a and (b or c)``. Runs of the same connective are
+    merged into a single :class:`BoolOp`.
+    """
+    node = operands[-1]
+    for i in reversed(range(len(connectives))):
+        if i + 1 < len(connectives) and connectives[i + 1] == connectives[i]:
+            node = BoolOp(connectives[i], (operands[i],) + node.operands)
+        else:
+            node = BoolOp(connectives[i], (operands[i], node))
+    return node
+
+
+def _format_literal(value):
+    # type: (Any) -> str
+    if value is None:
+        return 'none'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, float):
+        text = repr(value)
+        if 'e' in text and '.' not in text:
+            mantissa, exponent = text.split('e')
+            text = '{}.0e{}'.format(mantissa, exponent)
+        return text
+    if not isinstance(value, str):
+        return repr(value)
+    quote = "'" if '"' in value else '"'
+    return '{0}{1}{0}'.format(quote, value)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Simplifies a syntax tree before it's compiled.
+
+The optimiser only makes changes that can't affect the outcome of testing the
+rule against any context, including which
+:class:`~boolrule.MissingVariableException` s are raised:
+
+* Conditions between literals are evaluated, unless doing so raises.
+* Nested chains of the same logical operator are flattened.
+* Literals that can't affect an ``and``/``or`` chain are dropped, and
+  operands after one that decides the chain (``false`` in an ``and``, ``true``
+  in an ``or``) are removed, since they'd never be evaluated.
+
+A rule that reduces to a single :class:`~boolrule.nodes.Constant` passes or
+fails regardless of the context; see :func:`static_value`.
+
+:func:`specialize` goes further for a context that's partly known ahead of
+time, replacing the property paths it can resolve with their values before
+optimising.
+"""
+from typing import Any, Dict, List, Tuple  # noqa
+
+from .compiler import OPERATORS
+from .nodes import BoolOp, Collection, Condition, Constant, SubstituteVal
+
+# Types of the values that can be substituted into a tree as literals. Only
+# exact types, so subclasses with their own comparisons are left alone.
+_LITERAL_TYPES = frozenset([type(None), bool, int, float, str])
+
+
+def optimize(node):
+    # type: (Any) -> Any
+    """
+    Return a simplified, equivalent version of an expression node.
+    """
+    if isinstance(node, BoolOp):
+        return _optimize_bool_op(node)
+    if isinstance(node, Condition):
+        return _optimize_condition(node)
+    return node
+
+
+def static_value(node):
+    # type: (Any) -> Tuple[bool, Any]
+    """
+    Return ``(True, result)`` if an optimised expression always evaluates to
+    ``result``, or ``(False, None)`` if its result depends on the context.
+    """
+    if isinstance(node, Constant):
+        return True, node.value
+    return False, None
+
+
+def specialize(node, context):
+    # type: (Any, Any) -> Any
+    """
+    Return an optimised version of an expression node in which every
+    property path that can be resolved from ``context`` is replaced by its
+    value.
+
+    The result gives the same outcome as the original node against any
+    context that contains ``context``. Paths that can't be resolved, or whose
+    values aren't numbers, strings, booleans, ``None`` or lists of those, are
+    left to be looked up when the rule is tested.
+    """
+    return optimize(_substitute(node, context, {}))
+
+
+def _substitute(node, context, values):
+    # type: (Any, Any, Dict[str, Any]) -> Any
+    if isinstance(node, BoolOp):
+        return BoolOp(node.operator, tuple(
+            _substitute(operand, context, values) for operand in node.operands
+        ))
+    if isinstance(node, Condition):
+        return Condition(
+            node.operator,
+            _substitute(node.lval, context, values),
+            _substitute(node.rval, context, values),
+        )
+    if isinstance(node, Collection):
+        return Collection(tuple(
+            _substitute(item, context, values) for item in node.items
+        ))
+    if isinstance(node, SubstituteVal):
+        literal = values.get(node.path)
+        if literal is None:
+            literal = values[node.path] = _resolve(node, context)
+        return literal
+    return node
+
+
+def _resolve(node, context):
+    # type: (SubstituteVal, Any) -> Any
+    """Return the literal for a path's value in the context, or the path."""
+    try:
+        value = node.get_val(context)
+    except Exception:
+        # Leave it to be looked up, and to raise, when the rule is tested
+        return node
+
+    if type(value) in _LITERAL_TYPES:
+        return Constant(value)
+    if type(value) is list and all(
+        type(item) in _LITERAL_TYPES for item in value
+    ):
+        return Collection(tuple(Constant(item) for item in value))
+    return node
+
+
+def _optimize_bool_op(node):
+    # type: (BoolOp) -> Any
+    # and stops at the first falsy operand, or at the first truthy one.
+    stop_on = node.operator == 'or'
+
+    operands = []  # type: List[Any]
+    neutral = None
+    for operand in _flatten(node):
+        if isinstance(operand, Constant):
+            if bool(operand.value) is not stop_on:
+                # Only matters if every other operand is dropped too
+                neutral = operand
+                continue
+            operands.append(operand)
+            break
+        operands.append(operand)
+
+    if not operands:
+        return neutral
+    if len(operands) == 1:
+        return operands[0]
+    return BoolOp(node.operator, tuple(operands))
+
+
+def _flatten(node):
+    # type: (BoolOp) -> List[Any]
+    operands = []  # type: List[Any]
+    for operand in node.operands:
+        operand = optimize(operand)
+        if isinstance(operand, BoolOp) and operand.operator == node.operator:
+            operands.extend(operand.operands)
+        else:
+            operands.append(operand)
+    return operands
+
+
+def _optimize_condition(node):
+    # type: (Condition) -> Any
+    op = OPERATORS.get(node.operator)
+    lval, rval = _literal(node.lval), _literal(node.rval)
+    if op is None or lval is _NOT_LITERAL or rval is _NOT_LITERAL:
+        return node
+
+    try:
+        return Constant(op(lval, rval))
+    except Exception:
+        # Leave it to raise when the rule is tested, as it always has.
+        return node
+
+
+_NOT_LITERAL = object()
+
+
+def _literal(node):
+    # type: (Any) -> Any
+    if isinstance(node, Constant):
+        return node.value
+    if isinstance(node, Collection):
+        items = [_literal(item) for item in node.items]
+        if _NOT_LITERAL not in items:
+            return items
+    return _NOT_LITERAL
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Compile and match rules in bulk using a pool of worker processes.
+
+:func:`compile_many` parses each distinct query once, spreading large batches
+across the workers, and collects parse errors rather than stopping at the
+first one.
+
+For :func:`bulk_match`, the rules are sent to each worker once, when it
+starts, and compiled into a :class:`~boolrule.RuleSet` there; afterwards only
+contexts and results cross the process boundary. Contexts are consumed lazily
+and sent in chunks, with a bounded number of chunks in flight, so arbitrarily
+long streams can be processed in constant memory.
+"""
+from collections import OrderedDict, deque, namedtuple
+from itertools import islice
+from timeit import default_timer
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple  # noqa
+
+from .boolrule import BoolRule
+from .cache import rule_cache
+from .compiler import compile_rule
+from .exceptions import ParseError
+from .ruleset import RuleSet, _rule_items
+
+BulkResult = namedtuple('BulkResult', 'matched error errors')
+BulkResult.__doc__ = """
+The outcome of matching the rules against one context.
+
+:ivar matched: The set of IDs of the rules that passed. Rules that raised an
+               exception aren't included.
+:ivar error: The exception raised by the first rule that couldn't be
+             evaluated, such as :class:`~boolrule.MissingVariableException`,
+             or ``None`` if every rule was evaluated.
+:ivar errors: A dict of the exception raised by each rule that couldn't be
+              evaluated, keyed by rule ID.
+"""
+
+CompileResult = namedtuple('CompileResult', 'rules errors stats')
+CompileResult.__doc__ = """
+The outcome of :func:`compile_many`.
+
+:ivar rules: A :class:`~boolrule.BoolRule` for each query, in the same order
+             as the queries, or ``None`` where the query couldn't be
+             compiled. Identical queries share the same rule.
+:ivar errors: A :class:`CompileError` for each query that couldn't be
+              compiled, in the same order as the queries.
+:ivar stats: The :class:`CompileStats` for the batch.
+"""
+
+CompileError = namedtuple(
+    'CompileError', 'index query error message loc lineno col'
+)
+CompileError.__doc__ = """
+Why a query passed to :func:`compile_many` couldn't be compiled.
+
+:ivar index: The position of the query in the queries.
+:ivar query: The query.
+:ivar error: The name of the exception raised, such as ``'ParseError'``.
+:ivar message: The exception's message.
+:ivar loc: For a parse error, the offset into the query at which parsing
+           failed, otherwise ``None``.
+:ivar lineno: For a parse error, the line of the failure, otherwise ``None``.
+:ivar col: For a parse error, the column of the failure, otherwise ``None``.
+"""
+
+CompileStats = namedtuple(
+    'CompileStats', 'queries unique failed workers seconds per_second'
+)
+CompileStats.__doc__ = """
+Throughput of a call to :func:`compile_many`.
+
+:ivar queries: The number of queries.
+:ivar unique: The number of distinct queries, each of which was parsed once.
+:ivar failed: The number of queries that couldn't be compiled.
+:ivar workers: The number of worker processes used, or 0 if the queries
+               were compiled in this process.
+:ivar seconds: The time taken.
+:ivar per_second: The number of queries compiled per second.
+"""
+
+# (id, query or syntax tree) for each rule, as sent to the workers.
+Payload = List[Tuple[Any, Any]]
+
+# The rules compiled in this worker process.
+_ruleset = None  # type: Optional[RuleSet]
+
+
+def bulk_match(
+    rules,  # type: Any
+    contexts,  # type: Iterable[Any]
+    workers=None,  # type: Optional[int]
+    chunk_size=1000,  # type: int
+    max_pending=None,  # type: Optional[int]
+):
+    # type: (...) -> Iterator[BulkResult]
+    """
+    Match rules against every context in an iterable, in parallel.
+
+    :param rules: A mapping, or iterable of ``(id, rule)`` pairs, where each
+                  rule is either a :class:`~boolrule.BoolRule` or a query
+                  string.
+    :param contexts: An iterable of picklable contexts, which is consumed
+                     lazily.
+    :param workers: The number of worker processes, defaulting to the number
+                    of CPUs.
+    :param chunk_size: The number of contexts sent to a worker at a time.
+    :param max_pending: The maximum number of chunks being processed or
+                        waiting to be returned at once, defaulting to twice
+                        the number of workers.
+    :return: An iterator of :class:`BulkResult`, in the same order as the
+             contexts.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import cpu_count
+
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1')
+    if workers is None:
+        workers = cpu_count()
+    if max_pending is None:
+        max_pending = 2 * workers
+
+    payload = _payload(rules)
+    try:
+        executor = ProcessPoolExecutor(
+            workers, initializer=_initialize, initargs=(payload,)
+        )
+        chunk_payload = None  # type: Optional[Payload]
+    except TypeError:
+        # Before Python 3.7 workers can't be initialised, so the rules are
+        # sent with every chunk and compiled from the first one each worker
+        # receives.
+        executor = ProcessPoolExecutor(workers)
+        chunk_payload = payload
+
+    with executor:
+        contexts = iter(contexts)
+        pending = deque()  # type: Any
+        try:
+            while True:
+                while len(pending) < max_pending:
+                    chunk = list(islice(contexts, chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(
+                        executor.submit(_match_chunk, chunk, chunk_payload)
+                    )
+
+                if not pending:
+                    return
+                for result in pending.popleft().result():
+                    yield BulkResult(*result)
+        finally:
+            # Don't wait for chunks nobody will read if iteration stops early
+            for future in pending:
+                future.cancel()
+
+
+def compile_many(
+    queries,  # type: Iterable[str]
+    workers=None,  # type: Optional[int]
+    chunk_size=500,  # type: int
+    parser='native',  # type: str
+):
+    # type: (...) -> CompileResult
+    """
+    Compile many queries at once, collecting errors instead of raising them.
+
+    Each distinct query is parsed once. When there are more distinct queries
+    than fit in one chunk and more than one worker, they're parsed in
+    parallel by a pool of worker processes; otherwise they're parsed in this
+    process. Workers send back syntax trees, which are compiled into
+    evaluators here, so at best this halves the time taken. Compiled queries
+    are added to :data:`boolrule.rule_cache`.
+
+    :param queries: An iterable of query strings.
+    :param workers: The number of worker processes, defaulting to the number
+                    of CPUs. Pass 0 or 1 to compile in this process.
+    :param chunk_size: The number of queries sent to a worker at a time.
+    :param parser: The parser to use, as for :class:`~boolrule.BoolRule`.
+    :return: A :class:`CompileResult`.
+    """
+    from multiprocessing import cpu_count
+
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1')
+    if workers is None:
+        workers = cpu_count()
+
+    started = default_timer()
+    queries = list(queries)
+    unique = list(dict.fromkeys(queries))
+    chunks = [
+        unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)
+    ]
+    if workers > 1 and len(chunks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as executor:
+            outcomes = [
+                outcome
+                for chunk in executor.map(
+                    _parse_chunk, chunks, [parser] * len(chunks)
+                )
+                for outcome in chunk
+            ]
+    else:
+        workers = 0
+        outcomes = [
+            outcome for chunk in chunks
+            for outcome in _compile_chunk(chunk, parser)
+        ]
+
+    compiled = {}  # type: Dict[str, Any]
+    failures = {}  # type: Dict[str, Tuple[Any, ...]]
+    for query, (rule, error) in zip(unique, outcomes):
+        if error is not None:
+            failures[query] = error
+            continue
+        if not isinstance(rule, BoolRule):
+            # A syntax tree parsed by a worker
+            compiled_rule = compile_rule(rule)
+            rule_cache.put((parser, query), compiled_rule)
+            rule = BoolRule(query, lazy=True, parser=parser)
+            rule._set_compiled(compiled_rule)
+        compiled[query] = rule
+
+    rules = []  # type: List[Optional[BoolRule]]
+    errors = []  # type: List[CompileError]
+    for index, query in enumerate(queries):
+        rules.append(compiled.get(query))
+        if query in failures:
+            errors.append(CompileError(index, query, *failures[query]))
+
+    seconds = default_timer() - started
+    stats = CompileStats(
+        queries=len(queries),
+        unique=len(unique),
+        failed=len(errors),
+        workers=workers,
+        seconds=seconds,
+        per_second=len(queries) / seconds if seconds else float('inf'),
+    )
+    return CompileResult(rules, errors, stats)
+
+
+def _parse_chunk(queries, parser):
+    # type: (List[str], str) -> List[Tuple[Any, Any]]
+    """
+    Compile queries in a worker, returning their syntax trees to be compiled
+    again in the parent process, since evaluators can't be pickled.
+    """
+    return [
+        (None if rule is None else rule.ast, error)
+        for rule, error in _compile_chunk(queries, parser)
+    ]
+
+
+def _compile_chunk(queries, parser):
+    # type: (List[str], str) -> List[Tuple[Any, Any]]
+    """
+    Compile each query, returning ``(rule, None)`` or
+    ``(None, error details)`` for each.
+    """
+    outcomes = []  # type: List[Tuple[Any, Any]]
+    for query in queries:
+        try:
+            outcomes.append((BoolRule(query, parser=parser), None))
+        except ParseError as e:
+            outcomes.append((None, (
+                type(e).__name__, e.msg, e.loc, e.lineno, e.col
+            )))
+        except Exception as e:
+            outcomes.append((None, (
+                type(e).__name__, str(e), None, None, None
+            )))
+    return outcomes
+
+
+def _payload(rules):
+    # type: (Any) -> Payload
+    """
+    Convert rules to a picklable list of ``(id, query or syntax tree)``, so
+    already-compiled rules aren't parsed again by the workers.
+    """
+    return [
+        (rule_id, rule.ast if isinstance(rule, BoolRule) else rule)
+        for rule_id, rule in _rule_items(rules)
+    ]
+
+
+def _initialize(payload):
+    # type: (Payload) -> None
+    global _ruleset
+    _ruleset = RuleSet(
+        (rule_id, rule if isinstance(rule, str) else BoolRule.from_ast(rule))
+        for rule_id, rule in payload
+    )
+
+
+def _match_chunk(chunk, payload=None):
+    # type: (List[Any], Optional[Payload]) -> List[Tuple[Any, Any, Any]]
+    if _ruleset is None:
+        _initialize(payload or [])
+    match = _ruleset.match  # type: ignore[union-attr]
+
+    results = []  # type: List[Tuple[Any, Any, Any]]
+    for context in chunk:
+        errors = OrderedDict()  # type: Dict[Any, Exception]
+        matched = match(context, errors=errors)
+        errors = OrderedDict(
+            (rule_id, _picklable(e)) for rule_id, e in errors.items()
+        )
+        first = next(iter(errors.values()), None)
+        results.append((matched, first, errors))
+    return results
+
+
+def _picklable(error):
+    # type: (Exception) -> Exception
+    import pickle
+    try:
+        pickle.loads(pickle.dumps(error))
+    except Exception:
+        return RuntimeError('{}: {}'.format(type(error).__name__, error))
+    return error
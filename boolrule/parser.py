@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+A hand-written lexer and recursive-descent parser for boolrule expressions.
+
+This accepts exactly the same language as the pyparsing grammar in
+:mod:`boolrule.boolrule` and produces the same syntax tree, but without the
+cost of building or running a combinator grammar. The quirks of the pyparsing
+grammar are reproduced deliberately; for example literals and operators are
+matched as prefixes rather than whole words, so ``truex`` is a ``true``
+literal followed by a stray ``x`` rather than a property path.
+"""
+import re
+from typing import Any, List, NoReturn, Tuple  # noqa
+
+from .exceptions import ParseError
+from .nodes import (
+    OPERATOR_ALIASES,
+    Collection,
+    Condition,
+    Constant,
+    SubstituteVal,
+    chain,
+)
+
+_WHITESPACE = re.compile(r'[ \n\t\r]*')
+_REAL = re.compile(r'[+-]?(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?')
+_INTEGER = re.compile(r'[+-]?[0-9]+(?:[eE]\+?[0-9]+)?')
+_STRING_BODY = {
+    '"': re.compile(r'"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*'),
+    "'": re.compile(r"'(?:[^'\n\r\\]|(?:'')|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*"),
+}
+_BOOLEAN = re.compile(r'true|false', re.IGNORECASE)
+_NONE = re.compile(r'none', re.IGNORECASE)
+_PATH = re.compile(r'[A-Za-z][A-Za-z0-9_]*(?:\.[A-Za-z][A-Za-z0-9_]*)*')
+_OPERATOR = re.compile(
+    '|'.join(
+        re.escape(op)
+        for op in sorted(OPERATOR_ALIASES, key=len, reverse=True)
+    ),
+    re.IGNORECASE,
+)
+_CONNECTIVE = re.compile(r'(?:and|or)(?![A-Za-z0-9_$])', re.IGNORECASE)
+_KEYWORD_CHARS = frozenset(
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$'
+)
+
+
+class _NoMatch(Exception):
+    """
+    Raised internally when an alternative doesn't match, allowing the parser
+    to backtrack and try the next one.
+    """
+    pass
+
+
+class Parser(object):
+    """
+    Parses a single query. Use :func:`parse` rather than instantiating this
+    directly.
+    """
+
+    def __init__(self, query):
+        # type: (str) -> None
+        # pyparsing expands tabs before parsing, which is visible in string
+        # literals, so do the same for the two parsers to agree.
+        self._text = query.expandtabs()
+        self._furthest = -1
+        self._expected = 'expression'
+
+    def parse(self):
+        # type: () -> Any
+        try:
+            node, pos = self._expression(0)
+            pos = self._skip(pos)
+            if pos != len(self._text):
+                self._fail(pos, 'end of text')
+        except _NoMatch:
+            raise ParseError(
+                'Expected {}'.format(self._expected),
+                self._text,
+                self._furthest,
+            )
+        return node
+
+    def _fail(self, pos, expected):
+        # type: (int, str) -> NoReturn
+        if pos > self._furthest:
+            self._furthest = pos
+            self._expected = expected
+        raise _NoMatch()
+
+    def _skip(self, pos):
+        # type: (int) -> int
+        return _WHITESPACE.match(self._text, pos).end()  # type: ignore
+
+    def _expression(self, pos):
+        # type: (int) -> Tuple[Any, int]
+        operands = []  # type: List[Any]
+        connectives = []  # type: List[str]
+
+        while True:
+            operand, pos = self._condition(pos)
+            operands.append(operand)
+
+            connective, next_pos = self._connective(pos)
+            if connective is None:
+                break
+            connectives.append(connective)
+            pos = next_pos
+
+        return chain(operands, connectives), pos
+
+    def _connective(self, pos):
+        # type: (int) -> Tuple[Any, int]
+        pos = self._skip(pos)
+        match = _CONNECTIVE.match(self._text, pos)
+        if match is None or (
+            pos > 0 and self._text[pos - 1] in _KEYWORD_CHARS
+        ):
+            return None, pos
+        return match.group().lower(), match.end()
+
+    def _condition(self, pos):
+        # type: (int) -> Tuple[Any, int]
+        try:
+            lval, after = self._operand(pos)
+            operator, after = self._operator(after)
+            rval, after = self._operand(after)
+            return Condition(operator, lval, rval), after
+        except _NoMatch:
+            pass
+
+        pos = self._skip(pos)
+        if not self._text.startswith('(', pos):
+            self._fail(pos, "'('")
+        node, pos = self._expression(pos + 1)
+        pos = self._skip(pos)
+        if not self._text.startswith(')', pos):
+            self._fail(pos, "')'")
+        return node, pos + 1
+
+    def _operator(self, pos):
+        # type: (int) -> Tuple[str, int]
+        pos = self._skip(pos)
+        match = _OPERATOR.match(self._text, pos)
+        if match is None:
+            self._fail(pos, 'operator')
+        return OPERATOR_ALIASES[match.group().lower()], match.end()
+
+    def _operand(self, pos):
+        # type: (int) -> Tuple[Any, int]
+        pos = self._skip(pos)
+        if not self._text.startswith('(', pos):
+            return self._value(pos)
+
+        items = []  # type: List[Any]
+        while True:
+            item, pos = self._value(pos + 1)
+            items.append(item)
+            pos = self._skip(pos)
+            if not self._text.startswith(',', pos):
+                break
+
+        if not self._text.startswith(')', pos):
+            self._fail(pos, "',' or ')'")
+        return Collection(tuple(items)), pos + 1
+
+    def _value(self, pos):
+        # type: (int) -> Tuple[Any, int]
+        text = self._text
+        pos = self._skip(pos)
+
+        match = _REAL.match(text, pos)
+        if match is not None:
+            return Constant(float(match.group())), match.end()
+
+        match = _INTEGER.match(text, pos)
+        if match is not None:
+            try:
+                return Constant(int(match.group())), match.end()
+            except ValueError:
+                # The grammar admits exponents on integers but they can't be
+                # converted, which pyparsing reports as a hard failure.
+                raise ParseError(
+                    'Invalid integer {}'.format(match.group()), text, pos
+                )
+
+        quote = text[pos:pos + 1]
+        if quote in _STRING_BODY:
+            end = _STRING_BODY[quote].match(text, pos).end()  # type: ignore
+            if text.startswith(quote, end):
+                return Constant(text[pos + 1:end]), end + 1
+            self._fail(end, 'closing {}'.format(quote))
+
+        match = _BOOLEAN.match(text, pos)
+        if match is not None:
+            return Constant(match.group().lower() == 'true'), match.end()
+
+        match = _NONE.match(text, pos)
+        if match is not None:
+            return Constant(None), match.end()
+
+        match = _PATH.match(text, pos)
+        if match is not None:
+            return SubstituteVal([match.group()]), match.end()
+
+        self._fail(pos, 'value')
+
+
+def parse(query):
+    # type: (str) -> Any
+    """
+    Parse a query into a syntax tree of :mod:`boolrule.nodes`.
+
+    :raises ParseError: if the query isn't a valid expression.
+    """
+    return Parser(query).parse()
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Evaluate many rules against the same context in one pass.
+
+A :class:`RuleSet` merges the syntax trees of all of its rules into a single
+graph in which structurally identical sub-expressions, conditions and property
+paths appear only once. Every node's result is memoised for the duration of a
+:meth:`RuleSet.match` call, so a condition shared by thousands of rules is
+evaluated at most once per context.
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple  # noqa
+
+from .boolrule import BoolRule
+from .compiler import resolve_operator
+from .exceptions import UnknownOperatorException
+from .nodes import BoolOp, Collection, Condition, Constant, SubstituteVal
+
+# Evaluates a node given the context and the memo for the current match.
+NodeEvaluator = Callable[[Any, List[Any]], Any]
+
+_UNSET = object()
+
+
+def _rule_items(rules):
+    # type: (Any) -> Any
+    """
+    Return the ``(id, rule)`` pairs of a mapping or an iterable of pairs.
+    """
+    return rules.items() if hasattr(rules, 'items') else rules
+
+
+def _compiled_rules(rules):
+    # type: (Any) -> Iterator[Tuple[Any, BoolRule]]
+    """
+    Yield the ``(id, rule)`` pairs of :func:`_rule_items`, compiling any rule
+    given as a query string into a :class:`~boolrule.BoolRule`.
+    """
+    for rule_id, rule in _rule_items(rules):
+        if not isinstance(rule, BoolRule):
+            rule = BoolRule(rule)
+        yield rule_id, rule
+
+
+class RuleSet(object):
+    """
+    A collection of rules, keyed by ID, that are matched against a context
+    together.
+
+    :param rules: A mapping, or iterable of ``(id, rule)`` pairs, where each
+                  rule is either a :class:`~boolrule.BoolRule` or a query
+                  string.
+    """
+
+    def __init__(self, rules):
+        # type: (Any) -> None
+        builder = _GraphBuilder()
+        roots = []  # type: List[Tuple[Any, int, NodeEvaluator]]
+        for rule_id, rule in _compiled_rules(rules):
+            slot = builder.expression(rule.ast)
+            roots.append((rule_id, slot, builder.evaluators[slot]))
+
+        self._roots = roots
+        self._template = builder.template
+        self._predicate_count = builder.predicate_count
+        self._path_count = builder.path_count
+
+    @property
+    def predicate_count(self):
+        # type: () -> int
+        """The number of distinct conditions across all rules."""
+        return self._predicate_count
+
+    @property
+    def path_count(self):
+        # type: () -> int
+        """The number of distinct property paths across all rules."""
+        return self._path_count
+
+    def match(self, context=None, errors=None):
+        # type: (Any, Optional[Dict[Any, Exception]]) -> Set[Any]
+        """
+        Test every rule against the context.
+
+        :param context: A dict context to evaluate the rules against.
+        :param errors: If given, a dict in which the exception raised by each
+                       rule that fails to evaluate is stored under the rule's
+                       ID, while the remaining rules are still tested.
+        :return: The set of IDs of the rules that passed.
+        :raises MissingVariableException: unless ``errors`` is given, as
+            :meth:`BoolRule.test` would for the first rule that references a
+            path the context doesn't supply.
+        """
+        memo = self._template[:]
+        matched = set()
+        for rule_id, slot, evaluate in self._roots:
+            passed = memo[slot]
+            if passed is _UNSET:
+                if errors is None:
+                    passed = memo[slot] = evaluate(context, memo)
+                else:
+                    # Slots that raised stay unset, so every rule sharing
+                    # them raises too
+                    try:
+                        passed = memo[slot] = evaluate(context, memo)
+                    except Exception as e:
+                        errors[rule_id] = e
+                        continue
+            if passed:
+                matched.add(rule_id)
+        return matched
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._roots)
+
+
+class _GraphBuilder(object):
+    """
+    Assigns every distinct node a slot in the memo used during a match, and
+    compiles an evaluator for each slot that reads its operands' results from
+    the memo before falling back to evaluating them.
+
+    Constants are stored in the memo template up front, so they're never
+    evaluated at all.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.template = []  # type: List[Any]
+        self.evaluators = []  # type: List[Any]
+        self.predicate_count = 0
+        self.path_count = 0
+        self.slots = {}  # type: Dict[Any, int]
+
+    def expression(self, node):
+        # type: (Any) -> int
+        slot = self.slots.get(node)
+        if slot is None:
+            if isinstance(node, BoolOp):
+                slot = self._add(self._bool_op(node))
+            elif isinstance(node, Condition):
+                slot = self._add(self._condition(node))
+                self.predicate_count += 1
+            elif isinstance(node, Constant):
+                slot = self._add(None, node.value)
+            else:
+                raise TypeError('Cannot compile {!r}'.format(node))
+            self.slots[node] = slot
+        return slot
+
+    def value(self, node):
+        # type: (Any) -> int
+        slot = self.slots.get(node)
+        if slot is None:
+            if isinstance(node, SubstituteVal):
+                slot = self._add(_path(node))
+                self.path_count += 1
+            elif isinstance(node, Collection):
+                if all(isinstance(i, Constant) for i in node.items):
+                    slot = self._add(None, [i.value for i in node.items])
+                else:
+                    slot = self._add(_collection(
+                        [self._operand(self.value(i)) for i in node.items]
+                    ))
+            elif isinstance(node, Constant):
+                slot = self._add(None, node.value)
+            else:
+                raise TypeError('Cannot compile {!r}'.format(node))
+            self.slots[node] = slot
+        return slot
+
+    def _add(self, evaluator, value=_UNSET):
+        # type: (Any, Any) -> int
+        self.evaluators.append(evaluator)
+        self.template.append(value)
+        return len(self.template) - 1
+
+    def _operand(self, slot):
+        # type: (int) -> Tuple[int, NodeEvaluator]
+        return slot, self.evaluators[slot]
+
+    def _bool_op(self, node):
+        # type: (BoolOp) -> NodeEvaluator
+        operands = tuple(
+            self._operand(self.expression(o)) for o in node.operands
+        )
+
+        if node.operator == 'and':
+            def all_(context, memo):
+                # type: (Any, List[Any]) -> Any
+                passed = False
+                for slot, evaluate in operands:
+                    passed = memo[slot]
+                    if passed is _UNSET:
+                        passed = memo[slot] = evaluate(context, memo)
+                    if not passed:
+                        return False
+                return passed
+
+            return all_
+
+        if node.operator == 'or':
+            def any_(context, memo):
+                # type: (Any, List[Any]) -> Any
+                passed = False
+                for slot, evaluate in operands:
+                    passed = memo[slot]
+                    if passed is _UNSET:
+                        passed = memo[slot] = evaluate(context, memo)
+                    if passed:
+                        return True
+                return passed
+
+            return any_
+
+        raise UnknownOperatorException(
+            "Unknown operator '{}'".format(node.operator)
+        )
+
+    def _condition(self, node):
+        # type: (Condition) -> NodeEvaluator
+        op = resolve_operator(node)
+        lslot, lget = self._operand(self.value(node.lval))
+        rslot, rget = self._operand(self.value(node.rval))
+
+        def condition(context, memo):
+            # type: (Any, List[Any]) -> Any
+            lval = memo[lslot]
+            if lval is _UNSET:
+                lval = memo[lslot] = lget(context, memo)
+            rval = memo[rslot]
+            if rval is _UNSET:
+                rval = memo[rslot] = rget(context, memo)
+            return op(lval, rval)
+
+        return condition
+
+
+def _path(node):
+    # type: (SubstituteVal) -> NodeEvaluator
+    get_val = node.get_val
+    return lambda context, memo: get_val(context)
+
+
+def _collection(items):
+    # type: (List[Tuple[int, NodeEvaluator]]) -> NodeEvaluator
+    def collection(context, memo):
+        # type: (Any, List[Any]) -> List[Any]
+        values = []
+        for slot, evaluate in items:
+            value = memo[slot]
+            if value is _UNSET:
+                value = memo[slot] = evaluate(context, memo)
+            values.append(value)
+        return values
+
+    return collection
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+A compact, versioned serialised form for compiled rules.
+
+Rules are stored as their compiled syntax tree, encoded as JSON, so they can
+be loaded straight back into an evaluable rule without any parsing. The
+encoding is::
+
+    [version, expression]
+
+where an expression is one of
+
+* ``["and", expression, expression, ...]`` or ``["or", ...]``
+* ``[operator, value, value]`` for a condition, using the canonical spelling
+  of the operator (``"=="``, ``"in"``, ``"⊆"``, ...)
+* a literal, for rules that always pass or fail such as ``*``
+
+and a value is a literal (a JSON string, number, boolean or ``null``), a
+property path as ``{"$": "user.age"}``, or a collection as a list of values.
+
+For example ``user.age >= 18 and user.country in ("GB", "FR")`` is stored
+as::
+
+    [1,["and",[">=",{"$":"user.age"},18],["in",{"$":"user.country"},["GB","FR"]]]]
+"""  # noqa: E501
+import json
+from typing import Any  # noqa
+
+from .nodes import (
+    OPERATOR_ALIASES,
+    BoolOp,
+    Collection,
+    Condition,
+    Constant,
+    SubstituteVal,
+)
+
+#: The version of the encoding written by :func:`dumps`.
+FORMAT_VERSION = 1
+
+_BOOL_OPERATORS = frozenset(['and', 'or'])
+_OPERATORS = frozenset(OPERATOR_ALIASES.values())
+_LITERAL_TYPES = (str, int, float, bool, type(None))
+
+
+def dumps(rule):
+    # type: (Any) -> str
+    """
+    Serialise a :class:`~boolrule.BoolRule`, or a syntax tree, to a string.
+    """
+    return json.dumps(
+        [FORMAT_VERSION, encode(getattr(rule, 'ast', rule))],
+        ensure_ascii=False,
+        separators=(',', ':'),
+    )
+
+
+def loads(data):
+    # type: (Any) -> Any
+    """
+    Load a :class:`~boolrule.BoolRule` from a string written by
+    :func:`dumps`, without parsing the query.
+
+    :raises ValueError: if the data isn't a serialised rule, or was written
+        by an incompatible version.
+    """
+    from .boolrule import BoolRule
+
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    try:
+        version, tree = json.loads(data)
+    except (TypeError, ValueError):
+        raise ValueError('Not a serialised rule')
+    if version != FORMAT_VERSION:
+        raise ValueError(
+            'Unsupported serialised rule version {!r}'.format(version)
+        )
+    return BoolRule.from_ast(decode(tree))
+
+
+def encode(node):
+    # type: (Any) -> Any
+    """
+    Encode a syntax tree as plain lists, dicts and literals, as embedded in
+    the output of :func:`dumps`.
+    """
+    if isinstance(node, BoolOp):
+        return [node.operator] + [encode(o) for o in node.operands]
+    if isinstance(node, Condition):
+        return [node.operator, _encode_value(node.lval),
+                _encode_value(node.rval)]
+    if isinstance(node, Constant):
+        return node.value
+    raise TypeError('Cannot encode {!r}'.format(node))
+
+
+def _encode_value(node):
+    # type: (Any) -> Any
+    if isinstance(node, Constant):
+        return node.value
+    if isinstance(node, SubstituteVal):
+        return {'$': node.path}
+    if isinstance(node, Collection):
+        return [_encode_value(item) for item in node.items]
+    raise TypeError('Cannot encode {!r}'.format(node))
+
+
+def decode(tree):
+    # type: (Any) -> Any
+    """
+    Decode a syntax tree produced by :func:`encode`.
+
+    :raises ValueError: if the tree is malformed.
+    """
+    if isinstance(tree, list) and tree:
+        operator, operands = tree[0], tree[1:]
+        if operator in _BOOL_OPERATORS and len(operands) >= 2:
+            return BoolOp(operator, tuple(decode(o) for o in operands))
+        if operator in _OPERATORS and len(operands) == 2:
+            lval, rval = operands
+            return Condition(
+                operator, _decode_value(lval), _decode_value(rval)
+            )
+    elif isinstance(tree, _LITERAL_TYPES):
+        return Constant(tree)
+    raise ValueError('Malformed serialised rule: {!r}'.format(tree))
+
+
+def _decode_value(value):
+    # type: (Any) -> Any
+    if isinstance(value, list):
+        return Collection(tuple(_decode_value(item) for item in value))
+    if isinstance(value, dict):
+        if list(value) == ['$']:
+            return SubstituteVal([value['$']])
+    elif isinstance(value, _LITERAL_TYPES):
+        return Constant(value)
+    raise ValueError('Malformed serialised value: {!r}'.format(value))
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Explain how a rule reached its result, and profile its conditions.
+
+Tracing uses its own evaluator, which walks the syntax tree recording what
+each node did, rather than the compiled one. It's only used by the functions
+:meth:`BoolRule.trace <boolrule.BoolRule.trace>` returns and by
+:meth:`BoolRule.explain <boolrule.BoolRule.explain>`; the rule is never
+changed, so :meth:`BoolRule.test <boolrule.BoolRule.test>` runs exactly the
+same code as before and tracing costs nothing unless it's used.
+"""
+from collections import namedtuple
+from timeit import default_timer
+from typing import Any, Callable, Dict, List, Optional  # noqa
+
+from .compiler import prepare_condition, prepare_conditions
+from .exceptions import UnknownOperatorException
+from .nodes import BoolOp, Condition, Constant
+
+
+class Explanation(namedtuple(
+    'Explanation',
+    'node evaluated result decided lval rval error seconds children',
+)):
+    """
+    What one node of a rule's syntax tree did while the rule was tested.
+    ``str(explanation)`` renders the tree one node per line.
+
+    :ivar node: The node, from :mod:`boolrule.nodes`.
+    :ivar evaluated: Whether the node was evaluated, or skipped because its
+                     ``and``/``or`` chain had already been decided.
+    :ivar result: The value of the node, or ``None`` if it wasn't evaluated
+                  or raised an exception.
+    :ivar decided: Whether this node decided the result of the chain
+                   containing it, short-circuiting the operands after it.
+    :ivar lval: For a condition, the resolved left-hand value.
+    :ivar rval: For a condition, the resolved right-hand value.
+    :ivar error: The exception raised by the node, or ``None``.
+    :ivar seconds: The time spent evaluating the node.
+    :ivar children: An :class:`Explanation` for each operand of an
+                    ``and``/``or`` chain.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        # type: () -> str
+        return self._format('')
+
+    def _format(self, indent):
+        # type: (str) -> str
+        if not self.evaluated:
+            outcome = 'skipped'
+        elif self.error is not None:
+            outcome = 'raised {}: {}'.format(
+                type(self.error).__name__, self.error
+            )
+        else:
+            outcome = '{!r} in {:.1f}us'.format(
+                self.result, self.seconds * 1e6
+            )
+
+        if isinstance(self.node, BoolOp):
+            label = self.node.operator
+        else:
+            label = str(self.node)
+        line = '{}{} -> {}'.format(indent, label, outcome)
+        if isinstance(self.node, Condition) and self.evaluated:
+            line += ' (lval={!r}, rval={!r})'.format(self.lval, self.rval)
+        if self.decided:
+            line += ', decided'
+        return '\n'.join(
+            [line] + [child._format(indent + '  ') for child in self.children]
+        )
+
+
+ConditionStats = namedtuple(
+    'ConditionStats', 'condition evaluated passed decided errors seconds'
+)
+ConditionStats.__doc__ = """
+Aggregate counters for one condition, across every traced test.
+
+:ivar condition: The condition, rendered as expression syntax.
+:ivar evaluated: The number of times the condition was evaluated.
+:ivar passed: The number of times it was true.
+:ivar decided: The number of times it decided its ``and``/``or`` chain.
+:ivar errors: The number of times it raised an exception.
+:ivar seconds: The total time spent evaluating it.
+"""
+
+
+class Profiler(object):
+    """
+    Collects an :class:`~boolrule.trace.Explanation` of every test made
+    through the functions :meth:`BoolRule.trace <boolrule.BoolRule.trace>`
+    returns for it, and keeps counters for each condition.
+
+    :param callback: Called with the rule and the
+                     :class:`~boolrule.trace.Explanation` after every traced
+                     test, for example to forward timings to a metrics
+                     system.
+    """
+
+    def __init__(self, callback=None):
+        # type: (Optional[Callable[[Any, Explanation], Any]]) -> None
+        self._callback = callback
+        self._conditions = {}  # type: Dict[str, List[Any]]
+        self.tests = 0
+        self.passed = 0
+        self.errors = 0
+
+    def record(self, rule, explanation):
+        # type: (Any, Explanation) -> None
+        """Add a traced test of ``rule`` to the counters."""
+        self.tests += 1
+        if explanation.error is not None:
+            self.errors += 1
+        elif explanation.result:
+            self.passed += 1
+        self._count(explanation)
+
+        if self._callback is not None:
+            self._callback(rule, explanation)
+
+    def stats(self):
+        # type: () -> List[ConditionStats]
+        """
+        Return the counters for every condition evaluated so far, the most
+        time-consuming first.
+        """
+        stats = [
+            ConditionStats(condition, *counters)
+            for condition, counters in self._conditions.items()
+        ]
+        stats.sort(key=lambda s: s.seconds, reverse=True)
+        return stats
+
+    def reset(self):
+        # type: () -> None
+        """Clear every counter."""
+        self._conditions.clear()
+        self.tests = self.passed = self.errors = 0
+
+    def _count(self, explanation):
+        # type: (Explanation) -> None
+        for child in explanation.children:
+            self._count(child)
+
+        if not explanation.evaluated or isinstance(explanation.node, BoolOp):
+            return
+        key = str(explanation.node)
+        counters = self._conditions.get(key)
+        if counters is None:
+            counters = self._conditions[key] = [0, 0, 0, 0, 0.0]
+        counters[0] += 1
+        counters[1] += bool(explanation.error is None and explanation.result)
+        counters[2] += explanation.decided
+        counters[3] += explanation.error is not None
+        counters[4] += explanation.seconds
+
+
+class TracingEvaluator(object):
+    """
+    Tests a rule like its compiled evaluator, recording what happened in a
+    :class:`Profiler`.
+
+    :param rule: The rule being traced, which isn't changed.
+    :param profiler: The profiler to record each test in.
+    """
+
+    def __init__(self, rule, profiler):
+        # type: (Any, Profiler) -> None
+        self._rule = rule
+        self._ast = rule.ast
+        self._prepared = rule._prepared_conditions()
+        self.profiler = profiler
+
+    def __call__(self, context):
+        # type: (Any) -> Any
+        explanation = explain(self._ast, context, prepared=self._prepared)
+        self.profiler.record(self._rule, explanation)
+        if explanation.error is not None:
+            raise explanation.error
+        return explanation.result
+
+
+def explain(node, context, decides=None, prepared=None):
+    # type: (Any, Any, Optional[bool], Optional[Dict[int, Any]]) -> Explanation
+    """
+    Evaluate a syntax tree against a context, returning an
+    :class:`Explanation` of how it was evaluated. Exceptions are recorded in
+    the explanation rather than raised.
+
+    :param decides: For an operand of a chain, the truth value that decides
+                    the chain.
+    :param prepared: The tree's conditions, as returned by
+                     :func:`~boolrule.compiler.prepare_conditions`, to avoid
+                     preparing them again.
+    """
+    if prepared is None:
+        prepared = prepare_conditions(node)
+
+    if isinstance(node, BoolOp):
+        started = default_timer()
+        children, result, error = _chain(node, context, prepared)
+        lval = rval = None
+    else:
+        children = []
+        lval = rval = result = error = None
+        condition = None
+        if isinstance(node, Condition):
+            # Resolved outside the timed section, as it is when compiling
+            try:
+                condition = (
+                    prepared.get(id(node)) or prepare_condition(node)
+                )
+            except Exception as e:
+                error = e
+
+        started = default_timer()
+        if error is None:
+            try:
+                if condition is not None:
+                    op, lconst, lget, rconst, rget = condition
+                    lval = lget if lconst else lget(context)
+                    rval = rget if rconst else rget(context)
+                    result = op(lval, rval)
+                elif isinstance(node, Constant):
+                    result = node.value
+                else:
+                    raise TypeError('Cannot evaluate {!r}'.format(node))
+            except Exception as e:
+                error = e
+
+    return Explanation(
+        node=node,
+        evaluated=True,
+        result=result,
+        decided=(
+            error is None and decides is not None and
+            bool(result) is decides
+        ),
+        lval=lval,
+        rval=rval,
+        error=error,
+        seconds=default_timer() - started,
+        children=children,
+    )
+
+
+def _chain(node, context, prepared):
+    # type: (BoolOp, Any, Dict[int, Any]) -> Any
+    """
+    Evaluate an ``and``/``or`` chain, returning the explanations of its
+    operands, its result and the exception it raised.
+    """
+    if node.operator not in ('and', 'or'):
+        return [], None, UnknownOperatorException(
+            "Unknown operator '{}'".format(node.operator)
+        )
+    decides = node.operator == 'or'
+
+    children = []  # type: List[Explanation]
+    stopped = False
+    for operand in node.operands:
+        if stopped:
+            children.append(_skipped(operand))
+            continue
+
+        child = explain(operand, context, decides, prepared)
+        children.append(child)
+        stopped = child.decided or child.error is not None
+
+    last = children[-1]
+    decided = [child for child in children if child.decided]
+    errors = [child.error for child in children if child.error is not None]
+    if errors:
+        return children, None, errors[0]
+    if decided:
+        # Mirror the compiled evaluator, which returns the deciding value as
+        # a bool, except for the second operand of a pair.
+        if decided[0] is last and len(children) == 2:
+            return children, last.result, None
+        return children, decides, None
+    return children, last.result, None
+
+
+def _skipped(node):
+    # type: (Any) -> Explanation
+    return Explanation(
+        node=node, evaluated=False, result=None, decided=False, lval=None,
+        rval=None, error=None, seconds=0.0, children=[
+            _skipped(operand) for operand in node.operands
+        ] if isinstance(node, BoolOp) else [],
+    )
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Evaluate a rule over columnar data with NumPy.
+
+Instead of testing a rule against one context at a time, the rule's syntax
+tree is evaluated once per batch using vectorised comparisons, ``isin`` for
+membership and boolean masks for ``and``/``or``. Each operand of an
+``and``/``or`` chain is only evaluated for the rows it would have been
+evaluated for by :meth:`BoolRule.test <boolrule.BoolRule.test>`, so errors
+and :class:`~boolrule.MissingVariableException` are raised exactly when
+testing some row individually would raise them.
+
+NumPy is required; pandas DataFrames are accepted but pandas itself isn't
+needed.
+"""
+from typing import Any, Callable, Dict, Tuple  # noqa
+
+import numpy as np
+
+from .compiler import OPERATORS, resolve_operator
+from .exceptions import MissingVariableException, UnknownOperatorException
+from .nodes import (
+    BoolOp,
+    Collection,
+    Condition,
+    Constant,
+    SubstituteVal,
+    pathDelimiter,
+)
+
+_COMPARISONS = frozenset(['==', '!=', '>', '>=', '<', '<='])
+_NUMERIC_KINDS = frozenset('biuf')
+
+
+def evaluate_columns(rule, data):
+    # type: (Any, Any) -> Any
+    """
+    Evaluate a rule against every row of a batch of columns.
+
+    :param rule: A :class:`~boolrule.BoolRule` or a syntax tree.
+    :param data: A pandas DataFrame or a mapping of property paths to
+                 equal-length arrays. Paths may be given as flat dotted keys
+                 (``{'user.age': ...}``) or as nested mappings
+                 (``{'user': {'age': ...}}``).
+    :return: A boolean NumPy array with one element per row.
+    :raises MissingVariableException: if a row would reach a property path
+        that has no column.
+    """
+    ast = getattr(rule, 'ast', rule)
+    batch = _Batch(data)
+    if not batch.size:
+        # There's no row to raise for, even if no column is supplied
+        return np.zeros(0, dtype=bool)
+    return batch.expression(ast, np.arange(batch.size))
+
+
+class _Batch(object):
+
+    def __init__(self, data):
+        # type: (Any) -> None
+        self._data = data
+        self._columns = {}  # type: Dict[str, Any]
+        self._empty = not len(getattr(data, 'columns', data))
+
+        index = getattr(data, 'index', None)
+        if index is not None:
+            self.size = len(index)
+        else:
+            sizes = set(len(np.asarray(c)) for c in _leaves(data))
+            if len(sizes) > 1:
+                raise ValueError('columns must all be the same length')
+            self.size = sizes.pop() if sizes else 0
+
+    def column(self, path):
+        # type: (SubstituteVal) -> Any
+        try:
+            return self._columns[path.path]
+        except KeyError:
+            pass
+
+        if self._empty:
+            raise MissingVariableException('context missing or empty')
+
+        try:
+            if path.path in self._data:
+                column = self._data[path.path]
+            else:
+                column = self._data
+                for part in path.path.split(pathDelimiter):
+                    column = column[part]
+        except (KeyError, IndexError, TypeError):
+            raise MissingVariableException(
+                'no value supplied for {}'.format(path.path)
+            )
+
+        column = self._columns[path.path] = np.asarray(column)
+        return column
+
+    def expression(self, node, rows):
+        # type: (Any, Any) -> Any
+        """
+        Evaluate an expression for the given row indices, returning a boolean
+        mask aligned with ``rows``.
+        """
+        if isinstance(node, BoolOp):
+            if node.operator == 'and':
+                return self._and(node.operands, rows)
+            if node.operator == 'or':
+                return self._or(node.operands, rows)
+            raise UnknownOperatorException(
+                "Unknown operator '{}'".format(node.operator)
+            )
+        if isinstance(node, Condition):
+            return self._condition(node, rows)
+        if isinstance(node, Constant):
+            return np.full(len(rows), bool(node.value))
+        raise TypeError('Cannot evaluate {!r}'.format(node))
+
+    def _and(self, operands, rows):
+        # type: (Any, Any) -> Any
+        result = np.zeros(len(rows), dtype=bool)
+        pending = np.arange(len(rows))
+        last = len(operands) - 1
+        for i, operand in enumerate(operands):
+            if not len(pending):
+                break
+            mask = self.expression(operand, rows[pending])
+            if i == last:
+                result[pending] = mask
+            else:
+                pending = pending[mask]
+        return result
+
+    def _or(self, operands, rows):
+        # type: (Any, Any) -> Any
+        result = np.zeros(len(rows), dtype=bool)
+        pending = np.arange(len(rows))
+        for operand in operands:
+            if not len(pending):
+                break
+            mask = self.expression(operand, rows[pending])
+            result[pending[mask]] = True
+            pending = pending[~mask]
+        return result
+
+    def _condition(self, node, rows):
+        # type: (Condition, Any) -> Any
+        op = resolve_operator(node)
+
+        lconst, lval = self._value(node.lval, rows)
+        rconst, rval = self._value(node.rval, rows)
+
+        if lconst and rconst:
+            return np.full(len(rows), bool(op(lval, rval)))
+
+        collections = (
+            isinstance(node.lval, Collection) or
+            isinstance(node.rval, Collection)
+        )
+        if node.operator in _COMPARISONS and not collections:
+            return np.asarray(op(lval, rval), dtype=bool)
+
+        if node.operator in ('in', 'notin') and rconst and not lconst:
+            mask = _isin(lval, rval)
+            return mask if node.operator == 'in' else ~mask
+
+        return _elementwise(op, lconst, lval, rconst, rval, len(rows))
+
+    def _value(self, node, rows):
+        # type: (Any, Any) -> Tuple[bool, Any]
+        """
+        Return ``(True, value)`` for a value that's the same for every row,
+        or ``(False, array)`` with the value for each row.
+        """
+        if isinstance(node, Constant):
+            return True, node.value
+
+        if isinstance(node, SubstituteVal):
+            column = self.column(node)
+            return False, column if len(rows) == self.size else column[rows]
+
+        if isinstance(node, Collection):
+            items = [self._value(item, rows) for item in node.items]
+            if all(const for const, _ in items):
+                return True, [value for _, value in items]
+
+            # Rows hold Python values rather than NumPy scalars, which would
+            # broadcast when a list containing them is compared to another
+            columns = [
+                value if const else value.tolist() for const, value in items
+            ]
+            values = np.empty(len(rows), dtype=object)
+            for i in range(len(rows)):
+                values[i] = [
+                    value if const else value[i]
+                    for (const, _), value in zip(items, columns)
+                ]
+            return False, values
+
+        raise TypeError('Cannot evaluate {!r}'.format(node))
+
+
+def _leaves(data):
+    # type: (Any) -> Any
+    for value in data.values():
+        if hasattr(value, 'values') and hasattr(value, 'keys'):
+            for leaf in _leaves(value):
+                yield leaf
+        else:
+            yield value
+
+
+def _isin(column, values):
+    # type: (Any, Any) -> Any
+    """
+    Vectorised ``x in values`` for a column and a list of literals, falling
+    back to Python membership tests when NumPy can't compare the types.
+    """
+    numeric = all(
+        isinstance(v, (int, float)) and not isinstance(v, bool)
+        for v in values
+    )
+    strings = all(isinstance(v, str) for v in values)
+    if (
+        (numeric and column.dtype.kind in _NUMERIC_KINDS) or
+        (strings and column.dtype.kind in 'US')
+    ):
+        return np.isin(column, values)
+
+    return _elementwise(
+        OPERATORS['in'], False, column, True, values, len(column)
+    )
+
+
+def _elementwise(op, lconst, lval, rconst, rval, size):
+    # type: (Callable[[Any, Any], Any], bool, Any, bool, Any, int) -> Any
+    """
+    Apply ``op`` row by row in Python, for operators and operand types that
+    NumPy can't vectorise with the same semantics as the scalar evaluator.
+    """
+    ufunc = np.frompyfunc(op, 2, 1)
+    result = ufunc(
+        _scalar(lval) if lconst else lval,
+        _scalar(rval) if rconst else rval,
+    )
+    return np.asarray(result, dtype=object).astype(bool).reshape(size)
+
+
+def _scalar(value):
+    # type: (Any) -> Any
+    """
+    Wrap a value in a 0-d object array so NumPy broadcasts it as a single
+    element, even if it's a list.
+    """
+    wrapped = np.empty((), dtype=object)
+    wrapped[()] = value
+    return wrapped
@@ -30,6 +30,14 @@ setup(
                  'boolrule'},
     include_package_data=True,
     install_requires=requirements,
+    extras_require={
+        'numpy': ['numpy'],
+    },
+    entry_points={
+        'console_scripts': [
+            'boolrule = boolrule.cli:main',
+        ],
+    },
     license="MIT license",
     zip_safe=False,
     keywords='boolrule boolean expression',
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+import sys
+
+# Tests using async/await syntax can't even be collected before Python 3.5.
+collect_ignore = ['test_aio.py'] if sys.version_info < (3, 5) else []
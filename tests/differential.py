@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers for checking that another way of evaluating rules returns the same
+results, and raises the same exceptions, as ``BoolRule.test()``.
+"""
+import random
+
+from boolrule import BoolRule, MissingVariableException
+
+QUERIES = [
+    'a = 1 and b = 2',
+    'a = 1 and b = 2 and c in (1, 2, 3)',
+    'a = 1 or b = 2 or c notin (1, 2)',
+    'a = 1 and (b = 2 or c = 3) and d != 4',
+    'a = 1 and b > 2 and c = 3 and d = 4',
+    'a is none or b isnot none or (c = 1 and d = 1)',
+    'a isnot none or b < 2',
+    'a > 1 or (b = 2 and c ∩ (1, 2))',
+    'a in (b, 2) and c ∩ (1, 2)',
+    'a.b > 2 or (c.d.e = 3 and a.b < 1)',
+    'keys = 1 or a = 1',
+]
+
+NAMES = ('a', 'b', 'c', 'd', 'keys')
+
+VALUES = [None, 0, 1, 2, 3, 4, 'x', [1, 3], {'b': 3, 'd': {'e': 3}}]
+
+
+def outcome(test, context):
+    """Return what ``test(context)`` returns, or the error it raises."""
+    try:
+        return test(context)
+    except (MissingVariableException, TypeError) as e:
+        return type(e), str(e)
+
+
+def random_contexts(seed, count):
+    """Yield ``count`` contexts with random values for some of the names."""
+    rand = random.Random(seed)
+    for _ in range(count):
+        yield dict(
+            (name, rand.choice(VALUES))
+            for name in NAMES if rand.random() < 0.85
+        )
+
+
+def assert_matches_test(query, test, count=500):
+    """
+    Assert that ``test`` agrees with ``BoolRule(query).test`` for ``count``
+    random contexts.
+    """
+    expected = BoolRule(query).test
+    for context in random_contexts(query, count):
+        assert outcome(test, context) == outcome(expected, context), context
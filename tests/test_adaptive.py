@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from boolrule import BoolRule, MissingVariableException
+from boolrule.adaptive import AdaptiveEvaluator
+
+from .differential import QUERIES, assert_matches_test
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_results_and_exceptions_match_textual_order(query):
+    adaptive = BoolRule(query, adaptive=True)
+    adaptive._evaluate = AdaptiveEvaluator(
+        adaptive.ast, sample_every=2, reorder_every=50
+    )
+    assert_matches_test(query, adaptive.test, count=2000)
+
+
+def test_decisive_conditions_move_first():
+    rule = AdaptiveEvaluator(
+        BoolRule('a = 1 and b = 1').ast, sample_every=1, reorder_every=100
+    )
+    for _ in range(200):
+        assert rule({'a': 1, 'b': 2}) is False
+    assert str(rule.ast) == 'b == 1 and a == 1'
+
+
+def test_operands_that_may_raise_are_not_moved():
+    rule = AdaptiveEvaluator(
+        BoolRule('a = 1 and b > 1 and c = 1 and d = 1').ast,
+        sample_every=1, reorder_every=100,
+    )
+    for _ in range(200):
+        rule({'a': 1, 'b': 2, 'c': 1, 'd': 2})
+    assert str(rule.ast) == 'a == 1 and b > 1 and d == 1 and c == 1'
+
+
+def test_skipped_missing_paths_still_raise():
+    rule = AdaptiveEvaluator(
+        BoolRule('a = 1 and b = 1').ast, sample_every=1, reorder_every=100
+    )
+    for _ in range(200):
+        rule({'a': 1, 'b': 2})
+    with pytest.raises(MissingVariableException):
+        rule({'b': 2})
+
+
+def test_adaptive_is_opt_in():
+    assert not isinstance(BoolRule('a = 1')._evaluate, AdaptiveEvaluator)
+    assert BoolRule('a = 1 and b = 1', adaptive=True).test({'a': 1, 'b': 1})
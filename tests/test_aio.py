@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import collections
+
+import pytest
+
+from boolrule import BoolRule, MissingVariableException, PreparedContext
+
+
+class FakeStore(object):
+    """An async key-value store that records the lookups made."""
+
+    def __init__(self, values, delay=0.01):
+        self.values = values
+        self.delay = delay
+        self.lookups = []
+        self.active = 0
+        self.max_active = 0
+
+    def lookup(self, key):
+        async def fetch():
+            self.lookups.append(key)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            try:
+                await asyncio.sleep(self.delay)
+            finally:
+                self.active -= 1
+            return self.values[key]
+        return fetch
+
+
+def run(awaitable):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(awaitable)
+    finally:
+        loop.close()
+
+
+def test_plain_context():
+    rule = BoolRule('user.age > 18 and user.country in ("GB", "FR")')
+    context = {'user': {'age': 30, 'country': 'GB'}}
+    assert run(rule.test_async(context)) is rule.test(context) is True
+
+
+def test_awaitable_and_async_callable_leaves():
+    store = FakeStore({'age': 30, 'profile': {'country': 'GB'}})
+    context = {
+        'user': {'age': store.lookup('age')},
+        'profile': store.lookup('profile')(),
+    }
+    rule = BoolRule('user.age > 18 and profile.country = "GB"')
+    assert run(rule.test_async(context)) is True
+
+
+def test_unreached_values_are_not_awaited():
+    store = FakeStore({'a': 1, 'b': 2, 'c': 3})
+    context = {
+        'flag': 0,
+        'a': store.lookup('a'),
+        'nested': {'b': store.lookup('b')},
+    }
+    rule = BoolRule('flag = 1 and (a = 1 or nested.b = 2)')
+    assert run(rule.test_async(context)) is False
+    assert store.lookups == []
+
+
+@pytest.mark.parametrize('query, lookups', [
+    ('a = 1 and b = 2 and c = 3 and d = 4', ['a']),
+    ('a = 1 and (b = 2 and c = 3)', ['a']),
+    ('a = 0 or (b = 2 and (c = 0 or d = 4))', ['a']),
+    ('a = 1 or (b = 0 and (c = 3 or d = 4))', ['a', 'b']),
+    ('a = 1 or (b = 2 and (c = 3 or d = 4))', ['a', 'b', 'c']),
+])
+def test_lookups_after_a_short_circuit_are_never_made(query, lookups):
+    store = FakeStore({'a': 0, 'b': 2, 'c': 3, 'd': 4})
+    context = dict((key, store.lookup(key)) for key in 'abcd')
+    rule = BoolRule(query)
+    assert run(rule.test_async(context)) is rule.test(store.values)
+    assert store.lookups == lookups
+
+
+def test_condition_operands_are_looked_up_concurrently():
+    store = FakeStore({'a': 1, 'b': 1, 'c': 2})
+    context = dict((key, store.lookup(key)) for key in 'abc')
+    assert run(BoolRule('a = b and c in (a, 2)').test_async(context)) is True
+    assert store.lookups == ['a', 'b', 'c']
+    assert store.max_active == 2
+
+
+def test_prefetch_looks_up_a_chain_concurrently():
+    store = FakeStore({'a': 1, 'b': 2, 'c': 3})
+    context = dict((key, store.lookup(key)) for key in 'abc')
+    rule = BoolRule('a = 1 and b = 2 and c = 3')
+    assert run(rule.test_async(context, prefetch=True)) is True
+    assert sorted(store.lookups) == ['a', 'b', 'c']
+    assert store.max_active == 3
+
+
+def test_lookups_are_deduplicated():
+    store = FakeStore({'profile': {'age': 30, 'country': 'GB'}})
+    context = {'profile': store.lookup('profile')}
+    rule = BoolRule(
+        'profile.age > 18 and profile.country = "GB" and profile.age < 65'
+    )
+    assert run(rule.test_async(context)) is True
+    assert store.lookups == ['profile']
+
+
+def test_pending_lookups_are_cancelled():
+    slow = FakeStore({'b': 2}, delay=10)
+    context = {'a': 2, 'b': slow.lookup('b')}
+
+    async def timed():
+        return await asyncio.wait_for(
+            BoolRule('a = 1 and b = 2').test_async(context, prefetch=True), 1
+        )
+    assert run(timed()) is False
+    assert slow.active == 0
+
+
+def test_shared_futures_are_not_cancelled():
+    async def scenario():
+        future = asyncio.get_event_loop().create_future()
+        rule = BoolRule('a = 1 and b = 2')
+        context = {'a': 2, 'b': future}
+        assert await rule.test_async(context, prefetch=True) is False
+        return future.cancelled()
+    assert run(scenario()) is False
+
+
+@pytest.mark.parametrize('context', [
+    None,
+    {},
+    {'a': 1},
+    {'a': 1, 'b': {}},
+    PreparedContext({'a': 1}),
+])
+def test_missing_values_raise(context):
+    rule = BoolRule('a = 1 and b.c = 1')
+    with pytest.raises(MissingVariableException):
+        run(rule.test_async(context))
+
+
+def test_missing_async_values_raise():
+    store = FakeStore({'b': {}})
+    rule = BoolRule('b.c = 1')
+    with pytest.raises(MissingVariableException):
+        run(rule.test_async({'b': store.lookup('b')}))
+
+
+@pytest.mark.parametrize('context', [
+    {'a': {}},
+    {'a': 0},
+    {'a': []},
+    {'a': collections.defaultdict(int)},
+    {'a': {'b': {}}},
+])
+def test_empty_nested_values_behave_as_in_test(context):
+    def outcome(test):
+        try:
+            return test(context)
+        except MissingVariableException as e:
+            return str(e)
+
+    rule = BoolRule('a.b = 0')
+    assert outcome(lambda c: run(rule.test_async(c))) == outcome(rule.test)
+
+
+def test_literal_operands_are_prepared_once(monkeypatch):
+    from boolrule import compiler
+
+    rule = BoolRule('x in ({})'.format(', '.join(map(str, range(1000)))))
+    searched, factory = compiler._HASHED_OPERATORS['in']
+    calls = []
+
+    def counting(values, fallback):
+        calls.append(values)
+        return factory(values, fallback)
+
+    monkeypatch.setitem(
+        compiler._HASHED_OPERATORS, 'in', (searched, counting)
+    )
+    assert run(rule.test_async({'x': 999})) is True
+    assert run(rule.test_async({'x': 1000})) is False
+    assert calls == []
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from boolrule import BoolRule, analyze
+
+
+def test_reports_paths_operators_and_constants():
+    deps = BoolRule(
+        'user.age >= 18 and user.country in ("GB", "FR") and '
+        '(cart.total > 1 or user.age = 1 or user.vip = true)'
+    ).analyze()
+
+    assert deps.paths == ('user.age', 'user.country', 'cart.total', 'user.vip')
+    assert deps.tree == {
+        'user': {'age': {}, 'country': {}, 'vip': {}},
+        'cart': {'total': {}},
+    }
+    assert deps.operators == frozenset(['and', 'or', '>=', '>', '==', 'in'])
+    assert deps.constants == (18, 'GB', 'FR', 1, True)
+
+
+@pytest.mark.parametrize('paths,tree', [
+    (['cart', 'cart.total'], {'cart': {}}),
+    (['cart.total', 'cart'], {'cart': {}}),
+    (['a.b.c', 'a.b.d', 'a.e'], {'a': {'b': {'c': {}, 'd': {}}, 'e': {}}}),
+    (['a.b', 'a.b.c', 'a.d'], {'a': {'b': {}, 'd': {}}}),
+])
+def test_paths_that_need_a_whole_value_are_collapsed(paths, tree):
+    query = ' and '.join('{} = 1'.format(path) for path in paths)
+    assert BoolRule(query).analyze().tree == tree
+
+
+def test_reports_the_optimised_rule():
+    deps = BoolRule('1 = 2 or (x = 3 and 4 = 4)').analyze()
+    assert deps.paths == ('x',)
+    assert deps.constants == (3,)
+
+    deps = BoolRule('*').analyze()
+    assert (deps.paths, deps.tree, deps.operators) == ((), {}, frozenset())
+
+
+def test_cost_grows_with_the_work_a_rule_does():
+    def cost(query):
+        return BoolRule(query).analyze().cost
+
+    assert cost('a = 1') == 2
+    assert cost('a.b.c = 1') == 4
+    assert cost('a = 1 and b = 2') == 4
+    assert cost('a in (1, 2, 3)') == cost('a = 1')
+    assert cost('a ⊆ (1, 2, 3)') < cost('(1, 2, 3) ⊆ a')
+    assert cost('a in (1, b, 3)') > cost('a in (1, 2, 3)')
+
+
+def test_combines_several_rules():
+    deps = analyze(
+        BoolRule('user.age > 18 and x = 1').ast,
+        BoolRule('user.country = "GB" or x = true').ast,
+    )
+    assert deps.paths == ('user.age', 'x', 'user.country')
+    assert deps.tree == {'user': {'age': {}, 'country': {}}, 'x': {}}
+    assert deps.constants == (18, 1, 'GB', True)
+    assert deps.cost == 10
@@ -1,6 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import pickle
+import subprocess
+import sys
+import weakref
+
 import pytest
 
 from boolrule import BoolRule, MissingVariableException
@@ -63,6 +69,38 @@ def test_nested_logical_combinations_and_error(s, expected):
     assert boolrule.test() == expected
 
 
+@pytest.mark.parametrize('s,expected', [
+    # and/or share precedence and associate to the right
+    ('1 = 2 and 1 = 1 or 1 = 1', False),
+    ('1 = 1 or 1 = 2 and 1 = 2', True),
+    ('(1 = 2 and 1 = 1) or 1 = 1', True),
+    ('1 = 1 and 2 = 2 and 3 = 3 and 4 = 5', False),
+    ('1 = 2 or 2 = 3 or 3 = 4 or 4 = 4', True),
+])
+def test_logical_associativity(s, expected):
+    boolrule = BoolRule(s)
+    assert boolrule.test() == expected
+
+
+@pytest.mark.parametrize('s,expected', [
+    ('1 = 2 and foo = 1', False),
+    ('1 = 1 or foo = 1', True),
+    ('1 = 2 and (foo = 1 or bar = 2)', False),
+    ('(1 = 1 or foo = 1) or bar = 2', True),
+])
+def test_short_circuit_skips_missing_vars(s, expected):
+    boolrule = BoolRule(s)
+    assert boolrule.test({}) == expected
+
+
+def test_rule_is_reusable_across_contexts():
+    boolrule = BoolRule('x in (1, 2, y) and z.a >= 3')
+    assert boolrule.test({'x': 1, 'y': 0, 'z': {'a': 3}}) is True
+    assert boolrule.test({'x': 5, 'y': 5, 'z': {'a': 4}}) is True
+    assert boolrule.test({'x': 5, 'y': 6, 'z': {'a': 4}}) is False
+    assert boolrule.test({'x': 2, 'y': 6, 'z': {'a': 2}}) is False
+
+
 @pytest.mark.parametrize('s,context,expected', [
     ('foo = "bar" AND baz > 10', {'foo': 'bar', 'baz': 20}, True),
     ('foo = "bar" AND baz > 10', {'foo': 'bar', 'baz': 9}, False),
@@ -142,6 +180,108 @@ def test_missing_vars_raises_exception(s, context):
         boolrule.test(context)
 
 
+@pytest.mark.parametrize('s,context,expected', [
+    ('x in (1, 2)', {'x': True}, True),
+    ('x in (1.0, "a")', {'x': 1}, True),
+    ('x notin (0, 2)', {'x': False}, False),
+    ('x in ("a", "b")', {'x': ['a']}, False),
+    ('x notin ("a", "b")', {'x': {'a': 1}}, True),
+    ('x ⊆ (1, 2, 3)', {'x': [True, 2]}, True),
+    ('x ⊆ (1, 2, 3)', {'x': [[1], 2]}, False),
+    ('(1, 2) ⊇ x', {'x': [2.0]}, True),
+    ('x ∩ ("a", "b")', {'x': ['c', ['a'], 'b']}, True),
+    ('x not∩ ("a", "b")', {'x': 'xyz'}, True),
+    ('x ⊇ ("ab")', {'x': 'abc'}, True),
+    ('x ⊆ y', {'x': [1, 2], 'y': [2, 1, 3]}, True),
+    ('x ⊆ y', {'x': [[1]], 'y': [[1], 2]}, True),
+    ('x ∩ y', {'x': (1, 2), 'y': [3, 2]}, True),
+    ('x not∩ y', {'x': [1], 'y': ([1],)}, True),
+])
+def test_membership_follows_equality(s, context, expected):
+    assert BoolRule(s).test(context) is expected
+
+
+class Code(str):
+    # Equal to the plain string but hashed differently, like a str enum
+    def __hash__(self):
+        return hash((Code, str(self)))
+
+
+class Wildcard(object):
+    def __eq__(self, other):
+        return other == 'b'
+
+    __hash__ = object.__hash__
+
+
+@pytest.mark.parametrize('value', [Code('b'), Wildcard()])
+def test_membership_of_values_hashed_inconsistently(value):
+    assert BoolRule('x in ("a", "b")').test({'x': value}) is True
+    assert BoolRule('x notin ("a", "b")').test({'x': value}) is False
+    assert BoolRule('x in ("a", "c")').test({'x': value}) is False
+
+
+class Account(object):
+    __slots__ = ('balance',)
+
+    def __init__(self, balance=None):
+        if balance is not None:
+            self.balance = balance
+
+
+@pytest.mark.parametrize('context', [
+    {'foo': {'bar': 1}},
+    {'foo': [1, 2]},
+    {'foo': 5},
+    {'foo': Account()},
+    {'foo': Account(1)},
+])
+def test_missing_nested_vars_raise_exception(context):
+    with pytest.raises(MissingVariableException):
+        BoolRule('foo.baz = 1').test(context)
+
+
+def test_paths_mix_attributes_and_items():
+    class Order(object):
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+        def __getitem__(self, key):
+            return 'item:' + key
+
+    rule = BoolRule('order.account.balance > 10 and order.ref = "item:ref"')
+    context = {'order': Order(account=Account(20))}
+    assert rule.test(context) is True
+    assert rule.test({'order': Order(account=Account(5))}) is False
+
+    # An instance attribute takes precedence over an item of the same name
+    assert rule.test({'order': Order(account=Account(20), ref='x')}) is False
+
+
+def test_paths_follow_attributes_through_proxies():
+    class User(object):
+        __slots__ = ('age', '__weakref__')
+
+    user = User()
+    user.age = 20
+    assert BoolRule('u.age > 18').test({'u': weakref.proxy(user)}) is True
+    with pytest.raises(MissingVariableException):
+        BoolRule('u.name = 1').test({'u': weakref.proxy(user)})
+
+
+def test_property_is_read_once():
+    reads = []
+
+    class User(object):
+        @property
+        def age(self):
+            reads.append(1)
+            return 30
+
+    assert BoolRule('user.age > 18').test({'user': User()}) is True
+    assert len(reads) == 1
+
+
 @pytest.mark.parametrize('s', [
     # unbalanced brackets
     ('5 > 4)',),
@@ -151,3 +291,63 @@ def test_missing_vars_raises_exception(s, context):
 def test_malformed_queries_raises_exception(s):
     with pytest.raises(Exception):
         BoolRule(s)
+
+
+def test_import_does_not_load_pyparsing():
+    code = (
+        "import sys, boolrule; "
+        "boolrule.BoolRule('x = 1').test({'x': 1}); "
+        "sys.exit('pyparsing' in sys.modules)"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.check_call([sys.executable, '-c', code], cwd=root)
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 7), reason='needs module __getattr__'
+)
+def test_grammar_names_remain_importable():
+    from boolrule.boolrule import boolExpression
+    assert boolExpression.parseString('x = 1', True)
+
+
+def test_from_ast_round_trips_through_pickle():
+    rule = BoolRule('x in (1, 2) and (y.z != "a" or w is none)')
+    loaded = BoolRule.from_ast(pickle.loads(pickle.dumps(rule.ast)))
+
+    assert loaded.ast == rule.ast
+    context = {'x': 2, 'y': {'z': 'a'}, 'w': None}
+    assert loaded.test(context) is rule.test(context) is True
+
+
+def test_rules_share_paths_and_conditions():
+    first = BoolRule('user.age >= 18 and user.name = "ann"', lazy=True)
+    second = BoolRule('user.age >= 18 or x is 1', lazy=True)
+    first._compile()
+    second._compile()
+
+    assert first.ast.operands[0].lval is second.ast.operands[0].lval
+    assert not hasattr(first, '__dict__')
+    assert first.test({'user': {'age': 20, 'name': 'ann'}}) is True
+
+
+def test_equal_conditions_of_different_types_stay_distinct():
+    # 1 == True, but these conditions mustn't share an evaluator
+    rules = [BoolRule(s) for s in ('x is 1', 'x is true', 'x is 1.0')]
+    assert [rule.test({'x': True}) for rule in rules] == [False, True, False]
+
+
+def test_rules_share_equal_sub_trees():
+    first = BoolRule('a = 1 or (user.age >= 18 and user.country in ("GB"))')
+    second = BoolRule('b = 2 or (user.age >= 18 and user.country in ("GB"))')
+
+    assert first.ast.operands[1] is second.ast.operands[1]
+    assert first.test({'a': 0, 'user': {'age': 20, 'country': 'GB'}})
+
+
+def test_string_literals_are_not_interned():
+    # Interning would make ``is`` depend on whether the context's string
+    # happened to be interned too
+    value = ''.join(['a', 'b'])
+    for parser in ('native', 'pyparsing'):
+        assert BoolRule('x is "ab"', parser=parser).test({'x': value}) is False
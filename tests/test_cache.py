@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from boolrule import BoolRule, RuleCache, rule_cache
+
+
+@pytest.fixture
+def shared_cache():
+    maxsize = rule_cache.maxsize
+    rule_cache.clear()
+    yield rule_cache
+    rule_cache.resize(maxsize)
+    rule_cache.clear()
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RuleCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+    assert cache.stats.evictions == 1
+
+
+def test_stats_count_hits_and_misses():
+    cache = RuleCache(maxsize=10)
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('a')
+    cache.get('b')
+
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.size, stats.maxsize) == (
+        2, 1, 1, 10
+    )
+
+
+def test_resize_evicts_down_to_new_size():
+    cache = RuleCache(maxsize=None)
+    for i in range(10):
+        cache.put(i, i)
+    cache.resize(3)
+
+    assert len(cache) == 3
+    assert all(i in cache for i in (7, 8, 9))
+    assert cache.stats.evictions == 7
+
+
+def test_clear_removes_entries_and_resets_stats():
+    cache = RuleCache()
+    cache.put('a', 1)
+    cache.get('a')
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.stats == (0, 0, 0, 0, cache.maxsize)
+
+
+def test_zero_maxsize_disables_cache():
+    cache = RuleCache(maxsize=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+
+
+def test_negative_maxsize_is_rejected():
+    with pytest.raises(ValueError):
+        RuleCache(maxsize=-1)
+
+
+def test_rules_share_compiled_query(shared_cache):
+    first = BoolRule('x = 1 and y in (1, 2, 3)')
+    second = BoolRule('x = 1 and y in (1, 2, 3)')
+
+    assert first._ast is second._ast
+    assert shared_cache.stats.hits == 1
+    assert shared_cache.stats.misses == 1
+    assert second.test({'x': 1, 'y': 3})
+
+
+def test_lazy_rules_use_cache_on_first_test(shared_cache):
+    rule = BoolRule('x = 1', lazy=True)
+    assert shared_cache.stats.misses == 0
+    assert rule.test({'x': 1})
+    assert ('native', 'x = 1') in shared_cache
+
+
+def test_concurrent_access_keeps_cache_bounded():
+    cache = RuleCache(maxsize=50)
+
+    def worker(offset):
+        for i in range(1000):
+            key = (offset + i) % 200
+            if cache.get(key) is None:
+                cache.put(key, key)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats
+    assert stats.size == 50
+    assert stats.hits + stats.misses == 8000
+
+
+def test_parsers_do_not_share_compiled_queries(shared_cache):
+    native = BoolRule('x = 1')
+    grammar = BoolRule('x = 1', parser='pyparsing')
+
+    assert shared_cache.stats.misses == 2
+    assert ('native', 'x = 1') in shared_cache
+    assert ('pyparsing', 'x = 1') in shared_cache
+    assert native.test({'x': 1}) and grammar.test({'x': 1})
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+
+from boolrule.cli import main
+
+RECORDS = [
+    {'user': {'age': 20, 'country': 'GB'}},
+    {'user': {'age': 12, 'country': 'FR'}},
+    {'user': {'country': 'GB'}},
+]
+
+
+def stdin(text):
+    return io.TextIOWrapper(io.BytesIO(text.encode('utf-8')))
+
+
+@pytest.fixture
+def jsonl(tmpdir):
+    path = tmpdir.join('events.jsonl')
+    path.write('\n'.join(json.dumps(r) for r in RECORDS) + '\n')
+    return str(path)
+
+
+@pytest.fixture
+def csv_file(tmpdir):
+    path = tmpdir.join('people.csv')
+    path.write('user.age,user.country,vip\n20,GB,true\n12,FR,false\n')
+    return str(path)
+
+
+def test_writes_matching_records(jsonl, capsys):
+    assert main(['-e', 'user.age >= 18', jsonl]) == 0
+
+    out, err = capsys.readouterr()
+    assert [json.loads(line) for line in out.splitlines()] == RECORDS[:1]
+    assert err.splitlines()[0].startswith('3 records in ')
+    assert err.splitlines()[0].endswith(', 1 errors')
+    assert err.splitlines()[1] == '  user.age >= 18: 1 matched'
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_writes_columns_in_rule_order(jsonl, capsys, workers):
+    argv = [
+        '-r', 'gb', 'user.country = "GB"', '-e', 'user.age >= 18',
+        '--output', 'columns', '--workers', str(workers), '--chunk-size', '1',
+        '--no-stats', jsonl,
+    ]
+    assert main(argv) == 0
+
+    out, err = capsys.readouterr()
+    assert out.splitlines() == [
+        '{"gb": true, "user.age >= 18": true}',
+        '{"gb": false, "user.age >= 18": false}',
+        '{"gb": true, "user.age >= 18": null}',
+    ]
+    assert err == ''
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_errors_only_affect_the_rule_that_raised(monkeypatch, capsys,
+                                                 workers):
+    monkeypatch.setattr(sys, 'stdin', stdin(u'{"a": 2}\n'))
+    argv = ['-r', 'two', 'a = 2', '-r', 'b', 'b = 1', '--workers',
+            str(workers)]
+    assert main(argv + ['--output', 'columns']) == 0
+    out, err = capsys.readouterr()
+    assert out == '{"two": true, "b": null}\n'
+    assert '1 errors' in err and 'two: 1 matched' in err
+
+    monkeypatch.setattr(sys, 'stdin', stdin(u'{"a": 2}\n'))
+    assert main(argv + ['--no-stats']) == 0
+    assert capsys.readouterr()[0] == '{"a": 2}\n'
+
+
+def test_csv_columns_are_nested_and_typed(csv_file, capsys):
+    argv = ['-r', 'adult', 'user.age >= 18 and vip = true', '--no-stats']
+    assert main(argv + [csv_file]) == 0
+    assert capsys.readouterr()[0].splitlines() == [
+        'user.age,user.country,vip',
+        '20,GB,true',
+    ]
+
+    assert main(argv + ['--output', 'columns', csv_file]) == 0
+    assert capsys.readouterr()[0].splitlines() == ['adult', 'true', 'false']
+
+    assert main(argv + ['--no-infer-types', csv_file]) == 0
+    assert capsys.readouterr()[0] == 'user.age,user.country,vip\n'
+
+
+def test_only_plain_numbers_are_inferred(tmpdir, capsys):
+    path = tmpdir.join('codes.csv')
+    path.write('a,b,c,d,e\ninf,nan,1_000, 42 ,-1.5e3\n')
+    argv = [
+        '-e', 'a = "inf" and b = "nan" and c = "1_000" and d = " 42 "',
+        '-e', 'e = -1500.0', '--output', 'columns', '--no-stats', str(path),
+    ]
+    assert main(argv) == 0
+    assert capsys.readouterr()[0].splitlines()[1] == 'true,true'
+
+
+def test_csv_without_rows_still_has_a_header(monkeypatch, capsys):
+    argv = ['-e', 'a = 1', '--format', 'csv', '--no-stats']
+    monkeypatch.setattr(sys, 'stdin', stdin(u'a,b\n'))
+    assert main(argv) == 0
+    assert capsys.readouterr()[0] == 'a,b\n'
+
+    monkeypatch.setattr(sys, 'stdin', stdin(u'a,b\n'))
+    assert main(argv + ['--output', 'columns']) == 0
+    assert capsys.readouterr()[0] == 'a = 1\n'
+
+
+def test_csv_from_stdin_keeps_quoted_newlines(monkeypatch, capsys, tmpdir):
+    text = u'a,b\r\n1,"x\r\ny"\r\n2,z\r\n'
+    path = tmpdir.join('quoted.csv')
+    path.write_binary(text.encode('utf-8'))
+    argv = ['-e', 'a = 1', '--no-stats']
+    assert main(argv + [str(path)]) == 0
+    from_file = capsys.readouterr()[0]
+
+    monkeypatch.setattr(sys, 'stdin', stdin(text))
+    assert main(argv + ['--format', 'csv']) == 0
+    assert capsys.readouterr()[0] == from_file == 'a,b\n1,"x\r\ny"\n'
+
+
+def test_reads_stdin(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'stdin', stdin(u'{"a": 1}\n{"a": 2}\n'))
+    assert main(['-e', 'a = 2', '--no-stats']) == 0
+    assert capsys.readouterr()[0] == '{"a": 2}\n'
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_reports_bad_input(tmpdir, capsys, workers):
+    path = tmpdir.join('bad.jsonl')
+    path.write('{"a": 1}\n{"a": 2}\n{"a": 1}\n{bad\n{"a": 1}\n')
+    argv = ['-e', 'a = 1', '--workers', str(workers), '--chunk-size', '2']
+    assert main(argv + [str(path)]) == 1
+    out, err = capsys.readouterr()
+    assert out == '{"a": 1}\n{"a": 1}\n'
+    assert err.startswith('boolrule: invalid JSON on line 4')
+
+
+def test_rejects_invalid_rules(capsys):
+    with pytest.raises(SystemExit) as e:
+        main(['-e', 'a ='])
+    assert e.value.code == 2
+    assert "invalid rule 'a ='" in capsys.readouterr()[1]
+
+
+def test_runs_as_a_module(jsonl):
+    output = subprocess.check_output(
+        [sys.executable, '-m', 'boolrule', '-e', 'user.age < 18',
+         '--no-stats', jsonl]
+    )
+    assert json.loads(output.decode('utf-8')) == RECORDS[1]
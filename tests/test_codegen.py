@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pickle
+
+import pytest
+
+from boolrule import BoolRule, PreparedContext
+from boolrule.codegen import generate, source
+
+from .differential import QUERIES, assert_matches_test, outcome
+
+
+class Profile(object):
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_results_and_exceptions_match_closures(query):
+    assert_matches_test(query, BoolRule(query, codegen=True).test, count=1000)
+
+
+@pytest.mark.parametrize('context', [
+    None,
+    {},
+    Profile(a=Profile(b=3)),
+    {'a': Profile(b=3)},
+    {'a': {'b': Profile()}},
+    PreparedContext({'a': {'b': 3}}),
+])
+def test_other_contexts_are_handed_to_closures(context):
+    query = 'a.b = 3 and a.b > 1'
+    assert (
+        outcome(BoolRule(query, codegen=True).test, context) ==
+        outcome(BoolRule(query).test, context)
+    )
+
+
+def test_literals_and_paths_are_not_written_into_the_source():
+    query = (
+        'a = "\'); import os; os.system(\'x\') #" or '
+        'b.c = "\\" + 1"'
+    )
+    rule = BoolRule(query, codegen=True)
+    text = source(rule)
+
+    assert 'import' not in text
+    assert 'os' not in text
+    assert rule.test({'a': '\'); import os; os.system(\'x\') #'}) is True
+    assert rule.test({'a': 1, 'b': {'c': '\\" + 1'}}) is True
+
+
+def test_generated_functions_are_shared_and_expose_their_source():
+    first = BoolRule('a = 1 and b = 2', codegen=True)
+    second = BoolRule('a = 1 and b = 2', codegen=True)
+
+    assert first._evaluate is second._evaluate
+    assert generate(first.ast) is first._evaluate
+    assert first._evaluate.source == source(first)
+    assert 'def evaluate(context):' in source(first)
+
+
+def test_codegen_survives_pickling():
+    rule = pickle.loads(pickle.dumps(BoolRule('a = 1', codegen=True)))
+    assert 'def evaluate' in getattr(rule._evaluate, 'source', '')
+    assert rule.test({'a': 1}) is True
+
+
+def test_codegen_cannot_be_combined_with_adaptive():
+    with pytest.raises(ValueError):
+        BoolRule('a = 1', adaptive=True, codegen=True)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from boolrule import (
+    BoolRule,
+    MissingVariableException,
+    PreparedContext,
+    RuleIndex,
+    RuleSet,
+)
+
+
+class Counting(dict):
+    """A context that counts how often each top-level key is looked up."""
+
+    def __init__(self, *args, **kwargs):
+        super(Counting, self).__init__(*args, **kwargs)
+        self.reads = {}
+
+    def __getitem__(self, key):
+        self.reads[key] = self.reads.get(key, 0) + 1
+        return super(Counting, self).__getitem__(key)
+
+
+def test_paths_are_resolved_once_across_rules():
+    context = Counting(user={'age': 30, 'country': 'GB'})
+    prepared = PreparedContext(context)
+
+    rules = [
+        BoolRule('user.age > 18'),
+        BoolRule('user.age < 65 and user.country = "GB"'),
+        BoolRule('user.country in ("GB", "FR")'),
+    ]
+    assert all(rule.test(prepared) for rule in rules)
+    assert context.reads == {'user': 2}
+
+
+def test_update_invalidates_affected_paths():
+    prepared = PreparedContext({'user': {'age': 30}, 'x': 1})
+    adult = BoolRule('user.age >= 18 and x = 1')
+    assert adult.test(prepared) is True
+
+    prepared.update(user={'age': 12})
+    assert adult.test(prepared) is False
+    assert prepared.context['user'] == {'age': 12}
+
+
+def test_missing_paths_keep_raising():
+    prepared = PreparedContext({'x': 1})
+    rule = BoolRule('y = 1')
+    for _ in range(2):
+        with pytest.raises(MissingVariableException):
+            rule.test(prepared)
+
+    prepared.update(y=1)
+    assert rule.test(prepared) is True
+
+
+@pytest.mark.parametrize('context', [None, {}])
+def test_empty_context_raises(context):
+    with pytest.raises(MissingVariableException):
+        BoolRule('x = 1').test(PreparedContext(context))
+
+
+def test_multi_rule_apis_accept_prepared_contexts():
+    rules = {'a': 'x = 1', 'b': 'x = 2 and y > 0', 'c': 'y > 0'}
+    prepared = PreparedContext({'x': 2, 'y': 5})
+    assert RuleSet(rules).match(prepared) == {'b', 'c'}
+    assert RuleIndex(rules).match(prepared) == {'b', 'c'}
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+from boolrule import (
+    IncrementalEvaluator,
+    MissingVariableException,
+    RuleSet,
+)
+
+RULES = {
+    'adult': 'user.age >= 18',
+    'big cart': 'cart.total > 100 and cart.currency = "GBP"',
+    'vip or big': 'user.vip = true or (cart.total > 200 and user.age >= 18)',
+    'uk': 'user.country in ("GB", "IE")',
+    'cart set': 'cart isnot none',
+}
+
+
+def _context():
+    return {
+        'user': {'age': 20, 'vip': False, 'country': 'GB'},
+        'cart': {'total': 50, 'currency': 'GBP'},
+    }
+
+
+def test_updates_match_full_evaluation():
+    evaluator = IncrementalEvaluator(RULES)
+    ruleset = RuleSet(RULES)
+    context = _context()
+    matched = evaluator.evaluate(context)
+    assert matched == ruleset.match(context)
+
+    rand = random.Random(0)
+    changes = [
+        ('cart.total', lambda: rand.randrange(300)),
+        ('user.age', lambda: rand.randrange(10, 30)),
+        ('user.vip', lambda: rand.random() < 0.2),
+        ('user.country', lambda: rand.choice(['GB', 'FR', 'IE'])),
+        ('cart.currency', lambda: rand.choice(['GBP', 'EUR'])),
+    ]
+    for _ in range(500):
+        path, value = rand.choice(changes)
+        parent, key = path.split('.')
+        context[parent][key] = value()
+
+        result = evaluator.update(context, [path])
+        expected = ruleset.match(context)
+        assert evaluator.matched == expected
+        assert result.passed == expected - matched
+        assert result.failed == matched - expected
+        matched = expected
+
+
+def test_only_dependent_rules_are_reevaluated():
+    evaluator = IncrementalEvaluator(RULES)
+    context = _context()
+    evaluator.evaluate(context)
+
+    context['cart'] = {'total': 500, 'currency': 'GBP'}
+    result = evaluator.update(context, ['cart'])
+    assert result.passed == set(['big cart', 'vip or big'])
+    assert result.failed == set()
+
+    context['user']['age'] = 12
+    result = evaluator.update(context, ['user.age'])
+    assert result.failed == set(['adult', 'vip or big'])
+
+    # Unreported changes aren't seen
+    context['user']['country'] = 'FR'
+    assert evaluator.update(context, ['cart.total']) == (set(), set())
+    assert 'uk' in evaluator.matched
+
+
+def test_missing_values_raise_and_recover():
+    evaluator = IncrementalEvaluator(RULES)
+    context = _context()
+    evaluator.evaluate(context)
+
+    del context['user']['age']
+    with pytest.raises(MissingVariableException):
+        evaluator.update(context, ['user.age'])
+
+    context['user']['age'] = 30
+    context['cart']['total'] = 150
+    result = evaluator.update(context, ['user.age'])
+    assert result.passed == set(['big cart'])
+    assert evaluator.matched == RuleSet(RULES).match(context)
+
+
+def test_errors_can_be_collected_per_rule():
+    rules = dict(RULES, promo='user.promo = "X" and cart.total > 10')
+    evaluator = IncrementalEvaluator(rules)
+    context = _context()
+    errors = {}
+    assert evaluator.evaluate(context, errors) == RuleSet(RULES).match(context)
+    assert list(errors) == ['promo']
+
+    # Other rules still report flips while one keeps raising
+    context['cart']['total'] = 150
+    errors = {}
+    result = evaluator.update(context, ['cart.total'], errors)
+    assert result == (set(['big cart']), set())
+    assert isinstance(errors['promo'], MissingVariableException)
+
+    # The path that was missing has no result to invalidate, but the rule
+    # that raised is retried anyway
+    context['user']['promo'] = 'X'
+    errors = {}
+    result = evaluator.update(context, ['user.promo'], errors)
+    assert result == (set(['promo']), set())
+    assert errors == {}
+
+    del context['user']['promo']
+    result = evaluator.update(context, ['user.promo'], errors)
+    assert result == (set(), set(['promo']))
+    assert list(errors) == ['promo']
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from boolrule import BoolRule, MissingVariableException, RuleIndex
+
+
+RULES = {
+    't1': 'tenant.id = 1 and user.age > 18',
+    't2': 'tenant.id == 2',
+    't1_or_3': 'tenant.id in (1, 3) and user.vip = true',
+    'reversed': '3 eq tenant.id',
+    'gb': 'tenant.id ∈ (1, 2, 3) and user.country = "GB"',
+    'unindexed': 'user.age > 60 or tenant.id = 1',
+    'late': 'user.age > 1 and tenant.id = 2',
+    'all': '*',
+}
+
+CONTEXTS = [
+    {'tenant': {'id': 1}, 'user': {'age': 30, 'vip': True, 'country': 'GB'}},
+    {'tenant': {'id': 2}, 'user': {'age': 10, 'vip': False, 'country': 'FR'}},
+    {'tenant': {'id': 3}, 'user': {'age': 70, 'vip': True, 'country': 'GB'}},
+    {'tenant': {'id': 4}, 'user': {'age': 70, 'vip': True, 'country': 'GB'}},
+]
+
+
+@pytest.mark.parametrize('context', CONTEXTS)
+def test_match_agrees_with_testing_each_rule(context):
+    index = RuleIndex(RULES)
+    expected = set(
+        rule_id for rule_id, query in RULES.items()
+        if BoolRule(query).test(context)
+    )
+    assert index.match(context) == expected
+
+
+def test_stats_report_pruning():
+    index = RuleIndex(RULES)
+    assert index.stats.indexed == 5
+
+    index.match(CONTEXTS[3])
+    stats = index.stats
+    assert (stats.matches, stats.evaluated) == (1, 5)
+    assert stats.pruned == len(RULES) - 5
+
+
+def test_missing_indexed_path_still_raises():
+    index = RuleIndex({'a': 'tenant.id = 1 and x = 1'})
+    with pytest.raises(MissingVariableException):
+        index.match({'user': {}})
+
+
+def test_missing_guard_path_still_raises():
+    # x = 1 is the more selective condition but y is evaluated first
+    index = RuleIndex({'a': 'y in (1, 2, 3) and x = 1'})
+    assert index.match({'x': 2, 'y': 1}) == set()
+    with pytest.raises(MissingVariableException):
+        index.match({'x': 2})
+
+
+def test_unhashable_values_fall_back_to_evaluation():
+    index = RuleIndex({'a': 'x = 1', 'b': 'x in (1, 2)'})
+    assert index.match({'x': [1]}) == set()
+    assert index.stats.evaluated == 2
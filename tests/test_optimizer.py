@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from boolrule import BoolRule, MissingVariableException
+from boolrule.compiler import compile_node
+from boolrule.optimizer import optimize
+from boolrule.parser import parse
+
+
+@pytest.mark.parametrize('query,optimized', [
+    ('1 = 1 or x > 3', 'true'),
+    ('true == true and x > 3', 'x > 3'),
+    ('x > 3 and 1 = 2 and y = 1', 'x > 3 and false'),
+    ('x > 3 or (1 = 2 or y = 1)', 'x > 3 or y == 1'),
+    ('(x = 1 and (y = 2 and z = 3)) and w = 4',
+     'x == 1 and y == 2 and z == 3 and w == 4'),
+    ('x = 1 and (y = 2 or z = 3)', 'x == 1 and (y == 2 or z == 3)'),
+    ('1 in (1, 2) and (3) ⊆ (1, 2, 3)', 'true'),
+    ('1 = 1 and 2 = 2', 'true'),
+    ('1 = 2 or 2 = 3', 'false'),
+    ('x = (1, 2)', 'x == (1, 2)'),
+])
+def test_optimized_form(query, optimized):
+    assert str(BoolRule(query).ast) == optimized
+
+
+def test_folds_that_raise_are_left_alone():
+    rule = BoolRule('1 < "a" or x = 1')
+    assert str(rule.ast) == '1 < "a" or x == 1'
+    with pytest.raises(TypeError):
+        rule.test({'x': 1})
+
+
+def test_evaluated_operands_before_a_constant_still_raise():
+    rule = BoolRule('x = 1 and 1 = 2')
+    with pytest.raises(MissingVariableException):
+        rule.test({})
+
+
+@pytest.mark.parametrize('query,result', [
+    ('*', True),
+    ('1 = 1 or x > 3', True),
+    ('false = true and x > 3', False),
+    ('x > 3', None),
+    ('x > 3 and 1 = 2', None),
+])
+def test_static_result(query, result):
+    assert BoolRule(query).static_result is result
+
+
+@pytest.mark.parametrize('query', [
+    '1 = 1 or x > 3',
+    'x > 3 and (y = 1 and 2 = 2)',
+    '(x > 3 or 1 = 2) and (y = 1 or (z = 2 or 1 = 2))',
+    'x > 3 and 1 = 1',
+])
+def test_optimized_rules_agree_with_the_parsed_tree(query):
+    unoptimized = compile_node(parse(query))
+    rule = BoolRule(query)
+    for context in [
+        {'x': 4, 'y': 1, 'z': 2},
+        {'x': 2, 'y': 1, 'z': 3},
+        {'x': 5, 'y': 0, 'z': 0},
+    ]:
+        assert bool(rule.test(context)) is bool(unoptimized(context))
+
+
+def test_optimize_is_idempotent():
+    tree = optimize(parse('(x = 1 and 1 = 1) or (y = 2 and (z = 3))'))
+    assert optimize(tree) == tree
+
+
+TENANT = {
+    'tenant': {'plan': 'pro', 'min_age': 18, 'countries': ['GB', 'FR']},
+    'region': 'eu',
+}
+
+
+@pytest.mark.parametrize('query,specialized', [
+    ('tenant.plan = "pro" and user.age >= tenant.min_age',
+     'user.age >= 18'),
+    ('tenant.plan = "free" and user.age >= tenant.min_age', 'false'),
+    ('region = "eu" or user.vip = true', 'true'),
+    ('user.country in tenant.countries', 'user.country in ("GB", "FR")'),
+    ('user.age > 3 or region = "eu"', 'user.age > 3 or true'),
+    ('tenant = none or tenant.missing = 1',
+     'tenant == none or tenant.missing == 1'),
+])
+def test_specialized_form(query, specialized):
+    assert str(BoolRule(query).specialize(TENANT).ast) == specialized
+
+
+@pytest.mark.parametrize('query', [
+    'tenant.plan = "pro" and user.age >= tenant.min_age',
+    'user.country in tenant.countries or (region = "us" and user.vip = true)',
+    'user.age > tenant.min_age and region = "eu" and user.vip = true',
+    'user.vip = true or (tenant.plan = "free" and user.age < tenant.min_age)',
+    'region < 1 or user.vip = true',
+])
+def test_specialized_rules_agree_with_the_original(query):
+    rule = BoolRule(query)
+    specialized = rule.specialize(TENANT)
+    for user in [
+        {'age': 20, 'country': 'GB', 'vip': False},
+        {'age': 12, 'country': 'US', 'vip': True},
+        {'age': 18},
+        {},
+    ]:
+        context = dict(TENANT, user=user)
+        outcomes = []
+        for test in (rule.test, specialized.test):
+            try:
+                outcomes.append(bool(test(context)))
+            except (MissingVariableException, TypeError) as e:
+                outcomes.append((type(e), str(e)))
+        assert outcomes[0] == outcomes[1]
+
+
+def test_specialized_rules_keep_their_options():
+    rule = BoolRule('region = "eu" and user.age >= 18', codegen=True)
+    specialized = rule.specialize({'region': 'eu'})
+    assert specialized._codegen
+    assert specialized.test({'user': {'age': 20}}) is True
+    assert specialized.specialize({'user': {'age': 20}}).static_result is True
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import itertools
+
+import pytest
+
+from boolrule import (
+    BoolRule,
+    MissingVariableException,
+    bulk_match,
+    compile_many,
+    rule_cache,
+)
+
+
+RULES = {
+    'adult': 'user.age >= 18',
+    'gb': BoolRule('user.country = "GB"'),
+    'vip': 'user.vip = true and user.age > 30',
+}
+
+
+def contexts(n):
+    for i in range(n):
+        yield {'user': {
+            'age': i % 60,
+            'country': 'GB' if i % 3 else 'FR',
+            'vip': i % 2 == 0,
+        }}
+
+
+def test_results_are_in_input_order():
+    results = list(bulk_match(RULES, contexts(250), workers=2, chunk_size=7))
+
+    compiled = dict(
+        (rule_id, BoolRule(rule) if isinstance(rule, str) else rule)
+        for rule_id, rule in RULES.items()
+    )
+    assert len(results) == 250
+    for context, result in zip(contexts(250), results):
+        expected = set(
+            rule_id for rule_id, rule in compiled.items()
+            if rule.test(context)
+        )
+        assert result.matched == expected
+        assert result.error is None and result.errors == {}
+
+
+def test_errors_are_reported_per_record():
+    records = [
+        {'user': {'age': 40, 'country': 'GB', 'vip': True}},
+        {'user': {'age': 40}},
+        {'user': {'age': 10, 'country': 'FR', 'vip': False}},
+    ]
+    results = list(bulk_match(RULES, records, workers=1, chunk_size=2))
+
+    assert results[0].matched == {'adult', 'gb', 'vip'}
+    assert results[1].matched == {'adult'}
+    assert isinstance(results[1].error, MissingVariableException)
+    assert sorted(results[1].errors) == ['gb', 'vip']
+    assert results[1].error is results[1].errors['gb']
+    assert results[2].matched == set()
+    assert results[2].error is None and results[2].errors == {}
+
+
+def test_contexts_are_consumed_lazily():
+    infinite = itertools.cycle(contexts(10))
+    results = bulk_match(RULES, infinite, workers=2, chunk_size=5,
+                         max_pending=2)
+    assert len(list(itertools.islice(results, 23))) == 23
+    results.close()
+
+
+def test_invalid_chunk_size():
+    with pytest.raises(ValueError):
+        list(bulk_match(RULES, contexts(1), chunk_size=0))
+
+
+QUERIES = [
+    'user.age >= 18',
+    'user.age >=',
+    'user.country = "GB"',
+    'user.age >= 18',
+    'a = 1 and\n(b = 2',
+    'user.age >= 18',
+]
+
+
+@pytest.mark.parametrize('workers, chunk_size', [(0, 500), (2, 1)])
+def test_compile_many_collects_rules_and_errors(workers, chunk_size):
+    result = compile_many(QUERIES, workers=workers, chunk_size=chunk_size)
+
+    rules = result.rules
+    assert [rule is None for rule in rules] == [
+        False, True, False, False, True, False
+    ]
+    assert rules[0] is rules[3] is rules[5]
+    assert rules[2].test({'user': {'country': 'GB'}}) is True
+
+    first, second = result.errors
+    assert (first.index, first.query, first.error) == (
+        1, 'user.age >=', 'ParseError'
+    )
+    assert first.loc == 11
+    assert (second.index, second.lineno, second.col) == (4, 2, 7)
+
+    stats = result.stats
+    assert (stats.queries, stats.unique, stats.failed) == (6, 4, 2)
+    assert stats.workers == workers
+    assert stats.per_second > 0
+
+
+def test_compile_many_matches_boolrule():
+    result = compile_many(['a in (1, 2) or b.c != "x"'] * 3, workers=0)
+    rule = result.rules[0]
+    assert rule.ast == BoolRule('a in (1, 2) or b.c != "x"').ast
+    assert rule.test({'a': 3, 'b': {'c': 'y'}}) is True
+
+
+def test_compile_many_caches_worker_rules_per_parser():
+    query = 'user.age > 40 and user.vip = false'
+    rule_cache.clear()
+    compile_many([query, 'x = 1'], workers=2, chunk_size=1,
+                 parser='pyparsing')
+
+    assert ('pyparsing', query) in rule_cache
+    assert ('native', query) not in rule_cache
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+from boolrule import BoolRule, ParseError
+from boolrule.grammar import parse as parse_pyparsing
+from boolrule.parser import parse
+
+
+CORPUS = [
+    '5 > 3',
+    'foo = "bar" AND baz > 10',
+    'foo = "bar" AND ("a" = "b" OR baz > 10)',
+    '(1=1 or 2=2) and (3 = 3)',
+    '1 = 2 and 1 = 1 or 1 = 1',
+    '((a = 1))',
+    'x in (5, 6, 7, y)',
+    '(1, 2, 3) ⊆ (1, 2, 3, 4)',
+    '(4) ∩ (3, 4, 5)',
+    '(3, 4) not∩ (3, 4, 5)',
+    '(3, 4) NOT∩ (3, 4, 5)',
+    'x ∈ (5, 6) and y ∉ (1) and z ≠ 1 and w ≤ 2 and v ≥ 3',
+    'a eq 1 and b NE 2 and c lt 3 and d le 4 and e gt 5 and f ge 6',
+    'x IsNot none and y is NONE',
+    'x isnoty',
+    'x notin (1, 2)',
+    'x == true and y == FALSE and z == True',
+    'x = 1.5 and y = .5 and z = 5. and w = 1.5e3 and v = 5.e-3',
+    'x = -1 and y = +2 and z = -.5',
+    'x = "it\'s" and y = \'say "hi"\'',
+    'x = "a""b" and y = \'c\'\'d\'',
+    'x = "a\\"b"',
+    'x = ""',
+    'x = "tab\there"',
+    'and = 1 and or = 2 and in = in',
+    'eq eq eq',
+    'foo.bar.baz_1 = qux.quux',
+    '(x) = 1',
+    '(x, y) ⊆ z',
+    'x=1\tand\ny=2',
+    '(a=1)AND(b=2)',
+    'x = "a"and y = 1',
+    # invalid
+    '',
+    '5 > 4)',
+    '(5 > 4',
+    '1=1 and 2 in (1, 3 = 3)',
+    'x = truex',
+    'x = nonex',
+    'x=1 andy=2',
+    'x = 5and y = 3',
+    'x = - 5',
+    'x = foo.',
+    'x = 1E5',
+    'x = 1e+5',
+    'x in ()',
+    'x = "unterminated',
+    'x = "a"" = y',
+    'x >',
+    'x and y',
+    '_x = 1',
+    'x = 1 and',
+    'x ! y',
+]
+
+PIECES = [
+    'x', 'foo.bar', 'and', 'or', 'AND', '(', ')', ',', '=', '==', '!=', '<',
+    '>=', 'eq', 'NE', 'in', 'notin', 'is', 'isnot', '≠', '∈', '⊆', '∩',
+    'not∩', '1', '-2', '1.5', '.5', '5.', '1.5E-3', '1E5', 'true', 'FALSE',
+    'none', '"a"', "'b'", '"a""b"', '"', 'truex', 'x.', '\t', 'andy', '5and',
+]
+
+
+def _random_queries(count, seed=1234):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(
+            rng.choice(PIECES) + rng.choice(['', ' '])
+            for _ in range(rng.randint(1, 9))
+        )
+
+
+def _outcome(parse_fn, query):
+    try:
+        return parse_fn(query)
+    except ParseError:
+        return ParseError
+
+
+def _assert_parsers_agree(query):
+    native = _outcome(parse, query)
+    reference = _outcome(parse_pyparsing, query)
+    assert native == reference, query
+    assert repr(native) == repr(reference), query
+
+
+@pytest.mark.parametrize('query', CORPUS)
+def test_parsers_agree(query):
+    _assert_parsers_agree(query)
+
+
+def test_parsers_agree_on_random_queries():
+    for query in _random_queries(2000):
+        _assert_parsers_agree(query)
+
+
+@pytest.mark.parametrize('query,loc,lineno,col', [
+    ('5 > 4)', 5, 1, 6),
+    ('x = 1 and\ny >', 13, 2, 4),
+])
+def test_parse_error_position(query, loc, lineno, col):
+    with pytest.raises(ParseError) as e:
+        parse(query)
+    assert (e.value.loc, e.value.lineno, e.value.col) == (loc, lineno, col)
+    assert e.value.query == query
+
+
+@pytest.mark.parametrize('parser', ['native', 'pyparsing'])
+def test_rule_parser_option(parser):
+    rule = BoolRule('x in (1, 2) and y.z = TRUE', parser=parser)
+    assert rule.test({'x': 2, 'y': {'z': True}})
+
+
+@pytest.mark.parametrize('parser', ['native', 'pyparsing'])
+def test_rule_parse_errors(parser):
+    with pytest.raises(ParseError):
+        BoolRule('5 > 4)', parser=parser)
+
+
+@pytest.mark.parametrize('parser', ['native', 'pyparsing'])
+def test_invalid_integers_raise_parse_errors(parser):
+    with pytest.raises(ParseError) as e:
+        BoolRule('x in (2, 1E5)', parser=parser)
+    assert e.value.loc == 9
+    assert isinstance(e.value, ValueError)
+
+
+def test_unknown_parser_rejected():
+    with pytest.raises(ValueError):
+        BoolRule('5 > 4', parser='regex')
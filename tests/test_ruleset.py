@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from boolrule import BoolRule, MissingVariableException, RuleSet
+
+
+RULES = {
+    'gb': 'user.country = "GB"',
+    'gb_adult': 'user.country = "GB" and user.age >= 18',
+    'gb_or_fr': 'user.country in ("GB", "FR")',
+    'big_cart': 'user.country = "GB" and (cart.total > 100 or user.vip = 1)',
+    'never': '1 = 2 and user.missing = 1',
+    'all': '*',
+}
+
+CONTEXTS = [
+    {'user': {'country': 'GB', 'age': 30, 'vip': 0}, 'cart': {'total': 150}},
+    {'user': {'country': 'GB', 'age': 12, 'vip': 1}, 'cart': {'total': 5}},
+    {'user': {'country': 'FR', 'age': 40, 'vip': 1}, 'cart': {'total': 5}},
+]
+
+
+@pytest.mark.parametrize('context', CONTEXTS)
+def test_match_agrees_with_testing_each_rule(context):
+    ruleset = RuleSet(RULES)
+    expected = set(
+        rule_id for rule_id, query in RULES.items()
+        if BoolRule(query).test(context)
+    )
+    assert ruleset.match(context) == expected
+
+
+def test_shared_conditions_and_paths_are_deduplicated():
+    ruleset = RuleSet(RULES)
+    # user.country = "GB" appears in three rules but is one predicate, and
+    # the 'never' rule folds away entirely
+    assert ruleset.predicate_count == 5
+    assert ruleset.path_count == 4
+    assert len(ruleset) == len(RULES)
+
+
+def test_shared_condition_is_evaluated_once():
+    calls = []
+
+    class User(object):
+        def __getitem__(self, key):
+            calls.append(key)
+            return 'GB'
+
+    ruleset = RuleSet([
+        (1, 'user.country = "GB"'),
+        (2, 'user.country = "GB" and 1 = 1'),
+        (3, 'user.country != "FR"'),
+    ])
+    assert ruleset.match({'user': User()}) == {1, 2, 3}
+    assert len(calls) == 1
+
+
+def test_accepts_compiled_rules():
+    ruleset = RuleSet([('a', BoolRule('x > 1')), ('b', BoolRule('x > 5'))])
+    assert ruleset.match({'x': 3}) == {'a'}
+
+
+def test_missing_variable_raises():
+    ruleset = RuleSet({'a': 'x = 1', 'b': 'y = 1'})
+    with pytest.raises(MissingVariableException):
+        ruleset.match({'x': 1})
+
+
+def test_errors_can_be_collected_per_rule():
+    ruleset = RuleSet({
+        'a': 'x = 1', 'b': 'y = 1 and x = 1', 'c': 'x = 1 and y = 1',
+        'd': 'x = 1 or y = 1',
+    })
+    errors = {}
+    assert ruleset.match({'x': 1}, errors=errors) == {'a', 'd'}
+    assert sorted(errors) == ['b', 'c']
+    assert all(isinstance(e, MissingVariableException)
+               for e in errors.values())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import pickle
+
+import pytest
+
+import boolrule.boolrule
+from boolrule import BoolRule
+from boolrule.serialize import FORMAT_VERSION, dumps, loads
+
+
+QUERIES = [
+    '*',
+    'user.age >= 18 and user.country in ("GB", "FR")',
+    'a = 1 or (b != "x" and c is none)',
+    'x ⊆ (1, 2.5, true) or (y, 2) not∩ z',
+    'name = "it\'s \\"quoted\\"" and n > -1.5e3',
+    'u ∉ ("ä", "ü")',
+    '1 = 1 or x > 3',
+]
+
+CONTEXT = {
+    'user': {'age': 30, 'country': 'GB'}, 'a': 2, 'b': 'y', 'c': None,
+    'x': [1], 'y': 3, 'z': [4], 'name': 'it\'s "quoted"', 'n': 0, 'u': 'ß',
+}
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_round_trip(query):
+    rule = BoolRule(query)
+    loaded = loads(dumps(rule))
+    assert loaded.ast == rule.ast
+    assert loaded.test(CONTEXT) == rule.test(CONTEXT)
+
+
+def test_format_is_compact_json():
+    data = dumps(BoolRule('user.age >= 18 and user.country in ("GB", "FR")'))
+    assert json.loads(data) == [FORMAT_VERSION, [
+        'and',
+        ['>=', {'$': 'user.age'}, 18],
+        ['in', {'$': 'user.country'}, ['GB', 'FR']],
+    ]]
+    assert ' ' not in data
+
+
+def test_loading_does_not_parse(monkeypatch):
+    data = dumps(BoolRule('x > 1'))
+    pickled = pickle.dumps(BoolRule('y > 1'))
+    monkeypatch.setattr(boolrule.boolrule, 'PARSERS', {})
+
+    assert loads(data).test({'x': 2}) is True
+    assert pickle.loads(pickled).test({'y': 2}) is True
+
+
+@pytest.mark.parametrize('data', [
+    'nonsense',
+    '[2, true]',
+    '[1, ["and", ["==", 1, 1]]]',
+    '[1, ["=~", 1, 1]]',
+    '[1, ["==", {"path": "x"}, 1]]',
+    '[1, {"$": "x"}]',
+])
+def test_invalid_data(data):
+    with pytest.raises(ValueError):
+        loads(data)
+
+
+def test_pickle_round_trip():
+    rule = BoolRule('a = 1 or (b != "x" and c is none)')
+    loaded = pickle.loads(pickle.dumps(rule))
+    assert loaded.ast == rule.ast
+    assert loaded.test(CONTEXT) is rule.test(CONTEXT)
+    assert len(pickle.dumps(rule)) < 400
+
+
+def test_pickle_lazy_and_adaptive_rules():
+    lazy = pickle.loads(pickle.dumps(BoolRule('x > 1', lazy=True)))
+    assert not lazy._compiled
+    assert lazy.test({'x': 2}) is True
+
+    adaptive = pickle.loads(pickle.dumps(
+        BoolRule('x > 1 and y = 1', adaptive=True)
+    ))
+    assert adaptive.test({'x': 2, 'y': 1}) is True
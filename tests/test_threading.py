@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import sys
+import threading
+import time
+
+import pytest
+
+from boolrule import BoolRule, rule_cache
+from boolrule.adaptive import AdaptiveEvaluator
+
+QUERIES = [
+    'a = 1 and b in (1, 2, 3)',
+    'a > 1 or (b = 2 and c != 3)',
+    'c notin (1, 2) and (a = 2 or b = 3)',
+    'a = b or c >= 2',
+]
+THREADS = 8
+
+
+@pytest.fixture(autouse=True)
+def contention():
+    # Switch threads as often as possible on builds with a GIL
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    rule_cache.clear()
+    yield
+    sys.setswitchinterval(interval)
+    rule_cache.clear()
+
+
+def _run(threads, target):
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def worker(i):
+        barrier.wait()
+        try:
+            target(i)
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    workers = [
+        threading.Thread(target=worker, args=(i,)) for i in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    assert errors == []
+
+
+def test_lazy_rules_are_compiled_once(monkeypatch):
+    parses = []
+    parse = BoolRule._parse
+
+    def slow_parse(self):
+        parses.append(self._query)
+        time.sleep(0.01)
+        return parse(self)
+
+    monkeypatch.setattr(BoolRule, '_parse', slow_parse)
+    shared = [BoolRule(query, lazy=True) for query in QUERIES]
+    results = []
+
+    def target(i):
+        # Half the threads share rules, half create their own
+        own = [BoolRule(query, lazy=True) for query in QUERIES]
+        for rule in shared if i % 2 else own:
+            results.append(rule.test({'a': 1, 'b': 2, 'c': 3}))
+
+    _run(THREADS, target)
+    assert sorted(parses) == sorted(QUERIES)
+    assert results.count(True) == THREADS * 2
+
+
+def test_concurrent_results_match_serial_results():
+    rand = random.Random(0)
+    contexts = [
+        dict((name, rand.randint(0, 3)) for name in 'abc')
+        for _ in range(300)
+    ]
+    expected = [
+        [BoolRule(query).test(context) for context in contexts]
+        for query in QUERIES
+    ]
+    rule_cache.clear()
+
+    rules = [BoolRule(query, lazy=True) for query in QUERIES]
+    generated = [BoolRule(query, lazy=True, codegen=True) for query in QUERIES]
+    adaptive = [
+        AdaptiveEvaluator(BoolRule(query).ast, sample_every=2, reorder_every=8)
+        for query in QUERIES
+    ]
+
+    def target(i):
+        for evaluators in (rules, generated):
+            for evaluator, results in zip(evaluators, expected):
+                assert [evaluator.test(c) for c in contexts] == results
+        for evaluator, results in zip(adaptive, expected):
+            assert [bool(evaluator(c)) for c in contexts] == results
+
+    _run(THREADS, target)
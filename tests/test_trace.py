@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from boolrule import BoolRule, MissingVariableException, Profiler
+from boolrule.trace import TracingEvaluator
+
+from .differential import QUERIES, assert_matches_test
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_traced_results_and_exceptions_match_untraced(query):
+    assert_matches_test(query, BoolRule(query).trace(Profiler()))
+
+
+def test_explanation_records_values_and_short_circuits():
+    rule = BoolRule('a >= 18 and (b in ("GB", "FR") or c = true) and d = 1')
+    explanation = rule.explain({'a': 20, 'b': 'GB', 'd': 2})
+
+    assert explanation.result is False
+    first, group, last = explanation.children
+    assert (first.lval, first.rval, first.result) == (20, 18, True)
+    assert group.result is True
+    assert group.children[0].decided
+    assert not group.children[1].evaluated
+    assert last.decided and last.result is False
+    lines = str(explanation).splitlines()
+    assert lines[0].startswith('and -> False')
+    assert lines[1].startswith('  a >= 18 -> True')
+    assert lines[1].endswith('(lval=20, rval=18)')
+    assert lines[4] == '    c == true -> skipped'
+    assert lines[5].endswith(', decided')
+
+
+def test_explanation_records_errors_instead_of_raising():
+    explanation = BoolRule('a = 1 or b = 1 or c = 1').explain({'a': 2})
+
+    assert isinstance(explanation.error, MissingVariableException)
+    assert isinstance(explanation.children[1].error, MissingVariableException)
+    assert not explanation.children[2].evaluated
+    assert 'raised MissingVariableException' in str(explanation)
+
+
+def test_profiler_counts_conditions_and_calls_back():
+    seen = []
+    profiler = Profiler(callback=lambda rule, e: seen.append(e.result))
+    test = BoolRule('a = 1 and b = 1').trace(profiler)
+
+    test({'a': 1, 'b': 1})
+    test({'a': 2, 'b': 1})
+    with pytest.raises(MissingVariableException):
+        test({'a': 1})
+
+    assert seen == [True, False, None]
+    assert (profiler.tests, profiler.passed, profiler.errors) == (3, 1, 1)
+    stats = dict((s.condition, s) for s in profiler.stats())
+    assert stats['a == 1'][1:5] == (3, 2, 1, 0)
+    assert stats['b == 1'][1:5] == (2, 1, 0, 1)
+
+    profiler.reset()
+    assert profiler.stats() == [] and profiler.tests == 0
+
+
+def test_tracing_leaves_the_rule_unchanged():
+    rule = BoolRule('a = 1')
+    evaluate = rule._evaluate
+    profiler = Profiler()
+    test = rule.trace(profiler)
+
+    assert isinstance(test, TracingEvaluator)
+    assert rule._evaluate is evaluate
+    assert rule.test({'a': 1}) is True
+    assert profiler.tests == 0
+    assert test({'a': 1}) is True
+    assert profiler.tests == 1
+
+
+def test_literal_operands_are_prepared_outside_the_timings(monkeypatch):
+    from boolrule import compiler
+
+    rule = BoolRule('x in ({})'.format(', '.join(map(str, range(1000)))))
+    searched, factory = compiler._HASHED_OPERATORS['in']
+    calls = []
+
+    def counting(values, fallback):
+        calls.append(values)
+        return factory(values, fallback)
+
+    monkeypatch.setitem(
+        compiler._HASHED_OPERATORS, 'in', (searched, counting)
+    )
+    assert rule.trace(Profiler())({'x': 5}) is True
+    assert rule.explain({'x': 1000}).result is False
+    assert calls == []
+    assert rule.explain({'x': 1}).rval is rule.explain({'x': 2}).rval
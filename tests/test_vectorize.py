@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from boolrule import BoolRule, MissingVariableException
+
+np = pytest.importorskip('numpy')
+
+
+ROWS = [
+    {'user': {'age': 30, 'country': 'GB', 'tags': ['a', 'b']}, 'n': 1.5},
+    {'user': {'age': 12, 'country': 'FR', 'tags': ['b']}, 'n': None},
+    {'user': {'age': 70, 'country': 'DE', 'tags': []}, 'n': 7.0},
+    {'user': {'age': 18, 'country': 'GB', 'tags': ['c']}, 'n': 0.0},
+]
+
+QUERIES = [
+    'user.age > 18',
+    'user.age >= 18 and user.country = "GB"',
+    'user.country in ("GB", "FR")',
+    'user.country notin ("GB", "FR")',
+    'user.age in (12, 70) or user.country == "GB"',
+    'user.age < 20 and (user.country = "GB" or user.age = 12)',
+    'user.tags ⊇ ("b")',
+    'user.tags ∩ ("a", "c")',
+    'n is none or user.age = 70',
+    'user.age = user.age and user.country != "XX"',
+    '(user.age, user.country) = (30, "GB")',
+    '(user.age, 1) in (user.age, 1)',
+    '(user.age, "x") ∩ (user.country, 70)',
+    '1 = 1',
+    '*',
+]
+
+
+def _columns(rows, path):
+    # Lists stay whole as elements of an object array
+    column = np.empty(len(rows), dtype=object)
+    for i, row in enumerate(rows):
+        value = row
+        for part in path.split('.'):
+            value = value[part]
+        column[i] = value
+    if path == 'user.tags':
+        return column
+    return np.array(column.tolist())
+
+
+COLUMNS = dict(
+    (path, _columns(ROWS, path))
+    for path in ('user.age', 'user.country', 'user.tags', 'n')
+)
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_batch_agrees_with_testing_each_row(query):
+    rule = BoolRule(query)
+    expected = [bool(rule.test(row)) for row in ROWS]
+    assert rule.test_batch(COLUMNS).tolist() == expected
+
+
+def test_collections_of_paths_compare_as_python_values():
+    # NumPy scalars in the rows' lists would broadcast when compared
+    rule = BoolRule('(user.age, 1) notin (user.age, 1) and (n, 1) = (7.0, 1)')
+    assert rule.test_batch(COLUMNS).tolist() == [False, False, True, False]
+
+
+def test_nested_mappings():
+    rule = BoolRule('user.age > 18 and user.country = "GB"')
+    data = {'user': {
+        'age': np.array([30, 40, 10]),
+        'country': np.array(['GB', 'FR', 'GB']),
+    }}
+    assert rule.test_batch(data).tolist() == [True, False, False]
+
+
+def test_missing_column_raises():
+    rule = BoolRule('user.age > 18 and user.missing = 1')
+    with pytest.raises(MissingVariableException):
+        rule.test_batch({'user.age': np.array([30, 10])})
+
+
+def test_short_circuit_skips_missing_column():
+    # No row gets past the first condition, so user.missing is never needed
+    rule = BoolRule('user.age > 18 and user.missing = 1')
+    assert rule.test_batch({'user.age': np.array([1, 2])}).tolist() == [
+        False, False,
+    ]
+
+
+@pytest.mark.parametrize('data', [{}, {'a': []}, {'user': {'age': []}}])
+def test_zero_rows(data):
+    result = BoolRule('user.age > 18').test_batch(data)
+    assert result.dtype == bool and result.tolist() == []
+
+
+def test_dataframe_without_rows():
+    pd = pytest.importorskip('pandas')
+    for frame in (pd.DataFrame(), pd.DataFrame({'a': []})):
+        assert BoolRule('user.age > 18').test_batch(frame).tolist() == []
+
+
+def test_mismatched_column_lengths():
+    with pytest.raises(ValueError):
+        BoolRule('x = 1').test_batch({'x': [1, 2], 'y': [1]})
+
+
+def test_dataframe():
+    pd = pytest.importorskip('pandas')
+    frame = pd.DataFrame({
+        'user.age': [30, 12, 70],
+        'user.country': ['GB', 'FR', 'DE'],
+    })
+    rule = BoolRule('user.age > 18 and user.country in ("GB", "DE")')
+    assert rule.test_batch(frame).tolist() == [True, False, True]